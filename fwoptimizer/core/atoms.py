@@ -0,0 +1,631 @@
+"""
+Atomic predicates module
+
+For a given list of sets of a field, the domain of the field can be split into a small number
+of disjoint sets (atoms), such that every set of the list is a union of atoms. Once the atoms
+are known, every set is encoded as a bitset over the atom indexes, and the set operations
+become integer operations.
+"""
+
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from fwoptimizer.core.rules import Chain
+from fwoptimizer.core.fields import FieldList, ElementSetRegistry, ElementSet, _masksCover
+
+
+
+class AtomSpace:
+    """
+    The atoms of a field, that are used to encode and decode the sets of its ElementSet class.
+    """
+
+    def __init__(self, elementClass: type, sets: Iterable[ElementSet]) -> None:
+        """
+        AtomSpace __init__.
+
+        Args:
+            elementClass: ElementSet class of the field.
+            sets: Sets whose boundaries determine the atoms.
+        """
+        self._elementClass = elementClass
+        self._atoms = [atom.intern() for atom in elementClass.partition(list(sets))]
+        self._full = (1 << len(self._atoms)) - 1
+        self._decoded = {}
+        self._domainSet = None
+
+        # Atoms of the range based sets are sorted single ranges, so they can be searched by its start
+        self._starts = None
+        if hasattr(elementClass, 'getRanges'):
+            self._starts = [atom.getRanges()[0][0] for atom in self._atoms]
+
+    def __repr__(self) -> str:
+        """
+        AtomSpace __repr__
+        """
+        return f"AtomSpace({self._elementClass.__name__}, {len(self._atoms)} atoms)"
+
+    def getElementClass(self) -> type:
+        """
+        Gets the ElementSet class of the atoms.
+
+        Returns:
+            ElementSet class.
+        """
+        return self._elementClass
+
+    def getAtoms(self) -> List[ElementSet]:
+        """
+        Gets the list of atoms.
+
+        Returns:
+            List with the interned atoms.
+        """
+        return self._atoms
+
+    def getFullMask(self) -> int:
+        """
+        Gets the mask with all the atoms, that represents the domain.
+
+        Returns:
+            int: The mask of the domain.
+        """
+        return self._full
+
+    def getDomain(self) -> "AtomSet":
+        """
+        Gets the interned AtomSet with all the atoms.
+
+        Returns:
+            AtomSet: The domain of this space.
+        """
+        if self._domainSet is None:
+            self._domainSet = AtomSet.fromMask(self, self._full).intern()
+        return self._domainSet
+
+    def encodeMask(self, elementSet: ElementSet) -> int:
+        """
+        Gets the mask of atoms whose union is the given set.
+
+        Args:
+            elementSet: A set of the class of this space.
+
+        Raises:
+            ValueError: If the set isn't a union of atoms of this space.
+
+        Returns:
+            int: The mask of the atoms.
+        """
+        mask = 0
+
+        if self._starts is not None:
+
+            for start, end in elementSet.getRanges():
+
+                first = bisect_right(self._starts, start) - 1
+                last = bisect_right(self._starts, end) - 1
+
+                if self._starts[first] != start or self._atoms[last].getRanges()[0][1] != end:
+                    raise ValueError(f"{elementSet} isn't a union of atoms of {self}")
+
+                mask |= ((1 << (last - first + 1)) - 1) << first
+
+            return mask
+
+        for i, atom in enumerate(self._atoms):
+
+            if atom.isOverlapping(elementSet):
+
+                if not atom.isSubset(elementSet):
+                    raise ValueError(f"{elementSet} isn't a union of atoms of {self}")
+
+                mask |= 1 << i
+
+        return mask
+
+    def encode(self, elementSet: ElementSet) -> "AtomSet":
+        """
+        Encodes the given set as an AtomSet of this space.
+
+        Args:
+            elementSet: A set of the class of this space.
+
+        Raises:
+            ValueError: If the set isn't a union of atoms of this space.
+
+        Returns:
+            AtomSet: The encoded set.
+        """
+        return AtomSet.fromMask(self, self.encodeMask(elementSet))
+
+    def decode(self, mask: int) -> ElementSet:
+        """
+        Gets the interned set of the class of this space, that is the union of the atoms of the mask.
+        The decoded sets are cached, since the same labels appear many times.
+
+        Args:
+            mask: Mask of atoms.
+
+        Returns:
+            ElementSet: The decoded set.
+        """
+        decoded = self._decoded.get(mask)
+
+        if decoded is None:
+
+            if self._starts is not None:
+
+                # Consecutive atoms are adjacent ranges, so each run of bits is a single range
+                ranges = []
+                i = 0
+                rest = mask
+                while rest:
+                    skip = (rest & -rest).bit_length() - 1
+                    i += skip
+                    rest >>= skip
+                    run = (~rest & (rest + 1)).bit_length() - 1
+                    ranges.append((self._starts[i], self._atoms[i + run - 1].getRanges()[0][1]))
+                    i += run
+                    rest >>= run
+
+                decoded = self._elementClass._fromRanges(tuple(ranges)).intern()
+
+            else:
+
+                decoded = self._elementClass([])
+                for i, atom in enumerate(self._atoms):
+                    if mask >> i & 1:
+                        decoded = decoded.unionSet(atom)
+                decoded = decoded.intern()
+
+            self._decoded[mask] = decoded
+
+        return decoded
+
+
+
+class AtomSet(ElementSet):
+    """
+    A subclass of ElementSet that represents a set as a bitmask over the atoms of an AtomSpace.
+    The operations between AtomSets of the same space are integer operations. Otherwise, the
+    AtomSet is decoded and the operation is done over the decoded set.
+    """
+
+    def __init__(self, values: List[str], space: AtomSpace) -> None:
+        """
+        AtomSet __init__.
+
+        Args:
+            values (List[str]): A list of strings containing values of the class of the space.
+            space (AtomSpace): The AtomSpace used to encode the values.
+        """
+        elementSet = ElementSet.createElementSet(space.getElementClass().__name__, values)
+        self._space = space
+        self._mask = space.encodeMask(elementSet)
+
+    @classmethod
+    def fromMask(cls, space: AtomSpace, mask: int) -> "AtomSet":
+        """
+        Creates a new AtomSet from a mask of atoms.
+
+        Args:
+            space: The AtomSpace of the mask.
+            mask: Mask of atoms.
+
+        Returns:
+            AtomSet: A new AtomSet.
+        """
+        newSet = cls.__new__(cls)
+        newSet._space = space
+        newSet._mask = mask
+        return newSet
+
+    @classmethod
+    def coverPartition(cls, sets: List[ElementSet]) -> List[Tuple[ElementSet, Tuple[int, ...]]]:
+        """
+        Splits the union of the given sets into disjoint pieces, grouping the atoms of their masks by
+        the sets that have them. If the sets aren't AtomSets of the same space, they are decoded.
+
+        Args:
+            sets: List of sets.
+
+        Returns:
+            List of (piece, cover) tuples, where cover is the sorted tuple of the indexes of the sets
+            that include the piece.
+        """
+        space = sets[0].getSpace() if sets and isinstance(sets[0], AtomSet) else None
+
+        if space is None or not all(isinstance(x, AtomSet) and x.getSpace() is space for x in sets):
+            decoded = [AtomEncoder.decode(x) for x in sets]
+            return type(decoded[0]).coverPartition(decoded) if decoded else []
+
+        return [(cls.fromMask(space, mask), cover) for mask, cover in _masksCover([x.getMask() for x in sets])]
+
+    def _sameSpace(self, other: ElementSet) -> bool:
+        """
+        Check if other is an AtomSet of the same space.
+        """
+        return isinstance(other, AtomSet) and other.getSpace() is self._space
+
+    def __eq__(self, other: ElementSet) -> bool:
+        """
+        AtomSet __eq__
+
+        Args:
+            other (ElementSet): ElementSet to compare
+
+        Returns:
+            (bool) True if self and 'other' are equals. False otherwise.
+        """
+        if self._sameSpace(other):
+            return self._mask == other.getMask()
+        return self.decode() == (other.decode() if isinstance(other, AtomSet) else other)
+
+    def __hash__(self) -> int:
+        """
+        AtomSet __hash__
+        """
+        return super().__hash__()
+
+    def __repr__(self):
+        """
+        AtomSet __repr__
+        """
+        return "AtomSet" + super().__repr__()
+
+    def _getKey(self) -> tuple:
+        """
+        Gets the space and the mask, that identify the contents of this set.
+
+        Returns:
+            tuple: The space and the mask of this set.
+        """
+        return (self._space, self._mask)
+
+    @classmethod
+    def _fromKey(cls, key: tuple) -> "AtomSet":
+        """
+        Creates a new AtomSet from its space and mask.
+
+        Args:
+            key: Tuple with the space and the mask.
+
+        Returns:
+            AtomSet: A new AtomSet.
+        """
+        return cls.fromMask(*key)
+
+    @classmethod
+    def getDomainList(cls) -> List:
+        """
+        AtomSets don't have a domain of their own, but the domain of their space.
+
+        Raises:
+            TypeError: Always.
+        """
+        raise TypeError("The domain of an AtomSet depends on its AtomSpace")
+
+    def getDomain(self) -> "AtomSet":
+        """
+        Gets the interned AtomSet with all the atoms of the space of this set.
+
+        Returns:
+            AtomSet: The domain of the space.
+        """
+        return self._space.getDomain()
+
+    def isDomain(self) -> bool:
+        """
+        Check if this AtomSet contains all the atoms of its space.
+
+        Returns:
+            True if the set is equal to the domain. False otherwise.
+        """
+        return self._mask == self._space.getFullMask()
+
+    def complement(self) -> "AtomSet":
+        """
+        Gets a new AtomSet with the atoms that aren't in this set.
+
+        Returns:
+            The interned complement of this set.
+        """
+        return self.fromMask(self._space, self._space.getFullMask() & ~self._mask).intern()
+
+    def getSpace(self) -> AtomSpace:
+        """
+        Gets the AtomSpace of this set.
+
+        Returns:
+            AtomSpace: The space of this set.
+        """
+        return self._space
+
+    def getMask(self) -> int:
+        """
+        Gets the mask of atoms of this set.
+
+        Returns:
+            int: The mask of this set.
+        """
+        return self._mask
+
+    def decode(self) -> ElementSet:
+        """
+        Gets the (interned) set of the class of the space that this AtomSet represents.
+
+        Returns:
+            ElementSet: The decoded set.
+        """
+        return self._space.decode(self._mask)
+
+    def _decodeOther(self, otherSet: ElementSet) -> ElementSet:
+        """
+        Gets the decoded otherSet, if it's an AtomSet.
+        """
+        return otherSet.decode() if isinstance(otherSet, AtomSet) else otherSet
+
+    def add(self, otherSet: ElementSet) -> None:
+        """
+        Add the elements of otherSet to this set.
+        Equivalent to say self = self U otherSet.
+
+        Args:
+            otherSet: The ElementSet to add to this.
+        """
+        self._checkMutable()
+        if self._sameSpace(otherSet):
+            self._mask |= otherSet.getMask()
+        else:
+            self._mask = self._space.encodeMask(self.decode().unionSet(self._decodeOther(otherSet)))
+
+    def isOverlapping(self, otherSet: ElementSet) -> bool:
+        """
+        Check if this AtomSet and otherSet have common elements.
+
+        Args:
+            otherSet: The ElementSet to compare this.
+
+        Returns:
+            (bool) True if exist common elements. False otherwise.
+        """
+        if self._sameSpace(otherSet):
+            return (self._mask & otherSet.getMask()) != 0
+        return self.decode().isOverlapping(self._decodeOther(otherSet))
+
+    def isEmpty(self) -> bool:
+        """
+        Check if this AtomSet is Empty.
+
+        Returns:
+            (bool) True if the set is empty. False otherwise.
+        """
+        return self._mask == 0
+
+    def isSubset(self, otherSet: ElementSet) -> bool:
+        """
+        Check if this AtomSet is a subset of 'otherSet'.
+
+        Args:
+            otherSet: The ElementSet to compare this.
+
+        Returns:
+            (bool) True if this AtomSet if a subset of otherSet. False otherwise.
+        """
+        if self._sameSpace(otherSet):
+            return (self._mask & ~otherSet.getMask()) == 0
+        return self.decode().isSubset(self._decodeOther(otherSet))
+
+    def isDisjoint(self, otherSet: ElementSet) -> bool:
+        """
+        Check if this AtomSet and otherSet have common elements.
+
+        Args:
+            otherSet: The ElementSet to compare this.
+
+        Returns:
+            (bool) True if not exist common elements. False otherwise.
+        """
+        if self._sameSpace(otherSet):
+            return (self._mask & otherSet.getMask()) == 0
+        return self.decode().isDisjoint(self._decodeOther(otherSet))
+
+    def intersectionSet(self, otherSet: ElementSet) -> ElementSet:
+        """
+        Gets a new set with the intersection between self and 'otherSet'.
+
+        Args:
+            otherSet: The ElementSet to compare this.
+
+        Returns:
+            AtomSet whit the intersection between self and 'otherSet' if both are of the same space.
+            The decoded intersection otherwise.
+        """
+        if self._sameSpace(otherSet):
+            return self._derived(self.fromMask(self._space, self._mask & otherSet.getMask()))
+        return self.decode().intersectionSet(self._decodeOther(otherSet))
+
+    def unionSet(self, otherSet: ElementSet) -> ElementSet:
+        """
+        Gets a new set with the union between self and 'otherSet'.
+
+        Args:
+            otherSet: The ElementSet to compare this.
+
+        Returns:
+            AtomSet whit the union between self and 'otherSet' if both are of the same space.
+            The decoded union otherwise.
+        """
+        if self._sameSpace(otherSet):
+            return self._derived(self.fromMask(self._space, self._mask | otherSet.getMask()))
+        return self.decode().unionSet(self._decodeOther(otherSet))
+
+    def differenceSet(self, otherSet: ElementSet) -> ElementSet:
+        """
+        Gets a new set with the difference between self and 'otherSet'.
+
+        Args:
+            otherSet: The ElementSet to compare this.
+
+        Returns:
+            AtomSet whit the difference between self and 'otherSet' if both are of the same space.
+            The decoded difference otherwise.
+        """
+        if self._sameSpace(otherSet):
+            return self._derived(self.fromMask(self._space, self._mask & ~otherSet.getMask()))
+        return self.decode().differenceSet(self._decodeOther(otherSet))
+
+    def remove(self, otherSet: ElementSet) -> None:
+        """
+        Remove the elements of otherSet to this set.
+        Equivalent to say self = self - (self ∩ otherSet).
+
+        Args:
+            otherSet: The ElementSet to remove to this.
+        """
+        self._checkMutable()
+        if self._sameSpace(otherSet):
+            self._mask &= ~otherSet.getMask()
+        else:
+            self._mask = self._space.encodeMask(self.decode().differenceSet(self._decodeOther(otherSet)))
+
+    def getElements(self):
+        """
+        Gets the elements of the decoded set.
+
+        Returns:
+            The elements of the decoded set.
+        """
+        return self.decode().getElements()
+
+    def getElementsList(self) -> List[str]:
+        """
+        Gets the elements of the decoded set as a list.
+
+        Returns:
+            A list with elements contains in this set.
+        """
+        return self.decode().getElementsList()
+
+    def getElementsCount(self) -> int:
+        """
+        Gets the number of values of the list of elements of the decoded set.
+
+        Returns:
+            The length of the list of elements.
+        """
+        return self.decode().getElementsCount()
+
+    def iterElements(self) -> Iterator[str]:
+        """
+        Iterates over the list of elements of the decoded set.
+
+        Returns:
+            An iterator over the list of elements.
+        """
+        return self.decode().iterElements()
+
+    def replicate(self) -> "AtomSet":
+        """
+        Gets a replica of this object.
+
+        Returns:
+            AtomSet: A replica of this object.
+        """
+        return self.fromMask(self._space, self._mask)
+
+
+
+class AtomEncoder:
+    """
+    Keeps an AtomSpace for each field of a FieldList, built from the sets used in those fields.
+    It's used as a preprocessing stage, to operate with AtomSets and recover the ElementSets at the end.
+    """
+
+    def __init__(self, fieldList: FieldList, sets: Dict[str, Iterable[ElementSet]]) -> None:
+        """
+        AtomEncoder __init__.
+
+        Args:
+            fieldList: FieldList with the fields to encode.
+            sets: Dict with the field names as keys, and the sets used in each field as values.
+        """
+        self._spaces = {}
+
+        for field in fieldList.getFields():
+            elementClass = ElementSetRegistry.getElementSetClass(field.getType())
+            self._spaces[field.getName()] = AtomSpace(elementClass, sets.get(field.getName(), []))
+
+    @classmethod
+    def fromChain(cls, chain: Chain, fieldList: FieldList) -> "AtomEncoder":
+        """
+        Creates an AtomEncoder with the atoms of the values of the rules of a chain.
+
+        Args:
+            chain: Chain from which the rules are extracted.
+            fieldList: FieldList with the fields to encode.
+
+        Returns:
+            AtomEncoder: The encoder of the chain.
+        """
+        sets = {}
+
+        for field in fieldList.getFields():
+
+            values = set()
+
+            for rule in chain.getRules():
+                elements = rule.getOption(field.getName())
+                if elements:
+                    values.add(ElementSet.createElementSet(field.getType(), elements))
+
+            sets[field.getName()] = values
+
+        return cls(fieldList, sets)
+
+    def getSpace(self, fieldName: str) -> AtomSpace:
+        """
+        Gets the AtomSpace of a field.
+
+        Args:
+            fieldName: Name of the field.
+
+        Returns:
+            AtomSpace: The space of the field.
+        """
+        return self._spaces[fieldName]
+
+    def getAtomsNum(self) -> Dict[str, int]:
+        """
+        Gets the number of atoms of each field.
+
+        Returns:
+            Dict with the field names as keys and the number of atoms as values.
+        """
+        return {name: len(space.getAtoms()) for name, space in self._spaces.items()}
+
+    def encode(self, fieldName: str, elementSet: ElementSet) -> AtomSet:
+        """
+        Encodes a set of a field as an interned AtomSet.
+
+        Args:
+            fieldName: Name of the field.
+            elementSet: Set of the field.
+
+        Returns:
+            AtomSet: The encoded set.
+        """
+        return self._spaces[fieldName].encode(elementSet).intern()
+
+    @staticmethod
+    def decode(elementSet: ElementSet) -> ElementSet:
+        """
+        Gets the decoded set, if the given set is an AtomSet. Otherwise, the same set is returned.
+
+        Args:
+            elementSet: Set to decode.
+
+        Returns:
+            ElementSet: The decoded set.
+        """
+        return elementSet.decode() if isinstance(elementSet, AtomSet) else elementSet
@@ -4,19 +4,30 @@ from typing import List
 from fwoptimizer.core.rules import Rule, Chain
 from fwoptimizer.core.firewall import FieldList
 from fwoptimizer.core.fields import ElementSet
+from fwoptimizer.core.atoms import AtomEncoder
 
 class ChainComparator:
 
     def reduceRedundancies(rules: List["ChainComparator.PseudoRule"], fieldList: FieldList) -> None:
         """
         Drop redundant PseudoRules of the 'rules' list.
-        The way to detect redundancies is to see if any of the rules is equal to the intersection between both.
+        First drops the repeated rules, looking up their (interned) predicates in a dict.
+        Then, the way to detect redundancies is to see if any of the rules is equal to the intersection between both.
 
         Args:
             rules: The list of PseudoRules to be reduced.
             fieldList: The fieldlist that determines the fields that will be compared
         """
 
+        seen = set()
+        unique = []
+        for rule in rules:
+            key = tuple(rule.getPredicates().get(field.getName()) for field in fieldList.getFields())
+            if key not in seen:
+                seen.add(key)
+                unique.append(rule)
+        rules[:] = unique
+
         i = 0
         while i < len(rules)-1:
 
@@ -58,13 +69,14 @@ class ChainComparator:
             """
             return f"PseudoRule {self._id}: {self._predicates} -> {self._decision}"
 
-        def fillFromRule(self, rule: Rule, fieldList: FieldList):
+        def fillFromRule(self, rule: Rule, fieldList: FieldList, encoder: AtomEncoder = None):
             """
             Add to the PseudoRule the fields set in the fieldList, based on the values of the given rule.
             
             Args:
                 rule: Rule from which to take the values.
                 fieldList: The fieldlist that determines the fields that will be added.
+                encoder: If given, the predicates are encoded as AtomSets.
             """
             self._id = rule.getId()
             self._decision = rule.getDecision()
@@ -72,7 +84,19 @@ class ChainComparator:
 
             for field in fieldList.getFields():
                 element_list = rule.getOption(field.getName(), None)
-                self._predicates[field.getName()] = ElementSet.createElementSet(field.getType(), element_list if element_list else [])
+                self._predicates[field.getName()] = ElementSet.createElementSet(field.getType(), element_list if element_list else []).intern()
+                if encoder is not None:
+                    self._predicates[field.getName()] = encoder.encode(field.getName(), self._predicates[field.getName()])
+
+        def encode(self, encoder: AtomEncoder) -> None:
+            """
+            Encode (or re-encode) the predicates with the given encoder.
+
+            Args:
+                encoder: AtomEncoder whose atoms include the predicates.
+            """
+            for name, value in self._predicates.items():
+                self._predicates[name] = encoder.encode(name, encoder.decode(value))
         
         def setId(self, id) -> None:
             """
@@ -132,6 +156,7 @@ class ChainComparator:
         def replicate(self) -> "ChainComparator.PseudoRule":
             """
             Gets a replica of this object.
+            Interned predicates are immutable, so they are shared with the replica.
 
             Returns:
                 PseudoRule: A replica of this object.
@@ -139,8 +164,8 @@ class ChainComparator:
             rep = ChainComparator.PseudoRule()
             rep.setId(self.getId())
             rep.setDecision(self.getDecision())
-            for key in self.getPredicates():
-                rep.setPredicate(key, self.getPredicates()[key].replicate())
+            for key, value in self.getPredicates().items():
+                rep.setPredicate(key, value if value.isFrozen() else value.replicate())
             return rep
         
         def sameFieldValues(self, other: "ChainComparator.PseudoRule") -> bool:
@@ -253,13 +278,14 @@ class ChainComparator:
             rules_str = "\n".join([str(rule) for rule in self._rules])
             return f"{self._name}:\n{rules_str if rules_str else ''}"
         
-        def fillFromChain(self, chain: Chain, fieldList: FieldList) -> None:
+        def fillFromChain(self, chain: Chain, fieldList: FieldList, encoder: AtomEncoder = None) -> None:
             """
             Add to the PseudoChain the PseudoRules set in the fieldList, based on the Rules of the given chain.
             
             Args:
                 chain: Chain from which to take the values.
                 fieldList: The fieldlist that determines the fields that will be added toi PseudoRules.
+                encoder: If given, the predicates are encoded as AtomSets.
             """
             self._name = chain.getName()
             self._defaultdecision = chain.getDefaultDecision()
@@ -267,7 +293,7 @@ class ChainComparator:
 
             for rule in chain.getRules():
                 aux = ChainComparator.PseudoRule()
-                aux.fillFromRule(rule, fieldList)
+                aux.fillFromRule(rule, fieldList, encoder)
                 self._rules.append(aux)
 
         def addRule(self, rule: "ChainComparator.PseudoRule") -> None:
@@ -448,7 +474,7 @@ class ChainComparator:
             chain: Chain to use for generate if correspondient PseudoChain. 
         """
         self._chain1 = ChainComparator.PseudoChain()
-        self._chain1.fillFromChain(chain1, self._fieldList)
+        self._chain1.fillFromChain(chain1, self._fieldList, AtomEncoder.fromChain(chain1, self._fieldList))
         self._effectiveChain1 = self._chain1.getEffectiveChain(self._fieldList)
 
     def setChain2FromChain(self, chain2: Chain):
@@ -460,7 +486,7 @@ class ChainComparator:
             chain: Chain to use for generate if correspondient PseudoChain. 
         """
         self._chain2 = ChainComparator.PseudoChain()
-        self._chain2.fillFromChain(chain2, self._fieldList)
+        self._chain2.fillFromChain(chain2, self._fieldList, AtomEncoder.fromChain(chain2, self._fieldList))
         self._effectiveChain2 = self._chain2.getEffectiveChain(self._fieldList)
 
     def areEquivalents(self):
@@ -473,6 +499,14 @@ class ChainComparator:
 
         if self._effectiveChain1 and self._effectiveChain2:
 
+            # Both chains were encoded with its own atoms, so encode them again with the atoms of both
+            rules = self._effectiveChain1.getRules() + self._effectiveChain2.getRules()
+            sets = {field.getName(): [AtomEncoder.decode(rule.getPredicates()[field.getName()]) for rule in rules]
+                    for field in self._fieldList.getFields()}
+            encoder = AtomEncoder(self._fieldList, sets)
+            for rule in rules:
+                rule.encode(encoder)
+
             #Compare 1 against 2.
 
             for rule1 in self._effectiveChain1.getRules():
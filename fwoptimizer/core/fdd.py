@@ -2,12 +2,212 @@
 Firewall Decision Diagram (FDD) module
 """
 
-from typing import List
+from typing import Dict, List, Tuple
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 import graphviz
 import sys
 
 from fwoptimizer.core.rules import Chain, Rule
 from fwoptimizer.core.fields import Field, FieldList, ElementSetRegistry, ElementSet
+from fwoptimizer.core.atoms import AtomEncoder
+from fwoptimizer.core.fddArrays import FDDArrays
+
+
+
+def _restoreSlots(obj, state) -> None:
+    """
+    Restores the state of an unpickled object that uses __slots__.
+    It also accepts the state of the objects pickled before they used __slots__ (a plain dict).
+
+    Args:
+        obj: Object to restore.
+        state: The pickled state, as a dict or as a (dict, slots dict) tuple.
+    """
+    if isinstance(state, tuple):
+        state = {**(state[0] or {}), **state[1]}
+    for name in obj.__slots__:
+        if name in state:
+            setattr(obj, name, state[name])
+
+
+class _IdentityList:
+    """
+    Insertion-ordered collection of objects indexed by identity.
+    Adding, removing and checking membership are O(1) and never call __eq__. The objects are
+    returned as a list that is cached until an object is removed, so the callers can index it
+    and iterate over it while the collection changes.
+    """
+
+    __slots__ = ('_items', '_list')
+
+    def __init__(self, items=()):
+        """
+        Create a new _IdentityList
+
+        Args:
+            items: Initial objects
+        """
+        self._items = {id(item): item for item in items}
+        self._list = None
+
+    def __getstate__(self):
+        """
+        _IdentityList __getstate__. The identities change when unpickled, so only the objects are stored.
+        """
+        return list(self._items.values())
+
+    def __setstate__(self, state):
+        """
+        _IdentityList __setstate__
+        """
+        self._items = {id(item): item for item in state}
+        self._list = None
+
+    def __contains__(self, item) -> bool:
+        return id(item) in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self.asList())
+
+    def add(self, item) -> bool:
+        """
+        Add an object if it's not in the collection yet
+
+        Args:
+            item: Object to add
+
+        Returns:
+            bool: True if the object was added
+        """
+        key = id(item)
+        if key in self._items:
+            return False
+        self._items[key] = item
+        if self._list is not None:
+            self._list.append(item)
+        return True
+
+    def discard(self, item) -> bool:
+        """
+        Remove an object if it's in the collection
+
+        Args:
+            item: Object to remove
+
+        Returns:
+            bool: True if the object was removed
+        """
+        if self._items.pop(id(item), None) is None:
+            return False
+        self._list = None
+        return True
+
+    def asList(self) -> list:
+        """
+        Get the objects in insertion order
+
+        Returns:
+            list: The objects. It must not be modified by the callers.
+        """
+        if self._list is None:
+            self._list = list(self._items.values())
+        return self._list
+
+
+def _asIdentityList(items) -> _IdentityList:
+    """
+    Converts the adjacency of objects pickled before _IdentityList existed (plain lists).
+    """
+    return items if isinstance(items, _IdentityList) else _IdentityList(items)
+
+
+class _EdgeIndex:
+    """
+    Sorted-boundary index of the ranges of the labels of the outgoing edges of a node.
+    The labels of the outgoing edges of a node of an FDD are disjoint, so their ranges sorted by
+    start are sorted by end too, and the ranges that overlap a given one are a contiguous block.
+    If a label overlaps another one (a node not sanitized yet), the index stops being usable.
+    """
+
+    __slots__ = ('_starts', '_ends', '_edges', '_usable')
+
+    def __init__(self, edges):
+        """
+        Create a new _EdgeIndex
+
+        Args:
+            edges: Outgoing edges of the node. Their labels must have getRanges.
+        """
+        entries = sorted(((start, end, edge) for edge in edges for start, end in edge.getElementSet().getRanges()),
+                         key=lambda entry: entry[0])
+        self._starts = [entry[0] for entry in entries]
+        self._ends = [entry[1] for entry in entries]
+        self._edges = [entry[2] for entry in entries]
+        self._usable = all(self._starts[i] > self._ends[i-1] for i in range(1, len(entries)))
+
+    def isUsable(self) -> bool:
+        """
+        Check if the indexed labels are disjoint, so the index can be queried
+        """
+        return self._usable
+
+    def add(self, edge: "Edge") -> None:
+        """
+        Add the ranges of the label of an edge
+
+        Args:
+            edge (Edge): Edge to add
+        """
+        if not self._usable:
+            return
+        for start, end in edge.getElementSet().getRanges():
+            i = bisect_left(self._starts, start)
+            if (i > 0 and self._ends[i-1] >= start) or (i < len(self._starts) and self._starts[i] <= end):
+                self._usable = False
+                return
+            self._starts.insert(i, start)
+            self._ends.insert(i, end)
+            self._edges.insert(i, edge)
+
+    def remove(self, edge: "Edge", label: ElementSet) -> None:
+        """
+        Remove the ranges of the label that an edge had when it was added
+
+        Args:
+            edge (Edge): Edge to remove
+            label (ElementSet): Label of the edge when it was added
+        """
+        if not self._usable:
+            return
+        for start, _ in label.getRanges():
+            i = bisect_left(self._starts, start)
+            if i < len(self._starts) and self._edges[i] is edge:
+                del self._starts[i]
+                del self._ends[i]
+                del self._edges[i]
+
+    def overlapping(self, elementSet: ElementSet) -> List["Edge"]:
+        """
+        Get the edges whose label overlaps a set, in O(log k + m) for each range of the set.
+
+        Args:
+            elementSet (ElementSet): Set with getRanges
+
+        Returns:
+            List[Edge]: The edges, sorted by their first overlapping range
+        """
+        found = {}
+        for start, end in elementSet.getRanges():
+            for i in range(bisect_left(self._ends, start), bisect_right(self._starts, end)):
+                found.setdefault(id(self._edges[i]), self._edges[i])
+        return list(found.values())
 
 
 
@@ -15,6 +215,9 @@ class Level:
     """
     Represents a level in the node hierarchy.
     """
+
+    __slots__ = ('_field', '_nodes', '_unique')
+
     def __init__(self, field: Field):
         """
         Create a new Level
@@ -24,8 +227,17 @@ class Level:
         """
         if not isinstance(field, Field):
             raise ValueError("Domain of Level should be of Field Class.")
-        self._field = field      # Domain of the Level
-        self._nodes = []         # List of Nodes in the Level
+        self._field = field                 # Domain of the Level
+        self._nodes = _IdentityList()       # Nodes in the Level
+        self._unique = {}                   # Unique table, used while the FDD is constructed
+
+    def __setstate__(self, state):
+        """
+        Level __setstate__
+        """
+        _restoreSlots(self, state)
+        self._nodes = _asIdentityList(self._nodes)
+        self._unique = {}
 
     def addNodeToLvl(self, node: "Node"):
         """
@@ -34,7 +246,7 @@ class Level:
         Args:
             node (Node): Node to add
         """
-        self._nodes.append(node)
+        self._nodes.add(node)
 
     def delNodeFromLvl(self, node: "Node"):
         """
@@ -43,7 +255,58 @@ class Level:
         Args:
             node (Node): Node to delete
         """
-        self._nodes.remove(node)
+        self._nodes.discard(node)
+
+    def getUniqueNode(self, signature: frozenset) -> "Node":
+        """
+        Get the Node of the unique table with the given signature
+
+        Args:
+            signature (frozenset): Signature of the node, as returned by Node.getSignature
+
+        Returns:
+            Node: The node with that signature, or None if there isn't any
+        """
+        return self._unique.get(signature)
+
+    def addUniqueNode(self, signature: frozenset, node: "Node"):
+        """
+        Add a Node to the unique table
+
+        Args:
+            signature (frozenset): Signature of the node
+            node (Node): Node to add
+        """
+        self._unique[signature] = node
+
+    def delUniqueNode(self, signature: frozenset, node: "Node"):
+        """
+        Remove a Node from the unique table, if it's the one with that signature
+
+        Args:
+            signature (frozenset): Signature of the node
+            node (Node): Node to remove
+        """
+        if self._unique.get(signature) is node:
+            del self._unique[signature]
+
+    def clearUniqueTable(self):
+        """
+        Remove all the Nodes from the unique table
+        """
+        self._unique = {}
+
+    def hasNode(self, node: "Node") -> bool:
+        """
+        Check if a Node is in the Level
+
+        Args:
+            node (Node): Node to check
+
+        Returns:
+            bool: True if the node is in the Level
+        """
+        return node in self._nodes
 
     def getNodes(self):
         """
@@ -52,7 +315,7 @@ class Level:
         Returns:
             List: Nodes for this level
         """
-        return self._nodes
+        return self._nodes.asList()
     
     def getField(self):
         """
@@ -69,11 +332,19 @@ class Node:
     """
     Node Class
     """
+
+    __slots__ = ('_level', '_name', '_load', '_cost', '_attributes', '_incoming', '_outgoing', '_index')
+
+    # Minimum number of outgoing edges to build the index of their labels
+    _indexMinEdges_ = 8
+
     def __init__(self, level: Level, **attrs):
         """
         Create a new Node. 
         A Node has a attributes and Lists of outgoing and incoming
         Edges.
+        The attributes are only used to render and filter the FDD, so their dict is
+        allocated when the first attribute is set.
         
         Args:
             name (str): Node Name
@@ -83,9 +354,23 @@ class Node:
         self._level: Level = level
         self._name: str = ""
         self._load : int = 0
-        self._attributes = attrs if attrs else {}
-        self._incoming: List[Edge] = []
-        self._outgoing: List[Edge] = []
+        # (rules, lines, checks) of the output of the subtree, computed by marking
+        self._cost = None
+        self._attributes = attrs if attrs else None
+        self._incoming = _IdentityList()
+        self._outgoing = _IdentityList()
+        # Index of the outgoing labels, built by the first getOverlapping
+        self._index = None
+
+    def __setstate__(self, state):
+        """
+        Node __setstate__
+        """
+        self._cost = None
+        _restoreSlots(self, state)
+        self._incoming = _asIdentityList(self._incoming)
+        self._outgoing = _asIdentityList(self._outgoing)
+        self._index = None
 
     def __repr__(self) -> str:
         """
@@ -116,7 +401,17 @@ class Node:
         Args:
             incoming (Edge): Edge to add
         """
-        self._incoming.append(incoming)
+        return self._incoming.add(incoming)
+
+    def removeIncoming(self, incoming: "Edge"):
+        """
+        Remove edge from the incoming incidence of the
+        Node
+
+        Args:
+            incoming (Edge): Edge to remove
+        """
+        return self._incoming.discard(incoming)
         
     def addOutgoing(self, outgoing: "Edge"):
         """
@@ -126,20 +421,82 @@ class Node:
         Args:
             outgoinging (Edge): Edge to add
         """
-        self._outgoing.append(outgoing)
+        added = self._outgoing.add(outgoing)
+        if added and self._index is not None:
+            self._index.add(outgoing)
+        return added
+
+    def removeOutgoing(self, outgoing: "Edge"):
+        """
+        Remove edge from the outgoing incidence of the
+        Node
+
+        Args:
+            outgoing (Edge): Edge to remove
+        """
+        removed = self._outgoing.discard(outgoing)
+        if removed and self._index is not None:
+            self._index.remove(outgoing, outgoing.getElementSet())
+        return removed
+
+    def updateOutgoing(self, outgoing: "Edge", oldElementSet: ElementSet):
+        """
+        Update the index of the outgoing edges after the label of one of them changed
+
+        Args:
+            outgoing (Edge): Edge with the new label
+            oldElementSet (ElementSet): Previous label of the edge
+        """
+        if self._index is not None and outgoing in self._outgoing:
+            self._index.remove(outgoing, oldElementSet)
+            self._index.add(outgoing)
+
+    def getOverlapping(self, elementSet: ElementSet) -> List["Edge"]:
+        """
+        Return the outgoing edges whose label overlaps the given set.
+        For labels with ranges, the first call builds an index of the labels that is kept in sync
+        with the edges, so the next calls don't scan all the outgoing edges. If the labels overlapped
+        at some point, the index is built again.
+
+        Args:
+            elementSet (ElementSet): Set to check
+
+        Returns:
+            List[Edge]: The overlapping edges
+        """
+        if self._index is not None and not self._index.isUsable():
+            self._index = None
+
+        if self._index is None and len(self._outgoing) >= self._indexMinEdges_ and hasattr(elementSet, 'getRanges') \
+                and all(hasattr(edge.getElementSet(), 'getRanges') for edge in self._outgoing):
+            self._index = _EdgeIndex(self._outgoing)
+
+        if self._index is not None and self._index.isUsable() and hasattr(elementSet, 'getRanges'):
+            return self._index.overlapping(elementSet)
+
+        return [edge for edge in self._outgoing if edge.getElementSet().isOverlapping(elementSet)]
 
     def getIncoming(self):
         """
-        Return the list of incoming edges
+        Return the list of incoming edges.
+        Removing an edge doesn't modify the returned list, so it can be iterated while disconnecting them.
         """
-        return self._incoming
+        return self._incoming.asList()
 
     def getOutgoing(self):
         """
-        Return the list of outgoings edges
+        Return the list of outgoings edges.
+        Removing an edge doesn't modify the returned list, so it can be iterated while disconnecting them.
         """
-        return self._outgoing
+        return self._outgoing.asList()
     
+    def getSignature(self) -> frozenset:
+        """
+        Return the signature of the node: the (label, destination) pairs of its outgoing edges.
+        Two nodes of a level with the same signature are isomorphic.
+        """
+        return frozenset((edge.getElementSet(), id(edge.getDestination())) for edge in self._outgoing)
+
     def getLevel(self):
         """
         Return the level for this node
@@ -157,6 +514,8 @@ class Node:
         Returns:
             dict or any: The Node attributes or the value of the specified attribute.
         """
+        if self._attributes is None:
+            return {} if attr_name is None else None
         if attr_name is None:
             return self._attributes
         return self._attributes.get(attr_name, None)
@@ -168,6 +527,8 @@ class Node:
         Args:
             new_attrs: New attributes to update.
         """
+        if self._attributes is None:
+            self._attributes = {}
         self._attributes.update(new_attrs)
         
     def getLoad(self):
@@ -188,6 +549,24 @@ class Node:
         """
         self._load = load
 
+    def getCost(self):
+        """
+        Get the cost of the output of the Node's subtree, computed by the marking
+
+        Returns:
+            cost (tuple): (rules, lines, checks), or None if the Node isn't marked
+        """
+        return self._cost
+
+    def setCost(self, cost: tuple):
+        """
+        Set the cost of the output of the Node's subtree
+
+        Args:
+            cost (tuple): New (rules, lines, checks) cost
+        """
+        self._cost = cost
+
     def setName(self, name:str):
         """
         Set the Node' name
@@ -209,6 +588,9 @@ class Edge:
     """
     Edge Class
     """
+
+    __slots__ = ('_id', '_origin', '_destination', '_elementSet', '_markedAny', '_attributes', '_shared', '_count')
+
     def __init__(self, edgeId: List[int], origin: Node, destination: Node, elementSet: ElementSet, **attrs) -> None:
         """
         Create a new Edge
@@ -217,16 +599,28 @@ class Edge:
             origin (Node): Origin Node of the Edge
             destination (Node): Destination Node of the Edge
             id (int): Id of the Edge
-            attrs: Edge optional attributes
+            elementSet (ElementSet): Label of the Edge. It's stored interned, so it can't be modified in place.
+            attrs: Edge optional attributes. Their dict is allocated when the first attribute is set.
         """
-        self._id: List[int] = [] + edgeId
-        self._id.sort()
+        self._id: tuple = tuple(sorted(edgeId))
         self._origin: Node = origin
         self._destination: Node = destination
-        self._elementSet = elementSet
+        self._elementSet = elementSet.intern()
         self._markedAny = False
-        self._load = 0
-        self._attributes = attrs if attrs else {}
+        self._attributes = attrs if attrs else None
+        # True while the attributes may be shared with a replica (copy-on-write)
+        self._shared = False
+        # Number of elements of the label, computed when it's first needed
+        self._count = None
+
+    def __setstate__(self, state):
+        """
+        Edge __setstate__
+        """
+        self._shared = False
+        self._count = None
+        _restoreSlots(self, state)
+        self._id = tuple(self._id)
 
     def __repr__(self) -> str:
         """
@@ -244,7 +638,7 @@ class Edge:
         Args:
             other (Edge): Edge to compare
         """
-        return (self._id == other.getId() and
+        return (self._id == other._id and
                 self._origin == other.getOrigin() and
                 self._destination == other.getDestination() and
                 self._elementSet == other.getElementSet()
@@ -260,28 +654,36 @@ class Edge:
         """
         Connect Edge to its origin and destination Nodes
         """
-        if self not in self._origin.getOutgoing():
-            self._origin.getOutgoing().append(self)
-        if self not in self._destination.getIncoming():
-            self._destination.getIncoming().append(self)
+        self._origin.addOutgoing(self)
+        self._destination.addIncoming(self)
 
     def autoDisconnect(self):
         """
         Disconnect Edge to its origin and destination Nodes
         """
-        if self in self._origin.getOutgoing():
-            self._origin.getOutgoing().remove(self)
-        if self in self._destination.getIncoming():
-            self._destination.getIncoming().remove(self)
+        self._origin.removeOutgoing(self)
+        self._destination.removeIncoming(self)
 
     def replicate(self) -> "Edge":
         """
-        Duplicate the Edge and its info
+        Duplicate the Edge and its info.
+        The label and the ids are immutable, so the replica shares them. The attributes
+        are shared too, and they are copied only when one of the edges modifies them.
 
         Returns:
             Edge: Edge to copy
         """
-        return Edge(self._id, self._origin, self._destination, self._elementSet.replicate(),**self._attributes)
+        replica = Edge.__new__(Edge)
+        replica._id = self._id
+        replica._origin = self._origin
+        replica._destination = self._destination
+        replica._elementSet = self._elementSet
+        replica._markedAny = False
+        replica._count = self._count
+        replica._attributes = self._attributes
+        replica._shared = self._attributes is not None
+        self._shared = replica._shared
+        return replica
     
     def markEdge(self, mark:bool=True):
         """
@@ -317,8 +719,7 @@ class Edge:
         Args:
             ids (List[int]): List of new ids
         """
-        self._id.extend(ids)
-        self._id.sort()
+        self._id = tuple(sorted(self._id + tuple(ids)))
 
     def getOrigin(self):
         """
@@ -349,12 +750,12 @@ class Edge:
 
     def getId(self):
         """
-        Return the ids of this Edge
+        Return the ids of this Edge. They are stored as a sorted tuple.
 
         Returns:
             List[int]: List of Edge ids
         """
-        return self._id
+        return list(self._id)
     
     def getAttributes(self, attr_name=None):
         """
@@ -366,7 +767,10 @@ class Edge:
 
         Returns:
             dict or any: The Edge attributes or the value of the specified attribute.
+                         The dict may be shared with replicas, so use setAttributes to modify it.
         """
+        if self._attributes is None:
+            return {} if attr_name is None else None
         if attr_name is None:
             return self._attributes
         return self._attributes.get(attr_name, None)
@@ -378,6 +782,11 @@ class Edge:
         Args:
             new_attrs: New attributes to update.
         """
+        if self._attributes is None:
+            self._attributes = {}
+        elif self._shared:
+            self._attributes = dict(self._attributes)
+            self._shared = False
         self._attributes.update(new_attrs)
     
     def getElementSet(self):
@@ -391,12 +800,28 @@ class Edge:
     
     def setElementSet(self, elementSet: ElementSet):
         """
-        Set the Edge's ElementSet
+        Set the Edge's ElementSet. It's stored interned.
 
         Args:
             elementSet (ElementSet): New ElementSet
         """
-        self._elementSet = elementSet
+        oldElementSet = self._elementSet
+        self._elementSet = elementSet.intern()
+        if oldElementSet is not self._elementSet:
+            self._count = None
+            self._origin.updateOutgoing(self, oldElementSet)
+
+    def getElementsCount(self) -> int:
+        """
+        Get the number of elements of the Edge's ElementSet.
+        It's cached until the ElementSet is changed.
+
+        Returns:
+            int: Number of elements of the label
+        """
+        if self._count is None:
+            self._count = self._elementSet.getElementsCount()
+        return self._count
 
 
 
@@ -405,12 +830,23 @@ class FDD:
     Fdd class
     """
 
-    def __init__(self, fieldList: FieldList) -> None:
+    # Objectives of the marking: 'rules' (load of the nodes), 'lines' (iptables lines) and 'match' (predicate checks)
+    _costModels_ = ('rules', 'lines', 'match')
+
+    # Fields whose values are composed in separate iptables lines (IpTablesParser.compose)
+    _composedFields_ = ('Protocol', 'InInterface', 'OutInterface', 'SrcIP', 'DstIP')
+
+    def __init__(self, fieldList: FieldList, fieldOrder: List[str] = None) -> None:
         """
         Fdd __init__.
 
         Args:
             fieldList: FieldList used by the firewall.
+            fieldOrder: Names of the fields of the FieldList in the order of the levels.
+                        If None, the order of the FieldList is used.
+
+        Raises:
+            ValueError: If fieldOrder isn't an order of the fields of the FieldList.
         """
         # FDD Name
         self._name = "Unnamed_FDD"
@@ -421,9 +857,16 @@ class FDD:
         # FieldList of the FDD
         self._fieldList = fieldList
 
+        fields = fieldList.getFields()
+        if fieldOrder is not None:
+            byName = {field.getName(): field for field in fields}
+            if sorted(fieldOrder) != sorted(byName):
+                raise ValueError(f"Field order {fieldOrder} isn't an order of the fields {list(byName)}")
+            fields = [byName[name] for name in fieldOrder]
+
         # First create the list of tree levels using the settings extracted from the FieldList.
         # Throw a TypeError if any of the types specified for the level is invalid (its corresponding ElementSet does not exist)
-        for field in fieldList.getFields():
+        for field in fields:
 
             if field.getType() in ElementSetRegistry.getRegistry():
 
@@ -450,6 +893,17 @@ class FDD:
         root = Node(self._levels[0])
         root.autoConnect()
 
+        # Names of the fields whose levels were pruned by genFDD
+        self._prunedFields = []
+
+        # Nodes changed by addRuleToFDD since the last reduction, or None if the FDD wasn't reduced
+        self._dirtyNodes = None
+        # True if the unique tables of the levels have the nodes of the reduced FDD
+        self._uniqueIndexed = False
+
+        # Objective of the last marking
+        self._costModel = 'rules'
+
     def getName(self):
         """
         Get FDD's Name
@@ -519,6 +973,120 @@ class FDD:
 
         return total_nodes + total_edges
 
+    def getFieldOrder(self) -> List[str]:
+        """
+        Get the names of the fields in the order of the levels, without the decision level
+
+        Returns:
+            List[str]: Names of the fields
+        """
+        return [level.getField().getName() for level in self._levels[:-1]]
+
+    def getLevels(self):
+        """
+        Get the FDD's Levels, including the decision level
+
+        Returns:
+            List[Level]: FDD Levels
+        """
+        return self._levels
+
+    def __getstate__(self):
+        """
+        FDD __getstate__. The nodes and edges are stored in an FDDArrays, which is
+        compact and can be pickled without recursing through the graph.
+        """
+        state = self.__dict__.copy()
+        del state['_levels']
+        del state['_decisions']
+        state['_arrays'] = self.toArrays()
+        # The changed nodes can't be stored, the next reduction will be a full one
+        state['_dirtyNodes'] = None
+        state['_uniqueIndexed'] = False
+        return state
+
+    def __setstate__(self, state):
+        """
+        FDD __setstate__. Pickles with the graph itself (older projects) are loaded as they are.
+        """
+        arrays = state.pop('_arrays', None)
+        self.__dict__.update(state)
+        self.__dict__.setdefault('_prunedFields', [])
+        self.__dict__.setdefault('_dirtyNodes', None)
+        self.__dict__.setdefault('_uniqueIndexed', False)
+        self.__dict__.setdefault('_costModel', 'rules')
+        if arrays is not None:
+            self._loadArrays(arrays)
+
+    def toArrays(self) -> FDDArrays:
+        """
+        Get the struct-of-arrays storage of the FDD
+
+        Returns:
+            FDDArrays: Arrays with the nodes, edges and labels of the FDD
+        """
+        return FDDArrays.fromFDD(self)
+
+    @classmethod
+    def fromArrays(cls, arrays: FDDArrays, fieldList: FieldList) -> "FDD":
+        """
+        Create an FDD from its struct-of-arrays storage
+
+        Args:
+            arrays (FDDArrays): Arrays with the nodes, edges and labels of the FDD
+            fieldList (FieldList): FieldList used by the firewall
+
+        Returns:
+            FDD: The FDD stored in the arrays
+        """
+        fdd = cls.__new__(cls)
+        fdd._name = arrays.name
+        fdd._fieldList = fieldList
+        # The arrays may have been pickled: their fields are other objects, so they are compared by name
+        storedFields = {field.getName() for field in arrays.fields}
+        fdd._prunedFields = [field.getName() for field in fieldList.getFields() if field.getName() not in storedFields]
+        fdd._dirtyNodes = None
+        fdd._uniqueIndexed = False
+        fdd._costModel = 'rules'
+        fdd._loadArrays(arrays)
+        return fdd
+
+    def _loadArrays(self, arrays: FDDArrays) -> None:
+        """
+        Rebuild the Levels, Nodes and Edges of the FDD from its struct-of-arrays storage
+
+        Args:
+            arrays (FDDArrays): Arrays with the nodes, edges and labels of the FDD
+        """
+        # The levels use the fields of the FieldList of the FDD, the arrays may have copies of them
+        fields = {field.getName(): field for field in self._fieldList.getFields()}
+        self._levels = [Level(fields.get(field.getName(), field)) for field in arrays.fields]
+
+        nodes = []
+        for levelIdx, level in enumerate(self._levels):
+            for n in arrays.levelNodes(levelIdx):
+                node = Node(level, **arrays.nodeAttributes.get(n, {}))
+                node.setName(arrays.nodeName[n])
+                node.setLoad(arrays.nodeLoad[n])
+                level.addNodeToLvl(node)
+                nodes.append(node)
+
+        edges = []
+        for e in range(arrays.getEdgesNum()):
+            edge = Edge(arrays.edgeIdsOf(e), nodes[arrays.edgeOrigin[e]], nodes[arrays.edgeDestination[e]],
+                        arrays.labels[arrays.edgeLabel[e]], **arrays.edgeAttributes.get(e, {}))
+            edge.markEdge(bool(arrays.edgeMarked[e]))
+            edges.append(edge)
+
+        # Connect the edges in the stored order (without the membership checks of autoConnect)
+        for n, node in enumerate(nodes):
+            for e in arrays.outgoing(n):
+                node.addOutgoing(edges[e])
+            for e in arrays.incoming(n):
+                node.addIncoming(edges[e])
+
+        self._decisions = {name: nodes[n] for name, n in arrays.decisions.items()}
+
     def printFDD(self, name: str, img_format='png', rank_dir='TB', unroll_decisions=False) -> None:
         """
         Generate a graph image from the data structure
@@ -648,11 +1216,10 @@ class FDD:
                     if edge.getAttributes('label') is not None:
                         label = f"{edge.getAttributes('label')}"
                     else:
-                        elements = edge.getElementSet().getElementsList()
-                        if len(elements) > 5:
-                            elements_str = '\n'.join(str(elem) for elem in elements[:5]) + '\n...'
-                        else:
-                            elements_str = '\n'.join(str(elem) for elem in elements)
+                        element_set = edge.getElementSet()
+                        elements_str = '\n'.join(str(elem) for elem in islice(element_set.iterElements(), 5))
+                        if element_set.getElementsCount() > 5:
+                            elements_str += '\n...'
                         label = f"{elements_str}"
 
                     edge_attributes = edge.getAttributes()
@@ -768,7 +1335,7 @@ class FDD:
                 edge.setAttributes(filterRecord="True")
                 self._setFilterRecordToTop(edge.getOrigin())
 
-    def _filterBranch(self, node: Node, levelFiltered: Level, matchSet: ElementSet) -> bool:
+    def _filterBranch(self, node: Node, levelFiltered: Level, matchSet: ElementSet, matching: set = None) -> bool:
         """
         Recursively checks a node and its incoming edges for the specified field.
 
@@ -783,6 +1350,8 @@ class FDD:
         Args:
             levelFiltered (Level): Level to which the value to be compared belongs.
             matchSet (ElementSet): Value to compare.
+            matching (set): Ids of the edges of levelFiltered that overlap matchSet, obtained with
+                            Node.getOverlapping. If None, each edge is compared with matchSet.
 
         Returns:
             True if this node or his upper nodes meet the condition. False otherwise
@@ -801,7 +1370,7 @@ class FDD:
 
                 if edge.getOrigin().getLevel() == levelFiltered:
 
-                    if edge.getElementSet().isOverlapping(matchSet):
+                    if id(edge) in matching if matching is not None else edge.getElementSet().isOverlapping(matchSet):
 
                         edge.setAttributes(filterRecord="True")
                         self._setFilterRecordToTop(edge.getOrigin())
@@ -809,7 +1378,7 @@ class FDD:
                     
                 else: 
 
-                    if self._filterBranch(edge.getOrigin(), levelFiltered, matchSet):
+                    if self._filterBranch(edge.getOrigin(), levelFiltered, matchSet, matching):
 
                         edge.setAttributes(filterRecord="True")
                         found = True
@@ -845,6 +1414,15 @@ class FDD:
             if level.getField().getName() == fieldFiltered:
                 levelSelected = level
                 break
+        if levelSelected == None and fieldFiltered in self._prunedFields:
+            # No rule constrains a pruned field, so every visible path matches any of its values
+            fieldType = next(field.getType() for field in self._fieldList.getFields() if field.getName() == fieldFiltered)
+            try:
+                ElementSet.createElementSet(fieldType, [matchExpresion])
+            except:
+                print(f"La expresión {[matchExpresion]} no es un tipo conocido para el campo {fieldFiltered}")
+                return False
+            return True
         if levelSelected == None:
             print(f"El campo {fieldFiltered} no coincide con nigún campo existente")
             return False
@@ -872,10 +1450,13 @@ class FDD:
                 print(f"La expresión {[matchExpresion]} no es un tipo conocido para el campo {fieldFiltered}")
                 return False
 
+            # Find the edges of the level that match, using the index of each node
+            matching = {id(edge) for node in levelSelected.getNodes() for edge in node.getOverlapping(matchSet)}
+
             # Perform search
             for node in self._levels[-1].getNodes():
 
-                if self._filterBranch(node, levelSelected, matchSet):
+                if self._filterBranch(node, levelSelected, matchSet, matching):
                     found = True
         
         # algorithm for "decision" field
@@ -914,58 +1495,746 @@ class FDD:
             
 
 
-    def _genPre(self, chain: Chain) -> None:
+    def _genStream(self, chain: Chain, reportsPath: str = None, useAtoms: bool = False) -> AtomEncoder:
         """
-        Generate the preFDD based on the rules of the given chain.
-        A preFDD is a graph that no satisfy the rules to be a FDD still. 
+        Generate the FDD inserting the rules one by one in priority order (first match), without a preFDD.
+        Each rule only gets the packets that the previous rules didn't claim, so the redundancies and
+        inconsistencies are resolved (and reported) while it's inserted.
+        The nodes are never modified: a rule creates new versions of the nodes it changes, and the
+        nodes are hash-consed in the unique table of their level, so isomorphic subgraphs are shared
+        and the FDD stays close to reduced. The completeness is not achieved here.
 
         Args:
-            chain: Chain from which the rules are extracted
+            chain: Chain from which the rules are extracted.
+            reportsPath: Path to the report file. If None, the report will be output to stdout.
+            useAtoms: If True, the labels of the edges are encoded as AtomSets over the atoms of the chain.
+
+        Returns:
+            AtomEncoder: The encoder used for the labels, or None if useAtoms is False.
         """
         # Set FDD Name
         self._name = chain.getName()
-        
-        # Iterate through the list of Rules.
-        for rule in chain.getRules():
 
-            # Check that all predicates in the Rule are in the fieldList. If anyone not are include raise an error.
-            fields = [level.getField().getName() for level in self._levels]
+        # Check that all predicates in the Rules are in the fieldList. If anyone not are include raise an error.
+        fields = [level.getField().getName() for level in self._levels]
+        for rule in chain.getRules():
             for predicate in rule.getPredicates():
                 if predicate not in fields:
                     raise TypeError(f"Predicate {predicate} isn't include in FieldList")
 
-            # Create a temporal list of Nodes to iterate later and connect the edges.
-            # The first element of the lit is the root node.
-            nodes = [self._levels[0].getNodes()[0]]
+        encoder = AtomEncoder.fromChain(chain, self._fieldList) if useAtoms else None
 
-            # For each Level add a node, except the first and the last.
-            for level in self._levels[1:-1]:
+        reported = set()
 
-                newNode = Node(level)
-                newNode.autoConnect()
-                nodes.append(newNode)
+        writer = self._openReport(reportsPath)
+        writer.write(f"\nSe encontraron las siguientes redundancias e inconsistencias en el set de reglas:\n")
 
-            # Add the decision Node at the end.
-            decisionNode = self._getDecisionNode(rule.getDecision())
-            nodes.append(decisionNode)
+        # Report the rules that claimed some packets of each one
+        def report(pair, redundant):
+            if pair not in reported:
+                reported.add(pair)
+                if redundant:
+                    self._writeRedundancy(writer, chain, pair)
+                else:
+                    self._writeInconsistency(writer, chain, pair)
 
-            # Iterate through the Nodes and connect it with Edges.
-            for j in range(1, len(nodes)):
+        self._streamRules(chain.getRules(), encoder, report)
 
-                elements = rule.getOption(nodes[j-1].getLevel().getField().getName())
-                elementSet = ElementSet.createElementSet(nodes[j-1].getLevel().getField().getType(), elements if elements else [])
-                newEdge = Edge([rule.getId()], nodes[j-1], nodes[j], elementSet)
-                newEdge.autoConnect()
+        if writer != sys.stdout:
+            writer.close()
 
+        # The nodes can be modified from now on
+        for level in self._levels:
+            level.clearUniqueTable()
 
-    def _sanityFirstLevels(self) -> None:
-        """ 
-        Sanitizes all first-level nodes of the FDD, except the last one, as it requires a different treatment. 
+        return encoder
+
+    def _streamRules(self, rules: List[Rule], encoder: AtomEncoder, report) -> Node:
         """
+        Insert the rules one by one in priority order, from the root of the FDD, and release
+        the versions of the root that are replaced.
 
-        newIndex = 0
+        Args:
+            rules: Rules to insert.
+            encoder: Encoder of the labels, or None.
+            report: Function called with the ((claimingRuleId, ruleId), redundant) findings, or None.
 
-        # Iterate the firsts levels, except the last two.
+        Returns:
+            Node: The root of the FDD.
+        """
+        root = self._levels[0].getNodes()[0]
+
+        # Position and sets of each rule inserted, to find the rules that claimed the packets of an edge
+        positions = {}
+        values = {}
+
+        for position, rule in enumerate(rules):
+
+            sets = []
+            for level in self._levels[:-1]:
+                elements = rule.getOption(level.getField().getName())
+                elementSet = ElementSet.createElementSet(level.getField().getType(), elements if elements else [])
+                if encoder is not None:
+                    elementSet = encoder.encode(level.getField().getName(), elementSet)
+                sets.append(elementSet)
+
+            findings = []
+            newRoot = self._streamInsert(root, sets, rule.getId(), self._getDecisionNode(rule.getDecision()), findings)
+
+            if newRoot is not None:
+                self._releaseNode(root)
+                root = newRoot
+
+            positions[rule.getId()] = position
+            values[rule.getId()] = sets
+
+            if report is None:
+                continue
+
+            for ids, box, claimedDecision in findings:
+                for claimingId in self._claimingIds(ids, box, values, positions):
+                    report((claimingId, rule.getId()), claimedDecision == rule.getDecision())
+
+        return root
+
+    def _genBlocks(self, chain: Chain, reportsPath: str = None, useAtoms: bool = False, blockSize: int = 1000,
+                   workers: int = 1) -> None:
+        """
+        Generate the FDD splitting the chain in blocks of consecutive rules. The FDD of each block is
+        generated by streaming, in a worker process if workers > 1, and the FDDs of the blocks are merged
+        pairwise in a balanced tree, so the last rules aren't inserted in a deep FDD one by one.
+        The completeness is not achieved here.
+
+        Args:
+            chain: Chain from which the rules are extracted.
+            reportsPath: Path to the report file. If None, the report will be output to stdout.
+            useAtoms: If True, the labels of each block are encoded as AtomSets over its atoms while it's generated.
+            blockSize: Number of rules of each block.
+            workers: Number of worker processes that generate the blocks.
+        """
+        if blockSize < 1:
+            raise ValueError(f"Block size must be positive, not {blockSize}")
+
+        # Set FDD Name
+        self._name = chain.getName()
+
+        # Check that all predicates in the Rules are in the fieldList. If anyone not are include raise an error.
+        fields = [level.getField().getName() for level in self._levels]
+        for rule in chain.getRules():
+            for predicate in rule.getPredicates():
+                if predicate not in fields:
+                    raise TypeError(f"Predicate {predicate} isn't include in FieldList")
+
+        rules = chain.getRules()
+        results = self._genBlockFDDs([rules[i:i + blockSize] for i in range(0, len(rules), blockSize)], useAtoms, workers,
+                                     findings=False)
+
+        reported = set()
+
+        # Position and values of each rule, to find the rules that claimed its packets
+        values = {}
+        positions = {}
+        for position, rule in enumerate(rules):
+            positions[rule.getId()] = position
+            values[rule.getId()] = [ElementSet.createElementSet(level.getField().getType(), rule.getOption(level.getField().getName()) or [])
+                                    for level in self._levels[:-1]]
+
+        writer = self._openReport(reportsPath)
+        writer.write(f"\nSe encontraron las siguientes redundancias e inconsistencias en el set de reglas:\n")
+
+        def report(pair, redundant):
+            if pair not in reported:
+                reported.add(pair)
+                if redundant:
+                    self._writeRedundancy(writer, chain, pair)
+                else:
+                    self._writeInconsistency(writer, chain, pair)
+
+        roots = [fdd.getLevels()[0].getNodes()[0] if fdd.getLevels()[0].getNodes() else None for fdd, _ in results]
+
+        # Merge the blocks pairwise, the first one of each pair has the higher priority
+        while len(roots) > 1:
+            merged = []
+            for i in range(0, len(roots) - 1, 2):
+                merged.append(self._applyNodes(roots[i], roots[i+1], 0, {}))
+            if len(roots) % 2:
+                merged.append(roots[-1])
+            roots = merged
+
+        root = self._applyNodes(roots[0], None, 0, {}) if roots else None
+
+        # The findings of a block don't know the packets claimed by the previous blocks, so the packets
+        # of each rule are looked up in the merged FDD, whose edges have the ids of the claiming rules
+        if root is not None:
+            for rule in rules:
+                findings = []
+                self._findClaims(root, values[rule.getId()], findings)
+                for ids, box, claimedDecision in findings:
+                    for claimingId in self._claimingIds(ids, box, values, positions):
+                        if claimingId != rule.getId():
+                            report((claimingId, rule.getId()), claimedDecision == rule.getDecision())
+
+        if writer != sys.stdout:
+            writer.close()
+
+        # Only the nodes reachable from the last root are kept
+        for node in list(self._levels[0].getNodes()):
+            if node is not root:
+                self._releaseNode(node)
+        if root is None:
+            Node(self._levels[0]).autoConnect()
+
+        # The nodes can be modified from now on
+        for level in self._levels:
+            level.clearUniqueTable()
+
+    def _genBlockFDDs(self, blocks: List[List[Rule]], useAtoms: bool, workers: int, defaultDecision: str = None,
+                      findings: bool = True) -> list:
+        """
+        Generate the partial FDDs of some blocks of rules, with the levels of this FDD.
+
+        Args:
+            blocks: Rules of each block.
+            useAtoms: Encode the labels over the atoms of each block while it's generated.
+            workers: Number of worker processes. If it's 1, the blocks are generated in this process.
+            defaultDecision: If given, the nodes of each block below the root are completed with this
+                             decision, and the FDD of the block is reduced.
+            findings: Find the rules that claim packets of other ones in each block.
+
+        Returns:
+            List with the (FDD, findings) tuple of each block, as returned by _genBlockFDD.
+        """
+        genBlock = partial(_genBlockFDD, self._fieldList, self.getFieldOrder() + self._prunedFields,
+                           self._prunedFields, useAtoms, defaultDecision, findings)
+
+        if workers > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(genBlock, blocks))
+
+        return [genBlock(block) for block in blocks]
+
+    def _genShards(self, chain: Chain, reportsPath: str = None, useAtoms: bool = False, shards: int = 2,
+                   workers: int = 1) -> None:
+        """
+        Generate the FDD splitting the domain of the first level in disjoint shards. Each shard gets the
+        rules that intersect it, clipped to it, and its FDD is generated and reduced independently, in
+        a worker process if workers > 1. The outgoing edges of the roots of the shards are stitched
+        under a single root. The shards are unions of the pieces of the domain matched by the same rules,
+        grouped so that each one has a similar number of rules.
+        The nodes below the root are completed in the shards, so they can be reduced, but the
+        completeness of the root is not achieved here.
+
+        Args:
+            chain: Chain from which the rules are extracted.
+            reportsPath: Path to the report file. If None, the report will be output to stdout.
+            useAtoms: If True, the labels of each shard are encoded as AtomSets over its atoms while it's generated.
+            shards: Maximum number of shards.
+            workers: Number of worker processes that generate the shards.
+        """
+        if shards < 1:
+            raise ValueError(f"Number of shards must be positive, not {shards}")
+
+        # Set FDD Name
+        self._name = chain.getName()
+
+        # Check that all predicates in the Rules are in the fieldList. If anyone not are include raise an error.
+        fields = [level.getField().getName() for level in self._levels]
+        for rule in chain.getRules():
+            for predicate in rule.getPredicates():
+                if predicate not in fields:
+                    raise TypeError(f"Predicate {predicate} isn't include in FieldList")
+
+        field = self._levels[0].getField()
+        rules = chain.getRules()
+        domain = ElementSetRegistry.getElementSetClass(field.getType()).getDomain()
+        sets = [ElementSet.createElementSet(field.getType(), rule.getOption(field.getName()) or []) if rule.getOption(field.getName())
+                else domain for rule in rules]
+
+        # Group the pieces in shards with a similar number of rules (index 0 is the domain)
+        pieces = domain.coverPartition([domain] + sets)
+        target = sum(len(cover) - 1 for _, cover in pieces) / shards
+        groups = [[]]
+        weight = 0
+        for piece, cover in pieces:
+            if weight >= target and len(groups) < shards:
+                groups.append([])
+                weight = 0
+            groups[-1].append(piece)
+            weight += len(cover) - 1
+
+        blocks = []
+        for group in groups:
+            shard = group[0]
+            for piece in group[1:]:
+                shard = shard.unionSet(piece)
+
+            # The rules of the shard, clipped to it
+            block = []
+            for rule, elementSet in zip(rules, sets):
+                if elementSet.isOverlapping(shard):
+                    clipped = Rule(rule.getId())
+                    for predicate, values in rule.getPredicates().items():
+                        clipped.setPredicate(predicate, values)
+                    clipped.setPredicate(field.getName(), elementSet.intersectionSet(shard).getElementsList())
+                    clipped.setDecision(rule.getDecision())
+                    block.append(clipped)
+            blocks.append(block)
+
+        results = self._genBlockFDDs(blocks, useAtoms, workers, chain.getDefaultDecision())
+
+        reported = set()
+
+        writer = self._openReport(reportsPath)
+        writer.write(f"\nSe encontraron las siguientes redundancias e inconsistencias en el set de reglas:\n")
+
+        # Stitch the edges of the roots of the shards, copying their subgraphs
+        specs = []
+        memo = {}
+        levels = {level.getField().getName(): level for level in self._levels[:-1]}
+        for fdd, findings in results:
+            for pair, redundant in findings:
+                if pair not in reported:
+                    reported.add(pair)
+                    if redundant:
+                        self._writeRedundancy(writer, chain, pair)
+                    else:
+                        self._writeInconsistency(writer, chain, pair)
+            for node in fdd.getLevels()[0].getNodes():
+                for edge in node.getOutgoing():
+                    specs.append((edge.getId(), edge.getElementSet(), self._copyNode(edge.getDestination(), levels, memo)))
+
+        if writer != sys.stdout:
+            writer.close()
+
+        root = self._uniqueNode(self._levels[0], specs) if specs else None
+
+        for node in list(self._levels[0].getNodes()):
+            if node is not root:
+                self._releaseNode(node)
+        if root is None:
+            Node(self._levels[0]).autoConnect()
+
+        # The nodes can be modified from now on
+        for level in self._levels:
+            level.clearUniqueTable()
+
+    def _copyNode(self, node: Node, levels: dict, memo: dict) -> Node:
+        """
+        Copy the subgraph of a node of another FDD into this one. The FDD may be reduced, so the
+        levels of the nodes are found by the names of their fields.
+
+        Args:
+            node: Node to copy.
+            levels: Dict with the levels of this FDD by the name of their field, without the decision level.
+            memo: Dict with the copies of the nodes already copied, by their id.
+
+        Returns:
+            Node: The copy of the node.
+        """
+        if id(node) in memo:
+            return memo[id(node)]
+
+        level = levels.get(node.getLevel().getField().getName())
+        if level is None:
+            copy = self._getDecisionNode(node.getName())
+        else:
+            copy = Node(level)
+            copy.autoConnect()
+            for edge in node.getOutgoing():
+                newEdge = Edge(list(edge.getId()), copy, self._copyNode(edge.getDestination(), levels, memo), edge.getElementSet())
+                newEdge.autoConnect()
+
+        memo[id(node)] = copy
+        return copy
+
+    def merge(self, other: "FDD", reportsPath: str = None) -> None:
+        """
+        Merge another FDD into this one, with lower priority (first match): the packets that aren't
+        matched in this FDD get the decision of the other one. The FDDs must have the same levels,
+        and they must be partial, generated with complete=False, as the paths that are added to
+        achieve completeness match every packet. The result is partial too.
+        The pairs of nodes are merged once, as in the apply operation of the BDDs.
+
+        Args:
+            other: FDD with lower priority.
+            reportsPath: Path to the report of the rules of the other FDD whose packets are claimed by
+                         this one. If None, the report will be output to stdout.
+        """
+        if other.getFieldOrder() != self.getFieldOrder():
+            raise ValueError(f"FDD {other.getName()} doesn't have the same levels than {self._name}")
+
+        for fdd in (self, other):
+            if any(-1 in edge.getId() for level in fdd.getLevels()[:-1] for node in level.getNodes() for edge in node.getOutgoing()):
+                raise ValueError(f"FDD {fdd.getName()} is complete, it can't be merged")
+
+        writer = self._openReport(reportsPath)
+        writer.write(f"\nSe encontraron las siguientes redundancias e inconsistencias entre {self._name} y {other.getName()}:\n")
+        reported = set()
+
+        def report(pair, redundant):
+            if pair not in reported:
+                reported.add(pair)
+                if redundant:
+                    writer.write(f"\nRegla ID:{pair[0]} - Regla ID:{pair[1]}\nRedundancia resuelta\n")
+                else:
+                    writer.write(f"\nRegla ID:{pair[0]} - Regla ID:{pair[1]}\n")
+                    writer.write(f"Por tener mayor prioridad la regla ID:{pair[0]}, se conserva su decision para la interseccion entre ambas\n")
+
+        roots = [fdd.getLevels()[0].getNodes() for fdd in (self, other)]
+        root = self._applyNodes(roots[0][0] if roots[0] else None, roots[1][0] if roots[1] else None, 0, {}, report)
+
+        if writer != sys.stdout:
+            writer.close()
+
+        for node in list(self._levels[0].getNodes()):
+            if node is not root:
+                self._releaseNode(node)
+        if root is None:
+            Node(self._levels[0]).autoConnect()
+
+        for level in self._levels:
+            level.clearUniqueTable()
+
+    def _applyNodes(self, a: Node, b: Node, h: int, memo: dict, report=None) -> Node:
+        """
+        Get the node of this FDD that gives, for each packet, the decision of the subgraph of a if it
+        matches the packet, or else the decision of the subgraph of b (first match). The nodes may be
+        of other FDDs with the same levels. The result of each pair is memoised, and the nodes are
+        hash-consed in the unique tables of the levels.
+
+        Args:
+            a: Node of the level h with higher priority, or None.
+            b: Node of the level h with lower priority, or None.
+            h: Index of the level of the nodes.
+            memo: Dict with the results of the pairs already merged.
+            report: Function called with the ((claimingRuleId, ruleId), redundant) findings, or None.
+
+        Returns:
+            Node: The merged node, or None if neither of them matches a packet.
+        """
+        # The subgraphs of this FDD are shared instead of copied
+        if b is None and (a is None or a.getLevel() is self._levels[h]):
+            return a
+        if a is None and b.getLevel() is self._levels[h]:
+            return b
+
+        key = (id(a), id(b))
+        if key in memo:
+            return memo[key]
+
+        if h == len(self._levels) - 1:
+            result = self._getDecisionNode((a if a is not None else b).getName())
+            memo[key] = result
+            return result
+
+        edgesA = list(a.getOutgoing()) if a is not None else []
+        edgesB = list(b.getOutgoing()) if b is not None else []
+        edges = edgesA + edgesB
+
+        specs = []
+        if edges:
+            for piece, cover in type(edges[0].getElementSet()).coverPartition([edge.getElementSet() for edge in edges]):
+
+                edgeA = edges[cover[0]] if cover[0] < len(edgesA) else None
+                edgeB = next((edges[i] for i in cover if i >= len(edgesA)), None)
+
+                # At the last level, the rules of b are claimed by the rule of a
+                if report is not None and edgeA is not None and edgeB is not None and h == len(self._levels) - 2:
+                    for ruleId in edgeB.getId():
+                        report((edgeA.getId()[0], ruleId),
+                               edgeA.getDestination().getName() == edgeB.getDestination().getName())
+
+                child = self._applyNodes(edgeA.getDestination() if edgeA else None,
+                                         edgeB.getDestination() if edgeB else None, h + 1, memo, report)
+                # At the last level, the rules of b don't claim the packets of the piece if a matches them
+                if h == len(self._levels) - 2:
+                    ids = edgeA.getId() if edgeA else edgeB.getId()
+                else:
+                    ids = (edgeA.getId() if edgeA else []) + (edgeB.getId() if edgeB else [])
+                specs.append((ids, piece, child))
+
+        result = self._uniqueNode(self._levels[h], specs) if specs else None
+        memo[key] = result
+        return result
+
+    def _streamInsert(self, node: Node, sets: List[ElementSet], ruleId: int, decision: Node, findings: list,
+                      path: List[ElementSet] = ()) -> Node:
+        """
+        Get the version of a node with the packets of a rule that aren't claimed yet inserted in its subgraph.
+
+        Args:
+            node: Node where the rule is inserted.
+            sets: ElementSets of the rule, one for each level except the last.
+            ruleId: Id of the rule.
+            decision: Decision node of the rule.
+            findings: List where the (edgeIds, box, decisionName) tuples are appended when the rule overlaps
+                      with the previous ones at the last level. The ids and the decision are the ones of the
+                      edge whose packets are already claimed, and the box has the sets of those packets.
+            path: Sets of the packets of the rule in the path to the node, one for each level above it.
+
+        Returns:
+            Node: The new version of the node, or None if the rule doesn't change it.
+        """
+        h = self._levels.index(node.getLevel())
+        last = h == len(self._levels) - 2
+        ruleSet = sets[h]
+
+        covered = None
+        changed = False
+        specs = []
+
+        for edge in node.getOutgoing():
+
+            label = edge.getElementSet()
+            destination = edge.getDestination()
+
+            if not ruleSet.isOverlapping(label):
+                specs.append((edge.getId(), label, destination))
+                continue
+
+            intersection = ruleSet.intersectionSet(label)
+            covered = intersection if covered is None else covered.unionSet(intersection)
+
+            # At the last level, the packets are already claimed by a rule with higher priority
+            if last:
+                findings.append((edge.getId(), list(path) + [intersection], destination.getName()))
+                specs.append((edge.getId(), label, destination))
+                continue
+
+            child = self._streamInsert(destination, sets, ruleId, decision, findings, list(path) + [intersection])
+
+            if child is None or child is destination:
+                specs.append((edge.getId(), label, destination))
+                continue
+
+            # The intersection goes to the new version of the child
+            changed = True
+            rest = label.differenceSet(intersection)
+            if not rest.isEmpty():
+                specs.append((edge.getId(), rest, destination))
+            specs.append((edge.getId() + [ruleId], intersection, child))
+
+        # The packets that no rule claimed yet get a new path to the decision
+        left = ruleSet if covered is None else ruleSet.differenceSet(covered)
+        if not left.isEmpty():
+            changed = True
+            specs.append(([ruleId], left, self._streamPath(h + 1, sets, ruleId, decision)))
+
+        return self._uniqueNode(node.getLevel(), specs) if changed else None
+
+    def _streamPath(self, h: int, sets: List[ElementSet], ruleId: int, decision: Node) -> Node:
+        """
+        Get the node of the level h of the path of a rule, from that level to its decision.
+
+        Args:
+            h: Index of the first level of the path.
+            sets: ElementSets of the rule, one for each level except the last.
+            ruleId: Id of the rule.
+            decision: Decision node of the rule.
+
+        Returns:
+            Node: The first node of the path. If h is the last level, it's the decision node.
+        """
+        node = decision
+        for k in range(len(self._levels) - 2, h - 1, -1):
+            node = self._uniqueNode(self._levels[k], [([ruleId], sets[k], node)])
+        return node
+
+    def _findClaims(self, node: Node, sets: List[ElementSet], findings: list, path: List[ElementSet] = ()) -> None:
+        """
+        Find the edges of the last level with packets of a rule, without changing the FDD.
+
+        Args:
+            node: Node where the search starts.
+            sets: ElementSets of the rule, one for each level except the last.
+            findings: List where the (edgeIds, box, decisionName) tuples are appended, as in _streamInsert.
+            path: Sets of the packets of the rule in the path to the node, one for each level above it.
+        """
+        h = self._levels.index(node.getLevel())
+
+        for edge in node.getOutgoing():
+
+            if not sets[h].isOverlapping(edge.getElementSet()):
+                continue
+
+            intersection = sets[h].intersectionSet(edge.getElementSet())
+            if h == len(self._levels) - 2:
+                findings.append((edge.getId(), list(path) + [intersection], edge.getDestination().getName()))
+            else:
+                self._findClaims(edge.getDestination(), sets, findings, list(path) + [intersection])
+
+    def _claimingIds(self, ids: List[int], box: List[ElementSet], values: dict, positions: dict) -> List[int]:
+        """
+        Get the rules that claim the packets of a box, among the ids of the edge of the last level
+        whose path has the box. The ids of an edge are the rules that claimed packets through it, in
+        any path to the edge, so each rule (in priority order) claims the part of the box that the
+        previous ones left.
+
+        Args:
+            ids: Ids of the edge.
+            box: Sets of the packets, one for each level except the last.
+            values: Dict with the sets of each rule, by its id.
+            positions: Dict with the priority of each rule (0 is the highest), by its id.
+
+        Returns:
+            List[int]: Ids of the claiming rules, in priority order.
+        """
+        claiming = []
+        remaining = [box]
+
+        for ruleId in sorted((i for i in set(ids) if i in positions), key=positions.get):
+            ruleSets = values[ruleId]
+            if any(all(x.isOverlapping(y) for x, y in zip(part, ruleSets)) for part in remaining):
+                claiming.append(ruleId)
+                remaining = [piece for part in remaining for piece in self._subtractBox(part, ruleSets)]
+                if not remaining:
+                    break
+
+        return claiming
+
+    def _subtractBox(self, box: List[ElementSet], other: List[ElementSet]) -> List[List[ElementSet]]:
+        """
+        Split the packets of a box that aren't in another one in disjoint boxes.
+
+        Args:
+            box: Sets of the box, one for each level except the last.
+            other: Sets of the box to subtract.
+
+        Returns:
+            List with the sets of each box left.
+        """
+        if not all(x.isOverlapping(y) for x, y in zip(box, other)):
+            return [box]
+
+        pieces = []
+        for i in range(len(box)):
+            rest = box[i].differenceSet(other[i])
+            if not rest.isEmpty():
+                pieces.append([box[j].intersectionSet(other[j]) for j in range(i)] + [rest] + box[i+1:])
+
+        return pieces
+
+    def _uniqueNode(self, level: Level, specs: list) -> Node:
+        """
+        Get the node of a level with the given outgoing edges, creating it only if there isn't
+        an isomorphic one in the unique table of the level.
+        The edges to the same destination are merged, so isomorphic nodes have the same signature.
+        If a node already exists, its edges keep their ids, and at the last level the new ids are
+        added to them, so the ids of each edge are all the rules that claim packets through it.
+
+        Args:
+            level: Level of the node.
+            specs: List of (ids, label, destination) tuples with the outgoing edges.
+
+        Returns:
+            Node: The node of the unique table.
+        """
+        merged = {}
+        for ids, label, destination in specs:
+            key = id(destination)
+            if key in merged:
+                prevIds, prevLabel, _ = merged[key]
+                merged[key] = (prevIds + list(ids), prevLabel.unionSet(label), destination)
+            else:
+                merged[key] = (list(ids), label, destination)
+
+        signature = frozenset((label.intern(), key) for key, (_, label, _) in merged.items())
+        node = level.getUniqueNode(signature)
+
+        if node is None:
+            node = Node(level)
+            node.autoConnect()
+            for ids, label, destination in merged.values():
+                newEdge = Edge(sorted(set(ids)), node, destination, label)
+                newEdge.autoConnect()
+            level.addUniqueNode(signature, node)
+        elif level is self._levels[-2]:
+            for edge in node.getOutgoing():
+                edgeIds = edge.getId()
+                edge.extendId([i for i in set(merged[id(edge.getDestination())][0]) if i not in edgeIds])
+
+        return node
+
+    def _releaseNode(self, node: Node) -> None:
+        """
+        Remove a node that has no incoming edges, and the nodes that are only reachable through it.
+
+        Args:
+            node: Node to remove.
+        """
+        if node.getIncoming() or node.getLevel() is self._levels[-1]:
+            return
+
+        node.getLevel().delUniqueNode(node.getSignature(), node)
+        node.autoDisconnect()
+
+        for edge in node.getOutgoing():
+            edge.autoDisconnect()
+            self._releaseNode(edge.getDestination())
+
+    def _genPre(self, chain: Chain, useAtoms: bool = False) -> AtomEncoder:
+        """
+        Generate the preFDD based on the rules of the given chain.
+        A preFDD is a graph that no satisfy the rules to be a FDD still. 
+
+        Args:
+            chain: Chain from which the rules are extracted
+            useAtoms: If True, the labels of the edges are encoded as AtomSets over the atoms of the chain.
+
+        Returns:
+            AtomEncoder: The encoder used for the labels, or None if useAtoms is False.
+        """
+        # Set FDD Name
+        self._name = chain.getName()
+
+        # Check that all predicates in the Rules are in the fieldList. If anyone not are include raise an error.
+        fields = [level.getField().getName() for level in self._levels]
+        for rule in chain.getRules():
+            for predicate in rule.getPredicates():
+                if predicate not in fields:
+                    raise TypeError(f"Predicate {predicate} isn't include in FieldList")
+
+        encoder = AtomEncoder.fromChain(chain, self._fieldList) if useAtoms else None
+        
+        # Iterate through the list of Rules.
+        for rule in chain.getRules():
+
+            # Create a temporal list of Nodes to iterate later and connect the edges.
+            # The first element of the lit is the root node.
+            nodes = [self._levels[0].getNodes()[0]]
+
+            # For each Level add a node, except the first and the last.
+            for level in self._levels[1:-1]:
+
+                newNode = Node(level)
+                newNode.autoConnect()
+                nodes.append(newNode)
+
+            # Add the decision Node at the end.
+            decisionNode = self._getDecisionNode(rule.getDecision())
+            nodes.append(decisionNode)
+
+            # Iterate through the Nodes and connect it with Edges.
+            for j in range(1, len(nodes)):
+
+                elements = rule.getOption(nodes[j-1].getLevel().getField().getName())
+                elementSet = ElementSet.createElementSet(nodes[j-1].getLevel().getField().getType(), elements if elements else [])
+                if encoder is not None:
+                    elementSet = encoder.encode(nodes[j-1].getLevel().getField().getName(), elementSet)
+                newEdge = Edge([rule.getId()], nodes[j-1], nodes[j], elementSet)
+                newEdge.autoConnect()
+
+        return encoder
+
+
+    def _sanityFirstLevels(self) -> None:
+        """ 
+        Sanitizes all first-level nodes of the FDD, except the last one, as it requires a different treatment. 
+        """
+
+        newIndex = 0
+
+        # Iterate the firsts levels, except the last two.
         for h in range(len(self._levels[:-2])):
 
             level = self._levels[h]
@@ -1017,8 +2286,8 @@ class FDD:
                                 copiedEdge.autoConnect()
 
                             # Remove the intersection set elemnts from edge1 and edge2
-                            edge1.getElementSet().remove(intersectionSet)
-                            edge2.getElementSet().remove(intersectionSet)
+                            edge1.setElementSet(edge1.getElementSet().differenceSet(intersectionSet))
+                            edge2.setElementSet(edge2.getElementSet().differenceSet(intersectionSet))
 
                             # Check if edge2 is empty and if so we disconnect it.
                             if edge2.getElementSet().isEmpty():
@@ -1029,9 +2298,9 @@ class FDD:
                                 # If after desconection the node no have any incomming edge, remove all his outgoing edges and delete it.
                                 if len(orphanNode.getIncoming()) == 0:
 
-                                    while len(orphanNode.getOutgoing()) != 0:
+                                    for orphanEdge in orphanNode.getOutgoing():
 
-                                        orphanNode.getOutgoing()[0].autoDisconnect()
+                                        orphanEdge.autoDisconnect()
 
                                     orphanNode.autoDisconnect()
                             
@@ -1053,9 +2322,9 @@ class FDD:
                         # If after desconection the node no have any incomming edge, remove all his outgoing edges and delete it.
                         if len(orphanNode.getIncoming()) == 0:
 
-                            while len(orphanNode.getOutgoing()) != 0:
+                            for orphanEdge in orphanNode.getOutgoing():
 
-                                orphanNode.getOutgoing()[0].autoDisconnect()
+                                orphanEdge.autoDisconnect()
 
                             orphanNode.autoDisconnect()
 
@@ -1115,7 +2384,7 @@ class FDD:
                             # Sort the priorities and select the rule that has a higher priority (value closest to 0)
                             if sorted(edge1.getId())[0] <= sorted(edge2.getId())[0]:
 
-                                edge2.getElementSet().remove(intersectionSet)
+                                edge2.setElementSet(edge2.getElementSet().differenceSet(intersectionSet))
 
                                 # If edge2 is empty, delete it
                                 if edge2.getElementSet().isEmpty():
@@ -1124,7 +2393,7 @@ class FDD:
 
                             else:
 
-                                edge1.getElementSet().remove(intersectionSet)
+                                edge1.setElementSet(edge1.getElementSet().differenceSet(intersectionSet))
 
                                 # If edge1 is empty, delete it
                                 if edge1.getElementSet().isEmpty():
@@ -1143,7 +2412,7 @@ class FDD:
                             # Sort the priorities and select the rule that has a higher priority (value closest to 0)
                             if sorted(edge1.getId())[0] <= sorted(edge2.getId())[0]:
 
-                                edge2.getElementSet().remove(intersectionSet)
+                                edge2.setElementSet(edge2.getElementSet().differenceSet(intersectionSet))
 
                                 # If edge2 is empty, delete it
                                 if edge2.getElementSet().isEmpty():
@@ -1152,7 +2421,7 @@ class FDD:
 
                             else:
 
-                                edge1.getElementSet().remove(intersectionSet)
+                                edge1.setElementSet(edge1.getElementSet().differenceSet(intersectionSet))
 
                                 # If edge1 is empty, delete it
                                 if edge1.getElementSet().isEmpty():
@@ -1167,72 +2436,376 @@ class FDD:
                 
                 j = j + 1
 
-            i = i + 1
+            i = i + 1
+
+        self._writeSanityReport(chain, redundancies, inconsistencies, reportsPath)
+
+
+    def _sweepFirstLevels(self) -> None:
+        """
+        Sanitizes all first-level nodes of the FDD, except the last one, as _sanityFirstLevels does, but
+        splitting all the outgoing edges of each node at once.
+        The labels of the edges are split into disjoint pieces with a sweep (ElementSet.coverPartition).
+        The pieces covered by a single edge stay in it, and each piece covered by several edges gets a
+        new node, with the outgoing edges of all their destinations replicated.
+        """
+        for h in range(len(self._levels[:-2])):
+
+            nextLevel = self._levels[h+1]
+
+            for node in self._levels[h].getNodes():
+
+                # Copy the list, as the new edges are added to it
+                edges = list(node.getOutgoing())
+
+                if len(edges) < 2:
+                    continue
+
+                labels = [edge.getElementSet() for edge in edges]
+                kept = {}
+                shared = []
+
+                for piece, cover in type(labels[0]).coverPartition(labels):
+                    if len(cover) == 1:
+                        kept[cover[0]] = piece
+                    else:
+                        shared.append((piece, cover))
+
+                # Without overlaps there is nothing to split
+                if not shared:
+                    continue
+
+                for piece, cover in shared:
+
+                    newNode = Node(nextLevel)
+                    newNode.autoConnect()
+
+                    newEdge = Edge(list({ruleId for c in cover for ruleId in edges[c].getId()}), node, newNode, piece)
+                    newEdge.autoConnect()
+
+                    # Replicate all outgoing edges of the destinations of the covering edges in the new node.
+                    destinations = {id(edges[c].getDestination()): edges[c].getDestination() for c in cover}
+                    for destination in destinations.values():
+                        for outEdge in destination.getOutgoing():
+                            copiedEdge = outEdge.replicate()
+                            copiedEdge.setOrigin(newNode)
+                            copiedEdge.autoConnect()
+
+                for i, edge in enumerate(edges):
+
+                    if i in kept:
+                        edge.setElementSet(kept[i])
+                        continue
+
+                    # The edge has no elements left, so we disconnect it.
+                    orphanNode = edge.getDestination()
+                    edge.autoDisconnect()
+
+                    # If after desconection the node no have any incomming edge, remove all his outgoing edges and delete it.
+                    if len(orphanNode.getIncoming()) == 0:
+
+                        for orphanEdge in orphanNode.getOutgoing():
+
+                            orphanEdge.autoDisconnect()
+
+                        orphanNode.autoDisconnect()
+
+    def _sweepLastLevel(self, chain: Chain, reportsPath: str = None) -> None:
+        """
+        Sanitizes the last-level nodes of the FDD, as _sanityLastLevel does, but splitting all the
+        outgoing edges of each node at once.
+        Each piece of the labels (ElementSet.coverPartition) is kept only by the covering edge with
+        the highest priority, and the other covering edges are reported as redundant with it
+        (same decision) or inconsistent with it (different decision).
+
+        Args:
+            chain: Chain used to get the rules and include them in the report.
+            reportPath: Path to the report file. If None, the report will be output to stdout.
+        """
+        redundancies = set()
+        inconsistencies = set()
+
+        for node in self._levels[-2].getNodes():
+
+            edges = node.getOutgoing()
+
+            if len(edges) < 2:
+                continue
+
+            labels = [edge.getElementSet() for edge in edges]
+            kept = {}
+
+            for piece, cover in type(labels[0]).coverPartition(labels):
+
+                # The rule with higher priority (value closest to 0) keeps the piece. Ties keep the first edge.
+                winner = min(cover, key=lambda c: edges[c].getId()[0])
+                kept[winner] = kept[winner].unionSet(piece) if winner in kept else piece
+
+                for c in cover:
+                    if c == winner:
+                        continue
+                    pair = tuple(sorted((edges[winner].getId()[0], edges[c].getId()[0])))
+                    if edges[c].getDestination() is edges[winner].getDestination():
+                        redundancies.add(pair)
+                    else:
+                        inconsistencies.add(pair)
+
+            for i, edge in enumerate(edges):
+                if i in kept:
+                    edge.setElementSet(kept[i])
+                else:
+                    edge.autoDisconnect()
+
+        self._writeSanityReport(chain, redundancies, inconsistencies, reportsPath)
+
+    def _writeSanityReport(self, chain: Chain, redundancies: set, inconsistencies: set, reportsPath: str = None) -> None:
+        """
+        Writes the redundancies and inconsistencies found by the sanity of the last level.
+
+        Args:
+            chain: Chain used to get the rules and include them in the report.
+            redundancies: Set of (ruleId, ruleId) tuples with the same decision.
+            inconsistencies: Set of (ruleId, ruleId) tuples with different decisions. The first rule has priority.
+            reportPath: Path to the report file. If None, the report will be output to stdout.
+        """
+        writer = self._openReport(reportsPath)
+
+        writer.write(f"\nSe encontraron las siguientes redundacias en el set de reglas:\n")
+        for a in sorted(list(redundancies)):
+            self._writeRedundancy(writer, chain, a)
+
+        writer.write(f"\nSe encontraron las siguientes inconsistencias en el set de reglas:\n")
+        for b in sorted(list(inconsistencies)):
+            self._writeInconsistency(writer, chain, b)
+
+        if writer != sys.stdout:
+            writer.close()
+
+    def _openReport(self, reportsPath: str = None, mode: str = 'w'):
+        """
+        Opens the sanity report.
+
+        Args:
+            reportPath: Path to the report file. If None, or it can't be opened, the report will be output to stdout.
+            mode: Mode used to open the file ('w' to create it, 'a' to append to it).
+
+        Returns:
+            The writer of the report. It must be closed if it isn't sys.stdout.
+        """
+        if reportsPath == None:
+            return sys.stdout
+        try:
+            return open(reportsPath, mode)
+        except:
+            print(f"No se pudo abrir el archivo {reportsPath}, se escribirá en stdout")
+            return sys.stdout
+
+    def _writeRedundancy(self, writer, chain: Chain, pair: tuple) -> None:
+        """
+        Writes a redundancy between two rules in the sanity report.
+        """
+        writer.write(f"\n{chain.getRuleForId(pair[0])}\n{chain.getRuleForId(pair[1])}\nRedundancia resuelta\n")
+
+    def _writeInconsistency(self, writer, chain: Chain, pair: tuple) -> None:
+        """
+        Writes an inconsistency between two rules in the sanity report. The first rule has priority.
+        """
+        writer.write(f"\n{chain.getRuleForId(pair[0])}\n{chain.getRuleForId(pair[1])}\n")
+        writer.write(f"Por tener mayor prioridad la regla ID:{pair[0]}, se conserva la decision {chain.getRuleForId(pair[0]).getDecision()} para la interseccion entre ambas\n")
+
+
+    def _achieveCompleteness(self, defaultDecision: str, firstLevel: int = 0) -> None:
+        """
+        Check and achieve completeness in the nodes.
+
+        Args:
+            defaultDecision: Default decision for the paths not generated still.
+            firstLevel: Index of the first level whose nodes are completed.
+        """
+
+        for level in self._levels[firstLevel:-1]:
+
+            domain = ElementSetRegistry.getElementSetClass(level.getField().getType()).getDomain()
+
+            for node in level.getNodes():
+
+                covered = None
+
+                for edge in node.getOutgoing():
+
+                    covered = edge.getElementSet() if covered is None else covered.unionSet(edge.getElementSet())
+
+                left = domain if covered is None else covered.complement()
+
+                if not left.isEmpty():
+                    
+                    newEdge = Edge([-1], node, self._getDecisionNode(defaultDecision), left)
+                    newEdge.autoConnect()
+
+
+    def _decodeLabels(self) -> None:
+        """
+        Replace the AtomSets labels of the edges with the ElementSets they represent.
+        """
+        for level in self._levels[:-1]:
+            for node in level.getNodes():
+                for edge in node.getOutgoing():
+                    edge.setElementSet(AtomEncoder.decode(edge.getElementSet()))
+
+    def genFDD(self, chain: Chain, reportsPath: str = None, useAtoms: bool = True, sweep: bool = False, stream: bool = False,
+               pruneFields: bool = True, blockSize: int = None, shards: int = None, workers: int = 1, complete: bool = True) -> None:
+        """
+        Generates the FDD content.
+        First generates the PreFDD, after sanitizes it to convert it to FDD.
+        When useAtoms is True, the values of the rules are encoded as AtomSets before, so the
+        sanity is done with integer operations, and they are decoded before achieving completeness.
+        When sweep is True, the outgoing edges of each node are split all at once, instead of comparing
+        them in pairs. Each overlap is reported once, against the rule with the highest priority that
+        covers it, so the report may differ from the one of the pairwise sanity. When stream is True, there is no preFDD: the rules are inserted one by one.
+        When pruneFields is True, the levels of the fields that no rule constrains are removed before,
+        and they are reported at the end of the report.
+        When blockSize is given, the chain is split in blocks of rules whose FDDs are generated by
+        streaming, in parallel if workers > 1, and merged pairwise. When shards is given, the domain of
+        the first level is split instead, and the FDDs of the shards are stitched under the root.
+        
+        Args:
+            chain: Chain from which the rules are extracted.
+            reportsPath: Path to save sanity logs.
+            useAtoms: Encode the labels over the atoms of the chain during the sanity.
+            sweep: Sanitize the nodes with a sweep over their edges.
+            stream: Insert the rules one by one in priority order instead of sanitizing a preFDD.
+            pruneFields: Remove the levels of the fields that no rule constrains. addRuleToFDD inserts
+                         a removed level again when a new rule constrains its field.
+            blockSize: Number of rules of each block, or None to generate the whole chain at once.
+            shards: Number of shards of the domain of the first level, or None to generate it at once.
+            workers: Number of worker processes that generate the blocks or the shards.
+            complete: Achieve completeness with the default decision of the chain. A partial FDD
+                      can be merged with another one.
+        """
+        if pruneFields:
+            self._pruneLevels(chain)
+
+        if blockSize is not None:
+            self._genBlocks(chain, reportsPath, useAtoms, blockSize, workers)
+            encoder = None
+        elif shards is not None:
+            self._genShards(chain, reportsPath, useAtoms, shards, workers)
+            encoder = None
+        elif stream:
+            encoder = self._genStream(chain, reportsPath, useAtoms)
+        else:
+            encoder = self._genPre(chain, useAtoms)
+            if sweep:
+                self._sweepFirstLevels()
+                self._sweepLastLevel(chain, reportsPath)
+            else:
+                self._sanityFirstLevels()
+                self._sanityLastLevel(chain, reportsPath)
+        if encoder is not None:
+            self._decodeLabels()
+        if complete:
+            self._achieveCompleteness(chain.getDefaultDecision())
+
+        if self._prunedFields:
+            writer = self._openReport(reportsPath, 'a')
+            writer.write(f"\nCampos sin restricciones en la cadena (no se generaron sus niveles): {', '.join(self._prunedFields)}\n")
+            if writer != sys.stdout:
+                writer.close()
+
+    def _pruneLevels(self, chain: Chain) -> List[str]:
+        """
+        Removes the levels of the fields that no rule of the chain constrains, so every rule matches
+        their whole domain. The FDD must be empty. At least one level is kept.
 
-        # Generate report
-        if reportsPath == None:
-            writer = sys.stdout
-        else:
-            try:
-                writer = open(reportsPath, 'w')
-            except:
-                print(f"No se pudo abrir el archivo {reportsPath}, se escribirá en stdout")
-                writer = sys.stdout
+        Args:
+            chain: Chain from which the rules are extracted.
 
-        writer.write(f"\nSe encontraron las siguientes redundacias en el set de reglas:\n")
-        for a in sorted(list(redundancies)):
+        Returns:
+            List[str]: Names of the fields of the removed levels.
+        """
+        # Check that all predicates in the Rules are in the fieldList. If anyone not are include raise an error.
+        fields = [level.getField().getName() for level in self._levels]
+        for rule in chain.getRules():
+            for predicate in rule.getPredicates():
+                if predicate not in fields:
+                    raise TypeError(f"Predicate {predicate} isn't include in FieldList")
 
-            writer.write(f"\n{chain.getRuleForId(a[0])}\n{chain.getRuleForId(a[1])}\nRedundancia resuelta\n")
+        def constrained(level):
+            field = level.getField()
+            for rule in chain.getRules():
+                values = rule.getOption(field.getName())
+                if values and not ElementSet.createElementSet(field.getType(), values).isDomain():
+                    return True
+            return False
 
-        writer.write(f"\nSe encontraron las siguientes inconsistencias en el set de reglas:\n")
-        for b in sorted(list(inconsistencies)):
-            writer.write(f"\n{chain.getRuleForId(b[0])}\n{chain.getRuleForId(b[1])}\n")
-            writer.write(f"Por tener mayor prioridad la regla ID:{b[0]}, se conserva la decision {chain.getRuleForId(b[0]).getDecision()} para la interseccion entre ambas\n")
+        kept = [level for level in self._levels[:-1] if constrained(level)] or self._levels[:1]
 
-        if writer != sys.stdout:
-            writer.close()
+        pruned = [level.getField().getName() for level in self._levels[:-1] if level not in kept]
+        self._removeLevels(pruned)
 
+        return pruned
 
-    def _achieveCompleteness(self, defaultDecision: str) -> None:
+    def _removeLevels(self, fieldNames: List[str]) -> None:
         """
-        Check and achieve completeness in the nodes.
+        Removes the levels of the given fields from an empty FDD, and records them as pruned.
 
         Args:
-            defaultDecision: Default decision for the paths not generated still.
+            fieldNames: Names of the fields of the levels to remove.
         """
+        kept = [level for level in self._levels[:-1] if level.getField().getName() not in fieldNames]
 
-        for level in self._levels[:-1]:
+        if len(kept) == len(self._levels) - 1:
+            return
 
-            for node in level.getNodes():
+        # The root node moves to the first level that is kept
+        if kept[0] is not self._levels[0]:
+            for root in self._levels[0].getNodes():
+                root.autoDisconnect()
+            root = Node(kept[0])
+            root.autoConnect()
 
-                left = ElementSet.createElementSet(level.getField().getType(), [])
+        pruned = [level.getField().getName() for level in self._levels[:-1] if level not in kept]
+        self._levels = kept + [self._levels[-1]]
+        self._prunedFields = self._prunedFields + pruned
 
-                for edge in node.getOutgoing():
+    def _restoreLevel(self, fieldName: str) -> None:
+        """
+        Inserts again the level of a pruned field, before the first level whose field follows it in the
+        FieldList. The level is empty: the edges skip it, as in a reduced FDD, which is the same as a
+        single edge with the whole domain. If the level is the first one, the new root has that edge.
 
-                    left.remove(edge.getElementSet())
+        Args:
+            fieldName: Name of the pruned field.
+        """
+        fields = [field.getName() for field in self._fieldList.getFields()]
+        field = self._fieldList.getFields()[fields.index(fieldName)]
 
-                if not left.isEmpty():
-                    
-                    newEdge = Edge([-1], node, self._getDecisionNode(defaultDecision), left)
-                    newEdge.autoConnect()
+        position = next((h for h, level in enumerate(self._levels[:-1])
+                         if fields.index(level.getField().getName()) > fields.index(fieldName)), len(self._levels) - 1)
 
+        level = Level(field)
+        self._levels.insert(position, level)
+        self._prunedFields = [name for name in self._prunedFields if name != fieldName]
 
-    def genFDD(self, chain: Chain, reportsPath: str = None) -> None:
+        if position == 0:
+            oldRoot = self._levels[1].getNodes()[0]
+            root = Node(level)
+            root.autoConnect()
+            edge = Edge([-1], root, oldRoot, ElementSetRegistry.getElementSetClass(field.getType()).getDomain())
+            edge.autoConnect()
+            self._touchNode(root)
+
+    def getPrunedFields(self) -> List[str]:
         """
-        Generates the FDD content.
-        First generates the PreFDD, after sanitizes it to convert it to FDD.
-        
-        Args:
-            chain: Chain from which the rules are extracted.
-            reportsPath: Path to save sanity logs.
+        Get the names of the fields whose levels were pruned, because no rule of the chain constrains them
+
+        Returns:
+            List[str]: Names of the fields
         """
-        self._genPre(chain)
-        self._sanityFirstLevels()
-        self._sanityLastLevel(chain, reportsPath)
-        self._achieveCompleteness(chain.getDefaultDecision())
+        return self._prunedFields
 
 
-    def reduction(self) -> None:
+    def reduction(self, bottomUp: bool = True, pairwise: bool = False) -> Dict[str, Tuple[int, int]]:
         """
         Reduce the FDD by applying the 3 reductions:
             1. If there is a node v that has only one outgoing edge e, assuming e points to node
@@ -1247,14 +2820,130 @@ class FDD:
             1. No node in f has only one outgoing edge.
             2. No two nodes in f are isomorphic.
             3. No two nodes have more than one edge between them.
+
+        By default, the levels are reduced once each, from the last one to the first one, as the
+        destinations of the edges of a level are already reduced when it's processed. Otherwise,
+        the three reductions are applied over all the levels until none of them changes the FDD.
+
+        Args:
+            bottomUp: Reduce the FDD with a single pass from the last level to the first one.
+            pairwise: Find the isomorphic nodes comparing every pair of nodes of a level, instead of
+                      hashing them. It's only useful to check the hashing, and it implies bottomUp=False.
+
+        Returns:
+            Dict[reduction, (nodes, edges)]: The number of nodes and edges removed by each reduction:
+            'simpleNodes', 'isomorphicNodes' and 'mergedEdges'.
         """
+        # From now on, addRuleToFDD records the nodes it changes
+        self._dirtyNodes = []
+        self._uniqueIndexed = False
+        for level in self._levels:
+            level.clearUniqueTable()
+
+        if bottomUp and not pairwise:
+            return self._reduceBottomUp()
+
+        removed = {'simpleNodes': (0, 0), 'isomorphicNodes': (0, 0), 'mergedEdges': (0, 0)}
+        reductions = {'simpleNodes': self._removeSimpleNodes,
+                      'isomorphicNodes': self._removeIsomorphicNodesPairwise if pairwise else self._removeIsomorphicNodes,
+                      'mergedEdges': self._mergeEdges}
+
         changed = True
         while changed:
             changed = False
-            changed |= self._removeSimpleNodes()
-            changed |= self._removeIsomorphicNodes()
-            changed |= self._mergeEdges()
-            
+            for name, reduction in reductions.items():
+                nodes, edges = self._countElements()
+                changed |= reduction()
+                nodesAfter, edgesAfter = self._countElements()
+                removed[name] = (removed[name][0] + nodes - nodesAfter, removed[name][1] + edges - edgesAfter)
+
+        return removed
+
+    def _countElements(self) -> Tuple[int, int]:
+        """
+        Count the nodes and the edges of the FDD.
+
+        Returns:
+            Tuple with the number of nodes and the number of edges.
+        """
+        nodes = sum(len(level.getNodes()) for level in self._levels)
+        edges = sum(len(node.getOutgoing()) for level in self._levels for node in level.getNodes())
+        return nodes, edges
+
+    def _reduceBottomUp(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Reduce the FDD with a single pass over the levels, from the last one to the first one.
+        In each node the edges to the same destination are merged, and then the node is removed
+        if it has only one outgoing edge (except in the first level), or if it's isomorphic to a
+        previous node of the level.
+
+        Returns:
+            Dict[reduction, (nodes, edges)]: The number of nodes and edges removed by each reduction.
+        """
+        simple = [0, 0]
+        isomorphic = [0, 0]
+        merged = 0
+
+        for h in range(len(self._levels) - 2, -1, -1):
+
+            kept = {}
+
+            for node in list(self._levels[h].getNodes()):
+
+                # Third reduction rule
+                seen = {}
+                for edge in list(node.getOutgoing()):
+                    destination = id(edge.getDestination())
+                    if destination in seen:
+                        seen[destination].setElementSet(seen[destination].getElementSet().unionSet(edge.getElementSet()))
+                        edge.autoDisconnect()
+                        merged += 1
+                    else:
+                        seen[destination] = edge
+
+                outgoing = node.getOutgoing()
+                if not outgoing:
+                    continue
+
+                # First reduction rule
+                if len(outgoing) == 1 and h > 0:
+                    edge = outgoing[0]
+                    self._redirectIncoming(node, edge.getDestination())
+                    edge.autoDisconnect()
+                    node.autoDisconnect()
+                    simple[0] += 1
+                    simple[1] += 1
+                    continue
+
+                # Second reduction rule
+                key = frozenset(Counter((edge.getElementSet(), id(edge.getDestination())) for edge in outgoing).items())
+                node_v = kept.setdefault(key, node)
+                if node_v is node:
+                    continue
+
+                self._redirectIncoming(node, node_v)
+                for edge in list(outgoing):
+                    edge.autoDisconnect()
+                node.autoDisconnect()
+                isomorphic[0] += 1
+                isomorphic[1] += len(outgoing)
+
+        return {'simpleNodes': tuple(simple), 'isomorphicNodes': tuple(isomorphic), 'mergedEdges': (0, merged)}
+
+    def _redirectIncoming(self, node: Node, target: Node) -> None:
+        """
+        Make all the edges that point to a node point to another one.
+
+        Args:
+            node: Node whose incoming edges are redirected.
+            target: New destination of the edges.
+        """
+        for incoming_edge in list(node.getIncoming()):
+            incoming_edge.autoDisconnect()
+            incoming_edge.setDestination(target)
+            incoming_edge.autoConnect()
+
+
     def _removeSimpleNodes(self) -> bool:
         """
         Apply the first reduction rule:
@@ -1299,10 +2988,52 @@ class FDD:
         Apply the second reduction rule:
         If there are two nodes v and v' that are isomorphic, then remove v' along with all 
         its outgoing edges, and make all edges that pointed to v' now point to v.
+
+        The nodes of each level are bucketed by their outgoing (label, destination) pairs, so
+        the isomorphic nodes are found with a single pass over the level. The first node of each
+        bucket is kept, as _removeIsomorphicNodesPairwise does.
+        """
+        changed = False
+        for level in self._levels[:-1]:
+
+            kept = {}
+
+            for node_v_prime in list(level.getNodes()):
+
+                if not node_v_prime.getOutgoing():
+                    continue
+
+                # Labels are interned, so the pairs are hashed cheaply. The counts keep the multiplicity
+                key = frozenset(Counter((edge.getElementSet(), id(edge.getDestination())) for edge in node_v_prime.getOutgoing()).items())
+
+                node_v = kept.setdefault(key, node_v_prime)
+                if node_v is node_v_prime:
+                    continue
+
+                # v_prime Edges now point to v
+                for incoming_edge in list(node_v_prime.getIncoming()):
+                    incoming_edge.autoDisconnect()
+                    incoming_edge.setDestination(node_v)
+                    incoming_edge.autoConnect()
+
+                # Remove v_prime's outgoing incidence
+                for edge in list(node_v_prime.getOutgoing()):
+                    edge.autoDisconnect()
+
+                node_v_prime.autoDisconnect()
+                changed = True
+
+        return changed
+
+    def _removeIsomorphicNodesPairwise(self) -> bool:
+        """
+        Apply the second reduction rule comparing every pair of nodes of each level with _areIsomorphic.
+        It's slower than _removeIsomorphicNodes, and it's kept to check it (reduction(pairwise=True)).
         """
         changed = False
         for level in self._levels[:-1]: 
             nodes_to_remove = []
+            removed = set()
             
             # Convert nodes list to a temporary list to avoid modification issues
             nodes = list(level.getNodes())
@@ -1310,31 +3041,36 @@ class FDD:
             # Check consecutive Nodes using indices
             for i in range(len(nodes)):
                 node_v = nodes[i]
+                if node_v in removed:
+                    continue
                 for j in range(i + 1, len(nodes)):
                     node_v_prime = nodes[j]
+                    if node_v_prime in removed:
+                        continue
                     # Check if Nodes are Isomorphic
                     if self._areIsomorphic(node_v, node_v_prime):
                         # print(f'\tREMOVING ISOMORPHIC NODES {node_v} - {node_v_prime}')
                         
                         # v_prime Edges now point to v
                         # print(f'\t{node_v_prime} Edges now point to {node_v}:')
-                        for incoming_edge in node_v_prime.getIncoming():
+                        for incoming_edge in list(node_v_prime.getIncoming()):
                             incoming_edge.autoDisconnect()
                             incoming_edge.setDestination(node_v)
                             # print(f'\tUpdated Edge {incoming_edge}')
                             incoming_edge.autoConnect()
                         
                         # Remove v_prime's outgoing incidence 
-                        for edge in node_v_prime.getOutgoing():
+                        for edge in list(node_v_prime.getOutgoing()):
                             edge.autoDisconnect()
                         
                         # Mark node_v_prime for removal
                         nodes_to_remove.append(node_v_prime)
+                        removed.add(node_v_prime)
                         changed = True
             
             # Remove all marked nodes after iteration
             for node in nodes_to_remove:
-                if node in level.getNodes():
+                if level.hasNode(node):
                     node.autoDisconnect()
                     # print(f'Removed Isomorphic node {node} from {level.getField().getName()} Level')
         
@@ -1392,71 +3128,111 @@ class FDD:
         if len(node_a.getOutgoing()) == 0 or len(node_a.getOutgoing()) != len(node_b.getOutgoing()):
             return False
         
-        for edge_v in node_a.getOutgoing():
-            match = False
-            for edge_v_prime in node_b.getOutgoing():
-                # print(f'\t{edge_v}: {edge_v.getElementSet().getElements()}\n'
-                    #  f'\t{edge_v_prime}: {edge_v_prime.getElementSet().getElements()}')
-                if (edge_v.getDestination() == edge_v_prime.getDestination() 
-                    and edge_v.getElementSet() == edge_v_prime.getElementSet()):
-                    match = True
-                else:
-                    match = False
-                    break
-            if not match:
-                return False
-        
-        return True
+        # Labels are interned, so the (destination, label) pairs can be matched through hashing
+        edges_a = Counter((edge.getDestination(), edge.getElementSet()) for edge in node_a.getOutgoing())
+        edges_b = Counter((edge.getDestination(), edge.getElementSet()) for edge in node_b.getOutgoing())
+
+        return edges_a == edges_b
     
 
-    def marking(self) -> None:
+    def marking(self, changed: List[Node] = None, costModel: str = None) -> None:
         """
         Compute the load for each node in the FDD.
             1. Compute the load of each terminal node v in f as follows: load(v) := 1
-            2. WHILE 
-            there is a node v whose load has not yet been computed, suppose v has k
-            out edges e_1, ..., e_k and these edges point to nodes v_1, ..., v_k respectively,
-            and the loads of these k nodes have been computed
+            2. FOR each level, from the last non-terminal one to the first one
             DO
-                a. Among the k edges e_1, ..., e_k, choose an edge e_j with the largest values
-                of (load(e_j) - 1) * load(v_j), and mark edge e_j with "all"
-                b. Compute the load of v as follows: load(v) := Sum (from i=1 to i=k) (load(e_i) * load(v_i))
+                FOR each node v of the level, suppose v has k out edges e_1, ..., e_k and these
+                edges point to nodes v_1, ..., v_k respectively (their loads have been computed,
+                as the edges always go to the next levels)
+                DO
+                    a. Among the k edges e_1, ..., e_k, choose an edge e_j with the largest values
+                    of (load(e_j) - 1) * load(v_j), and mark edge e_j with "all"
+                    b. Compute the load of v as follows: load(v) := Sum (from i=1 to i=k) (load(e_i) * load(v_i))
             END
-            
+
         In a Marked version of an FDD exactly one outgoing edge of each non-terminal node is marked "All" (or "Any").
         Since all the edge's labels do not change, the semantics of a marked and a non-marked FDD are the same.
+
+        Along with the load, each node keeps the cost of the output of its subtree: the rules that firewallGen
+        generates for it, the lines that IpTablesParser.compose writes for them (a line for each combination of
+        the values of the composed fields), and the predicate checks of a packet that is compared with all
+        those lines. The cost model chooses the objective of step (a):
+            - 'rules': the load, as above.
+            - 'lines': the iptables lines.
+            - 'match': the predicate checks.
+        The cost of a node only depends on the costs of its children, so step (a) is a dynamic programming
+        over the nodes. It gives the minimum load and the minimum lines of the whole FDD. The checks of a
+        subtree also depend on the predicates above it, so 'match' estimates them with one predicate for
+        each level above the node.
+
+        The loads are kept in the nodes. When only some nodes changed since the last marking, their loads
+        and the loads of their ancestors are computed again, and the other ones are reused.
+
+        Args:
+            changed: Nodes whose outgoing edges changed since the last marking. If None, all the loads are computed.
+            costModel: Objective of the marking, one of _costModels_. If None, the one of the last marking is used.
+
+        Raises:
+            ValueError: If the cost model is unknown.
         """
+        if costModel is not None:
+            if costModel not in self._costModels_:
+                raise ValueError(f"Unknown cost model {costModel}, use one of {', '.join(self._costModels_)}")
+            if costModel != self._costModel:
+                self._costModel = costModel
+                changed = None
+
+        if changed is not None and self._levels[0].getNodes()[0].getCost() is not None:
+            self._markAncestors(changed)
+            return
 
-        # Step 0: Erase previous marking
+        # Step 1: Initialize the load of each terminal node to 1
         for level in self._levels:
             for node in level.getNodes():
-                node.setLoad(0)
-                for edge in node.getOutgoing():
-                    edge.markEdge(False)
-                    
-        # Step 1: Initialize the load of each terminal node to 1
-        last_level = self._levels[-1]  # Last Level has terminal Nodes
-        for node in last_level.getNodes():
-            if not node.getOutgoing():
-                node.setLoad(1)
+                if level is self._levels[-1] and not node.getOutgoing():
+                    self._markTerminal(node)
+                else:
+                    node.setLoad(0)
+                    node.setCost(None)
+
+        # Step 2: Compute the load for non-terminal nodes, in reverse topological order
+        for level in reversed(self._levels[:-1]):
+            for node in level.getNodes():
+                if node.getOutgoing():
+                    self._markNode(node)
+
+    def getPredictedSize(self) -> Dict[str, int]:
+        """
+        Get the size of the output of the marked FDD, before firewallGen runs. The rules and the
+        lines are the ones before the compaction, which can only remove some of them.
+
+        Returns:
+            Dict[str, int]: 'rules' generated by firewallGen, iptables 'lines' written for them, predicate
+            'checks' of a packet that doesn't match any of them, and 'load' of the root.
+
+        Raises:
+            ValueError: If the FDD isn't marked.
+        """
+        root = self._levels[0].getNodes()[0]
+        if root.getCost() is None:
+            raise ValueError("The FDD isn't marked")
+
+        rules, lines, checks = root.getCost()
+        return {'rules': rules, 'lines': lines, 'checks': checks, 'load': root.getLoad()}
+
+    def _keepsMarkedLabel(self, edge: Edge) -> bool:
+        """
+        Check if firewallGen writes the label of a marked edge instead of the domain of its field,
+        because it's a single element of the list of the predicate (an address, a network or a range).
+
+        Args:
+            edge: Marked edge.
+
+        Returns:
+            bool: True if the label is kept.
+        """
+        return edge.getElementsCount() == 1
 
-        # Step 2: Compute the load for non-terminal nodes
-        changed = True
-        while changed:
-            changed = False
-            for level in self._levels:
-                for node in level.getNodes():
-                    if node.getLoad() == 0 and all(dest.getLoad() != 0 for dest in (e.getDestination() for e in node.getOutgoing())):
-                        # (a) Select the edge with the largest (load(e_j) - 1) * load(v_j)
-                        best_edge = max(node.getOutgoing(), key=lambda e: (self._edgeLoad(e) - 1) * e.getDestination().getLoad())
-                        best_edge.markEdge()
-                        # print(f'Marking Edge {best_edge}')
-
-                        # (b) Compute the load of v
-                        node_load = sum(self._edgeLoad(e) * e.getDestination().getLoad() for e in node.getOutgoing())
-                        node.setLoad(node_load)
-                        changed = True
-                        
     def _edgeLoad(self, edge) -> int:
         """
         Compute the load of an edge based on its marking and its element set.
@@ -1469,9 +3245,9 @@ class FDD:
         """
         if edge.getMarking():
             return 1
-        return len(edge.getElementSet().getElementsList())
+        return edge.getElementsCount()
         
-    def firewallGen(self) -> Chain:
+    def firewallGen(self, compact: bool = True) -> Chain:
         """
         Generate a sequence of rules from the FDD, equivalent to this one,
         and then compact this set of rules.
@@ -1517,6 +3293,10 @@ class FDD:
         
         ---------------------------------------------------------------------------------------------
 
+        Args:
+            compact: Remove the redundant rules. If False, the rules are the ones of the first step,
+                     as predicted by getPredictedSize.
+
         Returns:
             Chain: Set of Rules equivalent to the FDD
         """
@@ -1535,19 +3315,17 @@ class FDD:
                     field = v.getLevel().getField() # Field of level
                     element_set = e.getElementSet() # Edge elementSet
     
-                    if not e.getMarking():  # Not marked with "all"
+                    if not e.getMarking() or self._keepsMarkedLabel(e):  # Not marked with "all", or EXCEPTION
                         matching_predicate[field] = element_set
                     else:
-                        if len(element_set.getElements()) == 1: # EXCEPTION
-                            matching_predicate[field] = element_set
-                        else:
-                            matching_predicate[field] = element_class.getDomain()  
+                        matching_predicate[field] = element_class.getDomain()
                         
                     resolving_predicate[field] = element_set 
     
-                # Set the predicates and decision for the rule
-                for field, values in matching_predicate.items():
-                    if values != ElementSetRegistry.getRegistry()[field.getType()].getDomain():
+                # Set the predicates and decision for the rule, in the order of the FieldList
+                for field in self._fieldList.getFields():
+                    values = matching_predicate.get(field)
+                    if values is not None and not values.isDomain():
                         rule.setPredicate(field.getName(), values.getElementsList())
                         rule.setMatchingPredicate(field.getName(), values)
                 
@@ -1573,12 +3351,15 @@ class FDD:
         # Step 1: Generate Rules from FDD
         dfs(self._levels[0].getNodes()[0], []) 
         
-        #return chain
-        #print(f'NOT COMPACTED CHAIN:\n{chain}\n\nCompacting Rules...')
+        if not compact:
+            return chain
 
         # Step 2: Compact Rules
         redundant = [False] * len(chain.getRules())
 
+        # Encode the predicates over their atoms, so the checks are integer operations
+        resolving, matching = self._encodePredicates(chain)
+
         # Mark redundant rules
         n = len(chain.getRules())
         for i in range(n - 1, -1, -1):
@@ -1586,14 +3367,14 @@ class FDD:
                 #print(f'CHECKING RULES {i} and {k}')
                 if (not redundant[k] and
                     self._sameDecision(chain[i], chain[k]) and
-                    self._implies(chain[i], chain[k])):
+                    self._implies(resolving[i], matching[k])):
                     # Check if rule i is redundant based on rule k
                     is_redundant = True
                     for j in range(i + 1, k):
                         #print(f'\tIntermediate rule check: {j}')
                         if (not redundant[j] and
                             not self._sameDecision(chain[i], chain[j]) and
-                            not self._mutuallyExclusive(chain[i], chain[j])):
+                            not self._mutuallyExclusive(resolving[i], matching[j])):
                             #print(f'\t\tRule {i} and rule {j} are NOT REDUNDANT.')
                             is_redundant = False
                             break
@@ -1631,7 +3412,37 @@ class FDD:
         #print(f'\tCheck sameDecision: Rule_{rule1.getId()} & Rule_{rule2.getId()} = {rule1.getDecision() == rule2.getDecision()}')
         return rule1.getDecision() == rule2.getDecision()
 
-    def _implies(self, rule1: Rule, rule2: Rule) -> bool:
+    def _encodePredicates(self, chain: Chain) -> tuple:
+        """
+        Encode the resolving and matching predicates of the rules of a chain as AtomSets, over the
+        atoms of all those predicates. The fields that aren't in a predicate are encoded as the domain.
+
+        Args:
+            chain (Chain): Chain with the rules generated by the FDD.
+
+        Returns:
+            tuple: Two lists, with the encoded resolving and matching predicates of each rule,
+                   as tuples with a value for each field of the fieldList.
+        """
+        fields = self._fieldList.getFields()
+        domains = [ElementSetRegistry.getElementSetClass(field.getType()).getDomain() for field in fields]
+
+        resolving = [[rule.getResolvingPredicate(field.getName(), dom) for field, dom in zip(fields, domains)] for rule in chain.getRules()]
+        matching = [[rule.getMatchingPredicate(field.getName(), dom) for field, dom in zip(fields, domains)] for rule in chain.getRules()]
+
+        sets = {field.getName(): {dom} for field, dom in zip(fields, domains)}
+        for predicates in resolving + matching:
+            for field, value in zip(fields, predicates):
+                sets[field.getName()].add(value)
+
+        encoder = AtomEncoder(self._fieldList, sets)
+
+        def encode(predicates):
+            return tuple(encoder.encode(field.getName(), value) for field, value in zip(fields, predicates))
+
+        return [encode(p) for p in resolving], [encode(p) for p in matching]
+
+    def _implies(self, resolving: tuple, matching: tuple) -> bool:
         """
         Check if rule1's resolving predicate implies rule2's matching predicate.
         
@@ -1641,45 +3452,31 @@ class FDD:
         Then, r_i.rp implies r_k.mp if and only if for every j, where 1 <= j <= d, the condition T_j ⊆ S_j holds.
         
         Args:
-            rule1 (Rule): First rule to compare.
-            rule2 (Rule): Second rule to compare.
+            resolving (tuple): Resolving predicate of the first rule, encoded by _encodePredicates.
+            matching (tuple): Matching predicate of the second rule, encoded by _encodePredicates.
             
         Returns:
             bool: True if rule1 predicate implies rule2 predicate, False otherwise.
         """
-        for field in self._fieldList.getFields():
-            field_dom = ElementSetRegistry.getElementSetClass(field.getType()).getDomain()
-            field_name = field.getName()
-            
-            option1 = rule1.getResolvingPredicate(field_name, field_dom)
-            option2 = rule2.getMatchingPredicate(field_name, field_dom)
-
-            #print(f'\tChecking predicates ({field.getName()}) {option1} - {option2}: {option1.isSubset(option2)}')
+        for option1, option2 in zip(resolving, matching):
             if not option1.isSubset(option2):
                 return False
         return True
     
-    def _mutuallyExclusive(self, rule1: Rule, rule2: Rule) -> bool:
+    def _mutuallyExclusive(self, resolving: tuple, matching: tuple) -> bool:
         """
         Check if rule1 and rule2 are mutually exclusive.
 
         Two rules are mutually exclusive if there are no common values across all fields.
 
         Args:
-            rule1 (Rule): First rule to compare.
-            rule2 (Rule): Second rule to compare.
+            resolving (tuple): Resolving predicate of the first rule, encoded by _encodePredicates.
+            matching (tuple): Matching predicate of the second rule, encoded by _encodePredicates.
 
         Returns:
             bool: True if rule1 and rule2 are mutually exclusive, False otherwise.
         """
-        for field in self._fieldList.getFields():
-            field_dom = ElementSetRegistry.getElementSetClass(field.getType()).getDomain()
-            field_name = field.getName()
-            
-            option1 = rule1.getResolvingPredicate(field_name, field_dom) 
-            option2 = rule2.getMatchingPredicate(field_name, field_dom)
-            
-            #print(f'\tChecking Mutual Exclusion {option1} - {option2}: {option1.isDisjoint(option2)}')
+        for option1, option2 in zip(resolving, matching):
             if option1.isDisjoint(option2):  # Check if they have any common elements
                 return True
         return False
@@ -1698,9 +3495,14 @@ class FDD:
         # Check that all predicates in the Rule are in the fieldList. If anyone not are include raise an error.
         fields_names = [level.getField().getName() for level in self._levels]
         for predicate in rule.getPredicates():
-            if predicate not in fields_names:
+            if predicate not in fields_names and predicate not in self._prunedFields:
                 raise TypeError(f"Predicate {predicate} isn't include in FieldList")
 
+        # The levels of the pruned fields that the rule constrains are inserted again
+        for predicate in rule.getPredicates():
+            if predicate in self._prunedFields and rule.getOption(predicate):
+                self._restoreLevel(predicate)
+
         nodes_next = [self._levels[0].getNodes()[0]]
 
         for i in range(len(self._levels[:-2])):
@@ -1715,13 +3517,7 @@ class FDD:
 
             for node in nodes:
 
-                edges = []
-
-                for outgoing in node.getOutgoing():
-
-                    if elementSet.isOverlapping(outgoing.getElementSet()):
-
-                        edges.append(outgoing)
+                edges = node.getOverlapping(elementSet)
 
                 for edge in edges:
                     
@@ -1729,6 +3525,8 @@ class FDD:
 
                     newNode = Node(self._levels[i+1])
                     newNode.autoConnect()
+                    self._touchNode(newNode)
+                    self._touchNode(node)
 
                     #Chequear que los nodos no vayan directamente a decision sin pasar por los otros lvls intermedios.
                     if edge.getDestination().getLevel() != self._levels[i+1]:
@@ -1744,11 +3542,12 @@ class FDD:
                             copiedEdge.setOrigin(newNode)
                             copiedEdge.autoConnect()
 
+                    # The label of the edge is shrunk before the new one is added, so they never overlap in the index
+                    edge.setElementSet(edge.getElementSet().differenceSet(intersectionSet))
+
                     newEdge = Edge(edge.getId() + [rule.getId()], edge.getOrigin(), newNode, intersectionSet)
                     newEdge.autoConnect()
 
-                    edge.getElementSet().remove(intersectionSet)
-
                     # If edge is empty, delete it
                     if edge.getElementSet().isEmpty():
                         
@@ -1758,9 +3557,9 @@ class FDD:
                         # If after desconection the node no have any incomming edge, remove all his outgoing edges and delete it.
                         if len(orphanNode.getIncoming()) == 0:
 
-                            while len(orphanNode.getOutgoing()) != 0:
+                            for orphanEdge in orphanNode.getOutgoing():
 
-                                orphanNode.getOutgoing()[0].autoDisconnect()
+                                orphanEdge.autoDisconnect()
 
                             orphanNode.autoDisconnect()
 
@@ -1776,28 +3575,265 @@ class FDD:
             elements = rule.getOption(field.getName())
             elementSet = ElementSet.createElementSet(field.getType(), elements if elements else [])
 
-            edges = []
-
-            for outgoing in node.getOutgoing():
-
-                    if elementSet.isOverlapping(outgoing.getElementSet()):
-
-                        edges.append(outgoing)
+            edges = node.getOverlapping(elementSet)
 
             for edge in edges:
 
                 intersectionSet = elementSet.intersectionSet(edge.getElementSet())
 
+                edge.setElementSet(edge.getElementSet().differenceSet(intersectionSet))
+
                 newEdge = Edge(edge.getId() + [rule.getId()], node, self._getDecisionNode(rule.getDecision()), intersectionSet)
                 newEdge.autoConnect()
-
-                edge.getElementSet().remove(intersectionSet)
+                self._touchNode(node)
 
                 if edge.getElementSet().isEmpty():
 
                     edge.autoDisconnect()
          
+    def _touchNode(self, node: Node) -> None:
+        """
+        Record a node changed by addRuleToFDD, so reduceIncremental reduces it again.
+
+        Args:
+            node: Changed node.
+        """
+        if self._dirtyNodes is not None:
+            self._dirtyNodes.append(node)
+
+    def reduceIncremental(self, costModel: str = None) -> Dict[str, Tuple[int, int]]:
+        """
+        Reduce and mark again only the nodes changed by addRuleToFDD since the last reduction, and
+        their ancestors. The levels are processed from the last one to the first one, as in the
+        bottom-up reduction: a changed node is removed if it has only one outgoing edge, or if it's
+        isomorphic to a node of the unique table of its level, and then the origins of its incoming
+        edges are changed too. The unique tables are filled with the nodes of the level the first time.
+        If the FDD wasn't reduced, it's fully reduced and marked.
+
+        Args:
+            costModel: Objective of the marking, as in marking. If it changes, the whole FDD is marked again.
+
+        Returns:
+            Dict[reduction, (nodes, edges)]: The number of nodes and edges removed by each reduction,
+            as returned by reduction.
+        """
+        if self._dirtyNodes is None:
+            removed = self.reduction()
+            self.marking(costModel=costModel)
+            return removed
+
+        index = {id(level): h for h, level in enumerate(self._levels)}
+
+        dirty = [{} for _ in self._levels]
+        for node in self._dirtyNodes:
+            if node.getLevel().hasNode(node):
+                dirty[index[id(node.getLevel())]][id(node)] = node
+
+        if not self._uniqueIndexed:
+            for h, level in enumerate(self._levels[:-1]):
+                level.clearUniqueTable()
+                for node in level.getNodes():
+                    if id(node) not in dirty[h] and node.getOutgoing() and level.getUniqueNode(node.getSignature()) is None:
+                        level.addUniqueNode(node.getSignature(), node)
+            self._uniqueIndexed = True
+
+        simple = [0, 0]
+        isomorphic = [0, 0]
+        merged = 0
+        changed = []
+
+        def touchParents(node):
+            for edge in node.getIncoming():
+                parent = edge.getOrigin()
+                dirty[index[id(parent.getLevel())]][id(parent)] = parent
+
+        for h in range(len(self._levels) - 2, -1, -1):
+
+            level = self._levels[h]
+
+            for node in list(dirty[h].values()):
+
+                if not level.hasNode(node):
+                    continue
+
+                # Third reduction rule
+                seen = {}
+                for edge in list(node.getOutgoing()):
+                    destination = id(edge.getDestination())
+                    if destination in seen:
+                        seen[destination].setElementSet(seen[destination].getElementSet().unionSet(edge.getElementSet()))
+                        edge.autoDisconnect()
+                        merged += 1
+                    else:
+                        seen[destination] = edge
+
+                outgoing = node.getOutgoing()
+                if not outgoing:
+                    continue
+
+                # First reduction rule
+                if len(outgoing) == 1 and h > 0:
+                    edge = outgoing[0]
+                    touchParents(node)
+                    self._redirectIncoming(node, edge.getDestination())
+                    edge.autoDisconnect()
+                    node.autoDisconnect()
+                    simple[0] += 1
+                    simple[1] += 1
+                    continue
+
+                # Second reduction rule, the entries of the table may be outdated
+                signature = node.getSignature()
+                node_v = level.getUniqueNode(signature)
+                if node_v is not None and node_v is not node and level.hasNode(node_v) and node_v.getSignature() == signature:
+                    touchParents(node)
+                    self._redirectIncoming(node, node_v)
+                    for edge in list(outgoing):
+                        edge.autoDisconnect()
+                    node.autoDisconnect()
+                    isomorphic[0] += 1
+                    isomorphic[1] += len(outgoing)
+                    continue
+
+                level.addUniqueNode(signature, node)
+                changed.append(node)
+
+        self._dirtyNodes = []
+
+        self.marking(changed, costModel)
+
+        return {'simpleNodes': tuple(simple), 'isomorphicNodes': tuple(isomorphic), 'mergedEdges': (0, merged)}
+
+    def _markAncestors(self, nodes: List[Node]) -> None:
+        """
+        Mark again the given nodes and their ancestors, from the last level to the first one.
+        The other nodes must be marked.
+
+        Args:
+            nodes: Nodes whose outgoing edges changed.
+        """
+        index = {id(level): h for h, level in enumerate(self._levels)}
+
+        pending = {id(node): node for node in nodes}
+        stack = list(nodes)
+        while stack:
+            for edge in stack.pop().getIncoming():
+                parent = edge.getOrigin()
+                if id(parent) not in pending:
+                    pending[id(parent)] = parent
+                    stack.append(parent)
+
+        # New decision nodes
+        for node in self._levels[-1].getNodes():
+            if node.getCost() is None:
+                self._markTerminal(node)
+
+        for node in sorted(pending.values(), key=lambda node: -index[id(node.getLevel())]):
+            self._markNode(node)
+
+    def _markTerminal(self, node: Node) -> None:
+        """
+        Set the load and the cost of a terminal node: a single rule and line, without predicates.
+
+        Args:
+            node: Terminal node.
+        """
+        node.setLoad(1)
+        node.setCost((1, 1, 0))
+
+    def _markNode(self, node: Node) -> None:
+        """
+        Mark the outgoing edges of a node and compute its load and cost, from the ones of its children.
+
+        Args:
+            node: Non-terminal node.
+        """
+        composed = node.getLevel().getField().getName() in self._composedFields_
+
+        # Each line of the subtree also checks the predicates of the levels above, at most one for each level
+        above = next(h for h, level in enumerate(self._levels) if level is node.getLevel()) if self._costModel == 'match' else 0
+        objective = {'rules': lambda saved: saved[0],
+                     'lines': lambda saved: saved[1],
+                     'match': lambda saved: saved[2] + above * saved[1]}[self._costModel]
+
+        # (load, lines, checks) of each edge when it isn't marked, and saved by marking it
+        total = [0, 0, 0]
+        rules = 0
+        savings = []
+        for edge in node.getOutgoing():
+            edge.markEdge(False)
+
+            destination = edge.getDestination()
+            destRules, destLines, destChecks = destination.getCost()
+            destLoad = destination.getLoad()
+            count = edge.getElementsCount()
+
+            # firewallGen only writes the predicate when the label isn't the domain,
+            # and a marked label when it has a single element
+            predicate = 0 if edge.getElementSet().isDomain() else 1
+            width = count if composed and predicate else 1
+            unmarked = (count * destLoad, width * destLines, width * (destChecks + predicate * destLines))
+            marked = (destLoad, destLines, destChecks + (predicate * destLines if self._keepsMarkedLabel(edge) else 0))
+
+            rules += destRules
+            for i in range(3):
+                total[i] += unmarked[i]
+            savings.append((edge, [unmarked[i] - marked[i] for i in range(3)]))
+
+        # (a) Select the edge that saves the most, the first one on ties
+        best_edge, saved = max(savings, key=lambda item: (objective(item[1]), item[1][0]))
+        best_edge.markEdge()
+
+        # (b) Compute the load and the cost of v
+        node.setLoad(total[0] - saved[0])
+        node.setCost((rules, total[1] - saved[1], total[2] - saved[2]))
+
     def _completeNode(self, edge: Edge, newNode: Node):
 
         newEdge = Edge([-1], newNode, edge.getDestination(), ElementSet.createElementSet(newNode.getLevel().getField().getType(), []))
         newEdge.autoConnect()
+
+
+def _genBlockFDD(fieldList: FieldList, fieldOrder: List[str], prunedFields: List[str], useAtoms: bool, defaultDecision: str,
+                 findings: bool, rules: List[Rule]) -> tuple:
+    """
+    Generates the partial FDD of a block of rules by streaming. It's a module function, so it can
+    be run in a worker process.
+
+    Args:
+        fieldList: FieldList of the FDD.
+        fieldOrder: Names of all the fields, in the order of the levels.
+        prunedFields: Names of the fields whose levels are removed.
+        useAtoms: Encode the labels over the atoms of the block while it's generated.
+        defaultDecision: If not None, the nodes below the root are completed with this decision and the
+                         FDD is reduced (the reduction needs the completeness).
+        findings: Find the rules that claim packets of other ones in the block.
+        rules: Rules of the block.
+
+    Returns:
+        Tuple with the FDD, whose first level only has the root, and the list of the
+        ((claimingRuleId, ruleId), redundant) findings (empty if findings is False).
+    """
+    fdd = FDD(fieldList, fieldOrder)
+    fdd._removeLevels(prunedFields)
+
+    block = Chain('block')
+    block.setRules(rules)
+    encoder = AtomEncoder.fromChain(block, fieldList) if useAtoms else None
+
+    found = []
+    root = fdd._streamRules(rules, encoder, (lambda pair, redundant: found.append((pair, redundant))) if findings else None)
+
+    for node in list(fdd.getLevels()[0].getNodes()):
+        if node is not root:
+            fdd._releaseNode(node)
+    for level in fdd.getLevels():
+        level.clearUniqueTable()
+
+    if encoder is not None:
+        fdd._decodeLabels()
+    if defaultDecision is not None:
+        fdd._achieveCompleteness(defaultDecision, 1)
+        fdd.reduction()
+
+    return fdd, found
@@ -0,0 +1,269 @@
+"""
+FDD struct-of-arrays storage module
+
+FDDArrays keeps the contents of an FDD in flat arrays, instead of a graph of Node and Edge objects.
+Nodes are numbered level by level, and edges are grouped by their origin node, so the outgoing
+edges of a node are a contiguous slice of the edge arrays (CSR layout). Labels are stored once,
+in a pool of interned ElementSets, and the edges keep the index of their label in the pool.
+"""
+
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+from fwoptimizer.core.fields import Field, ElementSet
+
+
+
+class FDDArrays:
+    """
+    Array backed storage of an FDD.
+
+    Nodes:
+        levelOffsets[l] .. levelOffsets[l+1]-1 are the indexes of the nodes of the level l.
+        nodeLoad, nodeName: Load and name of each node.
+        nodeAttributes: Dict with the attributes of the nodes that have them (sparse).
+    Edges:
+        outOffsets[n] .. outOffsets[n+1]-1 are the indexes of the outgoing edges of the node n.
+        inOffsets[n] .. inOffsets[n+1]-1 are the positions in inEdges of the incoming edges of the node n.
+        edgeOrigin, edgeDestination, edgeLabel, edgeMarked: Origin and destination node indexes,
+        label index in the pool and marking of each edge.
+        edgeIdOffsets[e] .. edgeIdOffsets[e+1]-1 are the positions in edgeIds of the rule ids of the edge e.
+        edgeAttributes: Dict with the attributes of the edges that have them (sparse).
+    """
+
+    def __init__(self, name: str, fields: List[Field]) -> None:
+        """
+        FDDArrays __init__. Creates an empty storage, use fromFDD to fill it from an FDD.
+
+        Args:
+            name: Name of the FDD.
+            fields: Fields of the levels, including the decision level.
+        """
+        self.name = name
+        self.fields = fields
+        self.decisions: Dict[str, int] = {}
+
+        self.levelOffsets = array('i', [0])
+        self.nodeLoad = array('q')
+        self.nodeName: List[str] = []
+        self.nodeAttributes: Dict[int, dict] = {}
+
+        self.outOffsets = array('i', [0])
+        self.inOffsets = array('i', [0])
+        self.inEdges = array('i')
+        self.edgeOrigin = array('i')
+        self.edgeDestination = array('i')
+        self.edgeLabel = array('i')
+        self.edgeMarked = array('b')
+        self.edgeIdOffsets = array('i', [0])
+        self.edgeIds = array('i')
+        self.edgeAttributes: Dict[int, dict] = {}
+
+        self.labels: List[ElementSet] = []
+        self._labelIndex: Dict[ElementSet, int] = {}
+
+    def __getstate__(self) -> dict:
+        """
+        FDDArrays __getstate__. The index of the label pool is rebuilt when unpickled.
+        """
+        state = self.__dict__.copy()
+        del state['_labelIndex']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        FDDArrays __setstate__
+        """
+        self.__dict__.update(state)
+        self._labelIndex = {label: i for i, label in enumerate(self.labels)}
+
+    def _labelId(self, elementSet: ElementSet) -> int:
+        """
+        Gets the index of a label in the pool, adding it if it's new.
+
+        Args:
+            elementSet: Label of an edge.
+
+        Returns:
+            int: The index of the label in the pool.
+        """
+        elementSet = elementSet.intern()
+        index = self._labelIndex.get(elementSet)
+        if index is None:
+            index = len(self.labels)
+            self.labels.append(elementSet)
+            self._labelIndex[elementSet] = index
+        return index
+
+    @classmethod
+    def fromFDD(cls, fdd) -> "FDDArrays":
+        """
+        Creates the array storage with the contents of an FDD.
+
+        Args:
+            fdd (FDD): FDD to store.
+
+        Returns:
+            FDDArrays: The storage of the FDD.
+        """
+        levels = fdd.getLevels()
+        arrays = cls(fdd.getName(), [level.getField() for level in levels])
+
+        # Number the nodes level by level
+        nodeIndex = {}
+        for level in levels:
+            for node in level.getNodes():
+                nodeIndex[node] = len(arrays.nodeName)
+                arrays.nodeName.append(node.getName())
+                arrays.nodeLoad.append(node.getLoad())
+                attributes = node.getAttributes()
+                if attributes:
+                    arrays.nodeAttributes[nodeIndex[node]] = dict(attributes)
+            arrays.levelOffsets.append(len(arrays.nodeName))
+
+        arrays.decisions = {name: nodeIndex[node] for name, node in fdd.getDecisions().items() if node in nodeIndex}
+
+        # Store the edges grouped by origin, keeping the order of the outgoing lists
+        edgeIndex = {}
+        for level in levels:
+            for node in level.getNodes():
+                for edge in node.getOutgoing():
+                    index = len(arrays.edgeOrigin)
+                    edgeIndex[id(edge)] = index
+                    arrays.edgeOrigin.append(nodeIndex[node])
+                    arrays.edgeDestination.append(nodeIndex[edge.getDestination()])
+                    arrays.edgeLabel.append(arrays._labelId(edge.getElementSet()))
+                    arrays.edgeMarked.append(1 if edge.getMarking() else 0)
+                    arrays.edgeIds.extend(edge.getId())
+                    arrays.edgeIdOffsets.append(len(arrays.edgeIds))
+                    attributes = edge.getAttributes()
+                    if attributes:
+                        arrays.edgeAttributes[index] = dict(attributes)
+                arrays.outOffsets.append(len(arrays.edgeOrigin))
+
+        # Keep the order of the incoming lists too
+        for level in levels:
+            for node in level.getNodes():
+                arrays.inEdges.extend(edgeIndex[id(edge)] for edge in node.getIncoming() if id(edge) in edgeIndex)
+                arrays.inOffsets.append(len(arrays.inEdges))
+
+        return arrays
+
+    def getNodesNum(self) -> int:
+        """
+        Gets the number of nodes.
+
+        Returns:
+            int: The number of nodes.
+        """
+        return len(self.nodeName)
+
+    def getEdgesNum(self) -> int:
+        """
+        Gets the number of edges.
+
+        Returns:
+            int: The number of edges.
+        """
+        return len(self.edgeOrigin)
+
+    def getElementsNum(self, filter: bool = False) -> int:
+        """
+        Gets the number of nodes and edges of the FDD.
+
+        Args:
+            filter: If True, count only the elements with filterVisibility == 'True'.
+
+        Returns:
+            int: The number of elements.
+        """
+        if not filter:
+            return self.getNodesNum() + self.getEdgesNum()
+
+        visible = [attrs.get('filterVisibility') == 'True' for attrs in
+                   (self.nodeAttributes.get(n, {}) for n in range(self.getNodesNum()))]
+        nodes = sum(visible)
+        edges = sum(1 for e in range(self.getEdgesNum())
+                    if visible[self.edgeOrigin[e]] and self.edgeAttributes.get(e, {}).get('filterVisibility') == 'True')
+        return nodes + edges
+
+    def levelNodes(self, level: int) -> range:
+        """
+        Gets the indexes of the nodes of a level.
+
+        Args:
+            level: Index of the level.
+
+        Returns:
+            range: The indexes of the nodes.
+        """
+        return range(self.levelOffsets[level], self.levelOffsets[level+1])
+
+    def outgoing(self, node: int) -> range:
+        """
+        Gets the indexes of the outgoing edges of a node.
+
+        Args:
+            node: Index of the node.
+
+        Returns:
+            range: The indexes of the edges.
+        """
+        return range(self.outOffsets[node], self.outOffsets[node+1])
+
+    def incoming(self, node: int) -> Iterator[int]:
+        """
+        Gets the indexes of the incoming edges of a node.
+
+        Args:
+            node: Index of the node.
+
+        Returns:
+            Iterator with the indexes of the edges.
+        """
+        return iter(self.inEdges[self.inOffsets[node]:self.inOffsets[node+1]])
+
+    def edgeIdsOf(self, edge: int) -> List[int]:
+        """
+        Gets the rule ids of an edge.
+
+        Args:
+            edge: Index of the edge.
+
+        Returns:
+            List[int]: The sorted ids of the edge.
+        """
+        return self.edgeIds[self.edgeIdOffsets[edge]:self.edgeIdOffsets[edge+1]].tolist()
+
+    def marking(self) -> Tuple[array, array]:
+        """
+        Computes the loads of the nodes and the marking of the edges, as FDD.marking does,
+        but with a single pass from the last level to the first one, and from scratch.
+
+        Returns:
+            Tuple with the new nodeLoad and edgeMarked arrays, that are stored too.
+        """
+        labelCount = array('q', (label.getElementsCount() for label in self.labels))
+        load = array('q', bytes(8 * self.getNodesNum()))
+        marked = array('b', bytes(self.getEdgesNum()))
+
+        for level in range(len(self.fields) - 1, -1, -1):
+            for node in self.levelNodes(level):
+
+                edges = self.outgoing(node)
+
+                if not edges:
+                    # Terminal nodes have load 1
+                    if level == len(self.fields) - 1:
+                        load[node] = 1
+                    continue
+
+                # The first edge with the largest (load(e) - 1) * load(v) is marked
+                best = max(edges, key=lambda e: (labelCount[self.edgeLabel[e]] - 1) * load[self.edgeDestination[e]])
+                marked[best] = 1
+
+                load[node] = sum((1 if marked[e] else labelCount[self.edgeLabel[e]]) * load[self.edgeDestination[e]] for e in edges)
+
+        self.nodeLoad = load
+        self.edgeMarked = marked
+        return load, marked
@@ -0,0 +1,154 @@
+"""
+Field order optimization module
+
+The size of an FDD depends on the order of its levels, as the size of a BDD depends on the order
+of its variables. FieldOrderOptimizer proposes some candidate orders for a chain, from cheap
+statistics of the values of its rules, and picks the one that gives the smallest reduced FDD
+for a prefix of the chain.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+from fwoptimizer.core.rules import Chain
+from fwoptimizer.core.fields import FieldList, ElementSet
+from fwoptimizer.core.fdd import FDD
+
+
+
+class FieldOrderOptimizer:
+    """
+    Chooses the order of the levels of the FDD of a chain.
+    """
+
+    def __init__(self, fieldList: FieldList, sampleRules: int = 50, maxValues: int = 200) -> None:
+        """
+        FieldOrderOptimizer __init__
+
+        Args:
+            fieldList: FieldList used by the firewall.
+            sampleRules: Number of rules of the prefix of the chain used to compare the candidate orders.
+                         If 0, the candidates aren't sampled and the first heuristic order is chosen.
+            maxValues: Maximum number of distinct values of a field compared to compute its overlap density.
+        """
+        self._fieldList = fieldList
+        self._sampleRules = sampleRules
+        self._maxValues = maxValues
+
+    def fieldStats(self, chain: Chain) -> Dict[str, Tuple[int, float, float]]:
+        """
+        Computes the statistics of the values of each field in the rules of a chain.
+
+        Args:
+            chain: Chain to analyze.
+
+        Returns:
+            Dict[fieldName, (distinct, wildcards, overlap)]: The number of distinct values of the field,
+            the fraction of the rules that don't constrain it, and the fraction of the pairs of distinct
+            values that overlap.
+        """
+        rules = chain.getRules()
+        stats = {}
+
+        for field in self._fieldList.getFields():
+
+            values = {}
+            wildcards = 0
+
+            for rule in rules:
+                option = rule.getOption(field.getName())
+                if option:
+                    values.setdefault(tuple(option), None)
+                else:
+                    wildcards += 1
+
+            sets = [ElementSet.createElementSet(field.getType(), list(value)) for value in list(values)[:self._maxValues]]
+            pairs = len(sets) * (len(sets) - 1) // 2
+            overlaps = sum(1 for i in range(len(sets)) for j in range(i + 1, len(sets)) if sets[i].isOverlapping(sets[j]))
+
+            stats[field.getName()] = (len(values), wildcards / len(rules) if rules else 0.0, overlaps / pairs if pairs else 0.0)
+
+        return stats
+
+    def candidateOrders(self, chain: Chain) -> Dict[str, List[str]]:
+        """
+        Proposes the candidate orders for a chain, from the statistics of its fields.
+
+        Args:
+            chain: Chain to analyze.
+
+        Returns:
+            Dict[heuristicName, List[fieldName]]: The candidate orders, without repetitions. The order
+            of the FieldList is always a candidate, named 'config'.
+        """
+        names = [field.getName() for field in self._fieldList.getFields()]
+        stats = self.fieldStats(chain)
+
+        heuristics = {
+            'distinctAsc': lambda name: stats[name][0],
+            'distinctDesc': lambda name: -stats[name][0],
+            'wildcardsAsc': lambda name: stats[name][1],
+            'wildcardsDesc': lambda name: -stats[name][1],
+            'overlapAsc': lambda name: (stats[name][2], -stats[name][0]),
+        }
+
+        candidates = {'config': names}
+        for heuristic, key in heuristics.items():
+            order = sorted(names, key=key)
+            if order not in candidates.values():
+                candidates[heuristic] = order
+
+        return candidates
+
+    def estimateSize(self, chain: Chain, order: List[str]) -> int:
+        """
+        Computes the number of elements of the reduced FDD of a chain with the given order.
+
+        Args:
+            chain: Chain to generate.
+            order: Names of the fields in the order of the levels.
+
+        Returns:
+            int: Number of nodes and edges of the reduced FDD.
+        """
+        fdd = FDD(self._fieldList, order)
+        fdd.genFDD(chain, os.devnull, stream=True)
+        fdd.reduction()
+        return fdd.getElementsNum()
+
+    def chooseOrder(self, chain: Chain) -> Tuple[List[str], dict]:
+        """
+        Chooses the order of the levels of the FDD of a chain.
+
+        Args:
+            chain: Chain to generate.
+
+        Returns:
+            Tuple with the names of the fields in the chosen order, and a dict with the report of the
+            choice: 'heuristic', 'order', 'sampledRules', 'sizes' (elements of each candidate for
+            the sample) and 'savings' (estimated fraction of elements saved with respect to 'config').
+        """
+        candidates = self.candidateOrders(chain)
+
+        if self._sampleRules <= 0 or not chain.getRules():
+            heuristic = next(name for name in candidates if name != 'config') if len(candidates) > 1 else 'config'
+            return candidates[heuristic], {'heuristic': heuristic, 'order': candidates[heuristic],
+                                           'sampledRules': 0, 'sizes': {}, 'savings': None}
+
+        sample = Chain(chain.getName())
+        sample.setDefaultDecision(chain.getDefaultDecision())
+        for rule in chain.getRules()[:self._sampleRules]:
+            sample.addRule(rule)
+
+        sizes = {heuristic: self.estimateSize(sample, order) for heuristic, order in candidates.items()}
+        heuristic = min(sizes, key=lambda name: (sizes[name], name != 'config'))
+
+        report = {
+            'heuristic': heuristic,
+            'order': candidates[heuristic],
+            'sampledRules': len(sample.getRules()),
+            'sizes': sizes,
+            'savings': 1 - sizes[heuristic] / sizes['config'] if sizes['config'] else 0.0,
+        }
+
+        return candidates[heuristic], report
@@ -1,14 +1,325 @@
 """_summary_
 """
 
-from typing import List, Set
+from typing import Iterator, List, Set, Tuple
+from collections import OrderedDict
 from abc import abstractmethod
+import keyword
+import weakref
 import netaddr as nt
-import portion as p
 import toml
 
 
 
+def _normalizeRanges(ranges: List[Tuple[int, int]]) -> Tuple[Tuple[int, int], ...]:
+    """
+    Sorts a list of integer ranges and merges the overlapping or adjacent ones.
+
+    Args:
+        ranges: List of (start, end) ranges, both ends included.
+
+    Returns:
+        Sorted, disjoint and non adjacent tuple of ranges.
+    """
+    normalized = []
+
+    for start, end in sorted(ranges):
+        if normalized and start <= normalized[-1][1] + 1:
+            if end > normalized[-1][1]:
+                normalized[-1] = (normalized[-1][0], end)
+        else:
+            normalized.append((start, end))
+
+    return tuple(normalized)
+
+
+def _rangesUnion(a: Tuple[Tuple[int, int], ...], b: Tuple[Tuple[int, int], ...]) -> Tuple[Tuple[int, int], ...]:
+    """
+    Union between two normalized tuples of ranges.
+
+    Args:
+        a: Normalized tuple of ranges.
+        b: Normalized tuple of ranges.
+
+    Returns:
+        Normalized tuple of ranges with the union.
+    """
+    if not a:
+        return b
+    if not b:
+        return a
+
+    union = []
+    i = j = 0
+
+    while i < len(a) or j < len(b):
+
+        if j >= len(b) or (i < len(a) and a[i][0] <= b[j][0]):
+            current = a[i]
+            i += 1
+        else:
+            current = b[j]
+            j += 1
+
+        if union and current[0] <= union[-1][1] + 1:
+            if current[1] > union[-1][1]:
+                union[-1] = (union[-1][0], current[1])
+        else:
+            union.append(current)
+
+    return tuple(union)
+
+
+def _rangesIntersection(a: Tuple[Tuple[int, int], ...], b: Tuple[Tuple[int, int], ...]) -> Tuple[Tuple[int, int], ...]:
+    """
+    Intersection between two normalized tuples of ranges.
+
+    Args:
+        a: Normalized tuple of ranges.
+        b: Normalized tuple of ranges.
+
+    Returns:
+        Normalized tuple of ranges with the intersection.
+    """
+    intersection = []
+    i = j = 0
+
+    while i < len(a) and j < len(b):
+
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+
+        if start <= end:
+            intersection.append((start, end))
+
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+
+    return tuple(intersection)
+
+
+def _rangesDifference(a: Tuple[Tuple[int, int], ...], b: Tuple[Tuple[int, int], ...]) -> Tuple[Tuple[int, int], ...]:
+    """
+    Difference between two normalized tuples of ranges (a - b).
+
+    Args:
+        a: Normalized tuple of ranges.
+        b: Normalized tuple of ranges to substract.
+
+    Returns:
+        Normalized tuple of ranges with the difference.
+    """
+    if not a or not b:
+        return a
+
+    difference = []
+    j = 0
+
+    for start, end in a:
+
+        # Skip the ranges of b that end before the current range
+        while j < len(b) and b[j][1] < start:
+            j += 1
+
+        k = j
+        while k < len(b) and b[k][0] <= end:
+            if b[k][0] > start:
+                difference.append((start, b[k][0] - 1))
+            start = max(start, b[k][1] + 1)
+            if start > end:
+                break
+            k += 1
+
+        if start <= end:
+            difference.append((start, end))
+
+    return tuple(difference)
+
+
+def _rangesOverlap(a: Tuple[Tuple[int, int], ...], b: Tuple[Tuple[int, int], ...]) -> bool:
+    """
+    Check if two normalized tuples of ranges have common elements.
+
+    Args:
+        a: Normalized tuple of ranges.
+        b: Normalized tuple of ranges.
+
+    Returns:
+        True if exist common elements. False otherwise.
+    """
+    i = j = 0
+
+    while i < len(a) and j < len(b):
+
+        if a[i][0] <= b[j][1] and b[j][0] <= a[i][1]:
+            return True
+
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+
+    return False
+
+
+def _rangesSubset(a: Tuple[Tuple[int, int], ...], b: Tuple[Tuple[int, int], ...]) -> bool:
+    """
+    Check if the normalized tuple of ranges 'a' is a subset of 'b'.
+
+    Args:
+        a: Normalized tuple of ranges.
+        b: Normalized tuple of ranges.
+
+    Returns:
+        True if every element of a is included in b. False otherwise.
+    """
+    j = 0
+
+    for start, end in a:
+
+        while j < len(b) and b[j][1] < start:
+            j += 1
+
+        # As b is normalized, a range of a must be contained in only one range of b
+        if j >= len(b) or b[j][0] > start or b[j][1] < end:
+            return False
+
+    return True
+
+
+def _rangesPartition(domain: Tuple[Tuple[int, int], ...], rangesList: List[Tuple[Tuple[int, int], ...]]) -> List[Tuple[int, int]]:
+    """
+    Splits a domain into the elementary ranges determined by the boundaries of a list of tuples of ranges,
+    so each tuple of ranges of the list is a union of elementary ranges.
+
+    Args:
+        domain: Normalized tuple of ranges with a single range.
+        rangesList: List of normalized tuples of ranges, included in the domain.
+
+    Returns:
+        Sorted list with the elementary (start, end) ranges that cover the domain.
+    """
+    low, high = domain[0]
+    boundaries = {low, high + 1}
+
+    for ranges in rangesList:
+        for start, end in ranges:
+            boundaries.add(start)
+            boundaries.add(end + 1)
+
+    boundaries = sorted(boundaries)
+
+    return [(boundaries[i], boundaries[i+1] - 1) for i in range(len(boundaries) - 1)]
+
+
+def _rangesCover(rangesList: List[Tuple[Tuple[int, int], ...]]) -> List[Tuple[Tuple[Tuple[int, int], ...], Tuple[int, ...]]]:
+    """
+    Splits the union of a list of tuples of ranges into disjoint pieces, with a sweep over their sorted
+    boundaries, and gets for each piece the indexes of the tuples of ranges that cover it.
+
+    Args:
+        rangesList: List of normalized tuples of ranges.
+
+    Returns:
+        List of (ranges, cover) tuples, where ranges is the normalized tuple of ranges covered exactly by
+        the indexes of the cover tuple. They are sorted by their first range.
+    """
+    events = {}
+
+    for i, ranges in enumerate(rangesList):
+        for start, end in ranges:
+            events.setdefault(start, []).append((True, i))
+            events.setdefault(end + 1, []).append((False, i))
+
+    boundaries = sorted(events)
+    active = set()
+    pieces = {}
+
+    for pos, nextPos in zip(boundaries, boundaries[1:] + [None]):
+
+        for starts, i in events[pos]:
+            if starts:
+                active.add(i)
+            else:
+                active.discard(i)
+
+        if active:
+            pieces.setdefault(tuple(sorted(active)), []).append((pos, nextPos - 1))
+
+    return [(_normalizeRanges(ranges), cover) for cover, ranges in pieces.items()]
+
+
+def _masksCover(masks: List[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+    """
+    Splits the union of a list of bitmasks into disjoint masks, and gets for each one of them the
+    indexes of the bitmasks that cover it.
+
+    Args:
+        masks: List of bitmasks.
+
+    Returns:
+        List of (mask, cover) tuples, where mask has the bits set exactly in the indexes of the cover tuple.
+    """
+    covers = {}
+
+    for i, mask in enumerate(masks):
+        while mask:
+            bit = mask & -mask
+            covers.setdefault(bit, []).append(i)
+            mask ^= bit
+
+    pieces = {}
+    for bit in sorted(covers):
+        cover = tuple(covers[bit])
+        pieces[cover] = pieces.get(cover, 0) | bit
+
+    return [(mask, cover) for cover, mask in pieces.items()]
+
+
+def _rangesToCidrs(ranges: Tuple[Tuple[int, int], ...]) -> List[str]:
+    """
+    Transforms a normalized tuple of IPv4 ranges into the minimal list of CIDR strings.
+
+    Args:
+        ranges: Normalized tuple of ranges of IPv4 directions as integers.
+
+    Returns:
+        List[str] with the networks in CIDR notation.
+    """
+    cidrs = []
+
+    for start, end in ranges:
+
+        while start <= end:
+
+            # The block size is limited by the alignment of start and by the remaining length
+            alignment = (start & -start).bit_length() - 1 if start else 32
+            bits = min(alignment, (end - start + 1).bit_length() - 1)
+
+            cidrs.append(f"{start >> 24}.{(start >> 16) & 255}.{(start >> 8) & 255}.{start & 255}/{32 - bits}")
+
+            start += 1 << bits
+
+    return cidrs
+
+
+def _internedFromKey(cls, key):
+    """
+    Recreates an interned ElementSet from its key. Used to unpickle interned sets.
+
+    Args:
+        cls: ElementSet class of the set.
+        key: Value returned by the _getKey() method of the set.
+
+    Returns:
+        The interned ElementSet.
+    """
+    return cls._fromKey(key).intern()
+
+
+
 class Field:
     """_summary_
     """
@@ -59,6 +370,10 @@ class FieldList:
 
         config = toml.load(path)
 
+        # Set the domains of the enumerated ElementSets before using them in the fields
+        for typeName, values in config['fdd_config'].get('domains', {}).items():
+            EnumeratedSet.defineEnumeration(typeName, values)
+
         _fields_ = config['fdd_config']['fields']
 
         for field in _fields_:
@@ -95,6 +410,8 @@ class ElementSetRegistry(type):
     def __new__(mcs, name, base, attrs):
 
         new_cls = type.__new__(mcs, name, base, attrs)
+        # Each class keeps its own table of interned (canonical) instances
+        new_cls._internTable_ = weakref.WeakValueDictionary()
         mcs._REGISTRY_[new_cls.__name__] = new_cls
         return new_cls
     
@@ -134,26 +451,89 @@ class ElementSet(metaclass = ElementSetRegistry):
     """
 
     _domain_ = set()
+    _frozen = False
+
+    # Bounded LRU cache of the sets parsed by createElementSet, shared by all the classes
+    _parseCache_ = OrderedDict()
+    _parseCacheSize_ = 4096
+    _parseCacheHits_ = 0
+    _parseCacheMisses_ = 0
 
     @classmethod
     def createElementSet(cls, elementType: str, values: List[str]) -> "ElementSet":
         """
         If elementType is the name of a subclas of ElementSet, call te constructor of this class with 'values' as parameter.
+        If 'values' is empty, the interned (read-only) domain of the class is returned.
+        The parsed sets are interned (read-only) and kept in a bounded LRU cache, so the same list 
+        of values is parsed only once. Use replicate() to get a mutable copy.
 
         Args:
             elemetnType: Name of the class to instantiate.
             values: List of values for the set.
 
         Returns:
-            A instance of given ElementSet subclass.
+            A interned instance of given ElementSet subclass.
         """
         registry = ElementSetRegistry.getRegistry()
         if elementType in registry:
             if values == []:
-                return registry[elementType](registry[elementType].getDomainList())
-            return registry[elementType](values)
+                # An empty list of values is a wildcard, so the shared domain is returned
+                return registry[elementType].getDomain()
+
+            key = (elementType, tuple(values))
+            cache = ElementSet._parseCache_
+            elementSet = cache.get(key)
+
+            if elementSet is not None:
+                cache.move_to_end(key)
+                ElementSet._parseCacheHits_ += 1
+                return elementSet
+
+            ElementSet._parseCacheMisses_ += 1
+            elementSet = registry[elementType](values).intern()
+            cache[key] = elementSet
+            if len(cache) > ElementSet._parseCacheSize_:
+                cache.popitem(last=False)
+
+            return elementSet
         raise TypeError()
 
+    @staticmethod
+    def getParseCacheStats() -> dict:
+        """
+        Gets the statistics of the cache of parsed sets used by createElementSet.
+
+        Returns:
+            dict: With the number of 'hits' and 'misses', and the current and max 'size' of the cache.
+        """
+        return {
+            'hits': ElementSet._parseCacheHits_,
+            'misses': ElementSet._parseCacheMisses_,
+            'size': len(ElementSet._parseCache_),
+            'maxsize': ElementSet._parseCacheSize_
+        }
+
+    @staticmethod
+    def setParseCacheSize(size: int) -> None:
+        """
+        Sets the max number of parsed sets kept by createElementSet. Zero disables the cache.
+
+        Args:
+            size: Max number of sets in the cache.
+        """
+        ElementSet._parseCacheSize_ = size
+        while len(ElementSet._parseCache_) > size:
+            ElementSet._parseCache_.popitem(last=False)
+
+    @staticmethod
+    def clearParseCache() -> None:
+        """
+        Drops all the parsed sets kept by createElementSet, and resets its statistics.
+        """
+        ElementSet._parseCache_.clear()
+        ElementSet._parseCacheHits_ = 0
+        ElementSet._parseCacheMisses_ = 0
+
     @abstractmethod
     def __init__(self, values: List[str]) -> None:
         """
@@ -177,12 +557,112 @@ class ElementSet(metaclass = ElementSetRegistry):
         """
         pass
 
+    def __hash__(self) -> int:
+        """
+        ElementSet __hash__.
+        Interned sets cache their hash, so it is computed only once.
+
+        Returns:
+            int: Hash of the class and the contents of the set.
+        """
+        if self._frozen:
+            return self._hash
+        return hash((self.__class__.__name__, self._getKey()))
+
+    def __reduce_ex__(self, protocol):
+        """
+        ElementSet __reduce_ex__.
+        Interned sets are interned again when unpickled, so they remain canonical.
+        """
+        if self._frozen:
+            return (_internedFromKey, (self.__class__, self._getKey()))
+        return super().__reduce_ex__(protocol)
+
     @abstractmethod
     def __repr__(self):
         """
         ElementSet __repr__
         """
         return str(self.getElementsList())
+
+    @abstractmethod
+    def _getKey(self):
+        """
+        Gets an immutable and hashable value that identifies the contents of this set.
+
+        Returns:
+            Hashable representation of the elements of this set.
+        """
+        pass
+
+    @classmethod
+    @abstractmethod
+    def _fromKey(cls, key) -> "ElementSet":
+        """
+        Creates a new set from the value returned by _getKey().
+
+        Args:
+            key: Hashable representation of the elements.
+
+        Returns:
+            A new instance of the class with the given elements.
+        """
+        pass
+
+    def intern(self) -> "ElementSet":
+        """
+        Gets the canonical, immutable instance of the set equal to this one.
+        Equal interned sets are the same object, so they can be compared by identity
+        and used as dict keys without hashing their contents again.
+
+        Returns:
+            The interned ElementSet equal to this set.
+        """
+        if self._frozen:
+            return self
+
+        key = self._getKey()
+        table = self.__class__._internTable_
+        canonical = table.get(key)
+
+        if canonical is None:
+            canonical = self._fromKey(key)
+            canonical._hash = hash((self.__class__.__name__, key))
+            canonical._frozen = True
+            table[key] = canonical
+
+        return canonical
+
+    def isFrozen(self) -> bool:
+        """
+        Check if this set is an interned (immutable) instance.
+
+        Returns:
+            True if the set is interned. False otherwise.
+        """
+        return self._frozen
+
+    def _checkMutable(self) -> None:
+        """
+        Raise an error if this set is interned and therefore can't be modified.
+
+        Raises:
+            TypeError: If the set is interned.
+        """
+        if self._frozen:
+            raise TypeError(f"Interned {self.__class__.__name__} can't be modified. Use the set operations instead.")
+
+    def _derived(self, newSet: "ElementSet") -> "ElementSet":
+        """
+        Gets the result of a set operation, interned if this set is interned.
+
+        Args:
+            newSet: Result of the set operation.
+
+        Returns:
+            The result of the operation.
+        """
+        return newSet.intern() if self._frozen else newSet
     
     @classmethod
     @abstractmethod
@@ -196,12 +676,122 @@ class ElementSet(metaclass = ElementSetRegistry):
         pass
 
     @classmethod
-    @abstractmethod
-    def getDomain(cls):
+    def getDomain(cls) -> "ElementSet":
         """
         Get a ElementSet object with the domain of the element set.
-        """ 
-        pass
+        Each class keeps a single interned (read-only) instance of its domain,
+        which is built the first time it's requested.
+
+        Returns:
+            The interned ElementSet with the domain of the class.
+        """
+        domain = cls.__dict__.get('_domainSet_')
+        if domain is None:
+            domain = cls(cls.getDomainList()).intern()
+            # Keep a strong reference, so the domain is never dropped from the intern table
+            cls._domainSet_ = domain
+        return domain
+
+    def isDomain(self) -> bool:
+        """
+        Check if this ElementSet contains the whole domain.
+
+        Returns:
+            True if the set is equal to the domain. False otherwise.
+        """
+        domain = self.getDomain()
+        if self._frozen:
+            return self is domain
+        return self == domain
+
+    def complement(self) -> "ElementSet":
+        """
+        Gets a new ElementSet with the elements of the domain that aren't in this set.
+
+        Returns:
+            The interned complement of this set.
+        """
+        return self.getDomain().differenceSet(self)
+
+    def getElementsCount(self) -> int:
+        """
+        Gets the number of values that getElementsList() returns for this set.
+        Subclasses override it when the count can be computed without building the list.
+
+        Returns:
+            The length of the list of elements.
+        """
+        return len(self.getElementsList())
+
+    def iterElements(self) -> Iterator[str]:
+        """
+        Iterates over the values that getElementsList() returns for this set.
+        Subclasses override it when the values can be generated lazily.
+
+        Returns:
+            An iterator over the list of elements.
+        """
+        return iter(self.getElementsList())
+
+    @classmethod
+    def partition(cls, sets: List["ElementSet"]) -> List["ElementSet"]:
+        """
+        Splits the domain into the smallest list of disjoint sets (atoms) such that each one of the
+        given sets is a union of atoms. Subclasses override it with faster algorithms.
+
+        Args:
+            sets: List of sets of this class.
+
+        Returns:
+            List with the atoms, that cover the whole domain.
+        """
+        atoms = [cls.getDomain()]
+
+        for elementSet in set(sets):
+
+            refined = []
+
+            for atom in atoms:
+
+                inside = atom.intersectionSet(elementSet)
+
+                if inside.isEmpty():
+                    refined.append(atom)
+                    continue
+
+                refined.append(inside)
+                outside = atom.differenceSet(elementSet)
+                if not outside.isEmpty():
+                    refined.append(outside)
+
+            atoms = refined
+
+        return atoms
+
+    @classmethod
+    def coverPartition(cls, sets: List["ElementSet"]) -> List[Tuple["ElementSet", Tuple[int, ...]]]:
+        """
+        Splits the union of the given sets into disjoint pieces, and gets for each piece the indexes
+        of the sets that cover it. The parts covered by the same sets are merged in a single piece.
+        Subclasses override it with sweeps over their ranges or bitmasks.
+
+        Args:
+            sets: List of sets of this class.
+
+        Returns:
+            List of (piece, cover) tuples, where cover is the sorted tuple of the indexes of the sets
+            that include the piece.
+        """
+        pieces = {}
+
+        for atom in cls.partition(sets):
+
+            cover = tuple(i for i, elementSet in enumerate(sets) if elementSet.isOverlapping(atom))
+
+            if cover:
+                pieces[cover] = pieces[cover].unionSet(atom) if cover in pieces else atom
+
+        return [(piece, cover) for cover, piece in pieces.items()]
 
     @abstractmethod
     def add(self, otherSet: "ElementSet") -> None:
@@ -336,7 +926,9 @@ class ElementSet(metaclass = ElementSetRegistry):
     @abstractmethod
     def replicate(self) -> "ElementSet":
         """
-        Gets a replica of this object.
+        Gets a mutable replica of this object.
+        The contents of the sets are immutable values (tuples or ints), so the replica shares
+        them with this set (copy-on-write): add() and remove() replace them instead of modifying them.
 
         Returns:
             A replica of this object.
@@ -348,9 +940,13 @@ class ElementSet(metaclass = ElementSetRegistry):
 class DirectionSet(ElementSet):
     """
     A subclass of ElementSet used to operate with IP directions.
+
+    The elements are stored as a sorted and normalized tuple of (start, end) integer ranges,
+    so every set operation works directly over integers. The CIDR notation is only built
+    when the elements are requested as a list (for export or display).
     """
 
-    _domain_ = nt.IPSet(['0.0.0.0/0'])
+    _domain_ = ((0, 2**32 - 1),)
 
     def __init__(self, values: List[str]) -> None:
         """
@@ -359,7 +955,65 @@ class DirectionSet(ElementSet):
         Args:
             values (List[str]): A list of strings containing IP directions or IP networks in CIDR notation (0.0.0.0/0).
         """
-        self._elements = nt.IPSet(values)
+        ranges = []
+
+        for value in values:
+
+            try:
+                network = nt.IPNetwork(value)
+            except (nt.AddrFormatError, ValueError, TypeError) as e:
+                raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}") from e
+
+            if network.version != 4:
+                raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}")
+
+            ranges.append((network.first, network.last))
+
+        self._ranges = _normalizeRanges(ranges)
+
+    @classmethod
+    def _fromRanges(cls, ranges: Tuple[Tuple[int, int], ...]) -> "DirectionSet":
+        """
+        Creates a DirectionSet from an already normalized tuple of ranges, skipping the parsing.
+
+        Args:
+            ranges: Sorted, disjoint and non adjacent tuple of (start, end) ranges.
+
+        Returns:
+            DirectionSet: A new DirectionSet with the given ranges.
+        """
+        newSet = cls.__new__(cls)
+        newSet._ranges = ranges
+        return newSet
+
+    @classmethod
+    def partition(cls, sets: List["DirectionSet"]) -> List["DirectionSet"]:
+        """
+        Splits the domain into the elementary ranges determined by the boundaries of the given sets,
+        so each one of them is a union of atoms.
+
+        Args:
+            sets: List of DirectionSets.
+
+        Returns:
+            Sorted list with the atoms, each one with a single range, that cover the whole domain.
+        """
+        return [cls._fromRanges((atom,)) for atom in _rangesPartition(cls._domain_, [x.getRanges() for x in sets])]
+
+    @classmethod
+    def coverPartition(cls, sets: List["DirectionSet"]) -> List[Tuple["DirectionSet", Tuple[int, ...]]]:
+        """
+        Splits the union of the given sets into disjoint pieces with a sweep over their sorted
+        boundaries, and gets for each piece the indexes of the sets that cover it.
+
+        Args:
+            sets: List of DirectionSets.
+
+        Returns:
+            List of (piece, cover) tuples, where cover is the sorted tuple of the indexes of the sets
+            that include the piece.
+        """
+        return [(cls._fromRanges(ranges), cover) for ranges, cover in _rangesCover([x.getRanges() for x in sets])]
 
     def __eq__(self, other: "DirectionSet") -> bool:
         """
@@ -371,34 +1025,54 @@ class DirectionSet(ElementSet):
         Returns:
             (bool) True if self and 'other' are equals. False otherwise.
         """
-        return self._elements == other.getElements()
+        if self._frozen and other.isFrozen() and self.__class__ is other.__class__:
+            return self is other
+        return self._ranges == other.getRanges()
+
+    def __hash__(self) -> int:
+        """
+        DirectionSet __hash__
+        """
+        return super().__hash__()
     
     def __repr__(self):
         """
         DirectionSet __repr__
         """
         return 'DirectionSet' + super().__repr__()
-    
+
+    def _getKey(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        Gets the ranges tuple, that identifies the contents of this set.
+
+        Returns:
+            Tuple of (start, end) ranges.
+        """
+        return self._ranges
+
     @classmethod
-    def getDomainList(cls) -> List[str]:
+    def _fromKey(cls, key: Tuple[Tuple[int, int], ...]) -> "DirectionSet":
         """
-        Get the DirectionSet Domain as a list
+        Creates a new DirectionSet from a ranges tuple.
+
+        Args:
+            key: Tuple of (start, end) ranges.
 
         Returns:
-            List of DirectionSet Domain
+            DirectionSet: A new DirectionSet.
         """
-        return [str(net) for net in cls._domain_.iter_cidrs()]
+        return cls._fromRanges(key)
     
     @classmethod
-    def getDomain(cls) -> "DirectionSet":
+    def getDomainList(cls) -> List[str]:
         """
-        Gets a DirectionSet object with the Domain of DirectionSet
+        Get the DirectionSet Domain as a list
 
         Returns:
-            DirectionSet: Domain of the DirectionSet
+            List of DirectionSet Domain
         """
-        return DirectionSet(cls.getDomainList())
-
+        return _rangesToCidrs(cls._domain_)
+    
     def add(self, otherSet: "DirectionSet") -> None:
         """
         Add the elements of otherSet to this set.
@@ -407,7 +1081,8 @@ class DirectionSet(ElementSet):
         Args:
             otherSet: The DirectionSet to add to this.
         """
-        self._elements = self._elements.union(otherSet.getElements())
+        self._checkMutable()
+        self._ranges = _rangesUnion(self._ranges, otherSet.getRanges())
 
     def isOverlapping(self, otherSet: "DirectionSet") -> bool:
         """
@@ -419,7 +1094,7 @@ class DirectionSet(ElementSet):
         Returns:
             (bool) True if exist common elements. False otherwise.
         """
-        return not self._elements.isdisjoint(otherSet.getElements())
+        return _rangesOverlap(self._ranges, otherSet.getRanges())
     
     def isEmpty(self) -> bool:
         """
@@ -428,7 +1103,7 @@ class DirectionSet(ElementSet):
         Returns:
             (bool) True if the set is empty. False otherwise.
         """
-        return len(self._elements) == 0
+        return len(self._ranges) == 0
     
     def isSubset(self, otherSet: "DirectionSet") -> bool:
         """
@@ -440,7 +1115,7 @@ class DirectionSet(ElementSet):
         Returns:
             (bool) True if this DirectionSet if a subset of otherSet. False otherwise.
         """
-        return self._elements.issubset(otherSet.getElements())
+        return _rangesSubset(self._ranges, otherSet.getRanges())
     
     def isDisjoint(self, otherSet: "DirectionSet") -> bool:
         """
@@ -452,7 +1127,7 @@ class DirectionSet(ElementSet):
         Returns:
             (bool) True if not exist common elements. False otherwise.
         """
-        return self._elements.isdisjoint(otherSet.getElements())
+        return not _rangesOverlap(self._ranges, otherSet.getRanges())
     
     def intersectionSet(self, otherSet: "DirectionSet") -> "DirectionSet":
         """
@@ -464,7 +1139,7 @@ class DirectionSet(ElementSet):
         Returns:
             DirectionSet whit the intersection between self and 'otherSet'. 
         """
-        return DirectionSet([str(x) for x in self._elements.intersection(otherSet.getElements()).iter_cidrs()])
+        return self._derived(self._fromRanges(_rangesIntersection(self._ranges, otherSet.getRanges())))
     
     def unionSet(self, otherSet: "DirectionSet") -> "DirectionSet":
         """
@@ -476,7 +1151,7 @@ class DirectionSet(ElementSet):
         Returns:
             DirectionSet whit the union between self and 'otherSet'. 
         """
-        return DirectionSet([str(x) for x in self._elements.union(otherSet.getElements()).iter_cidrs()]) 
+        return self._derived(self._fromRanges(_rangesUnion(self._ranges, otherSet.getRanges())))
 
     def differenceSet(self, otherSet: "DirectionSet"):
         """
@@ -488,7 +1163,7 @@ class DirectionSet(ElementSet):
         Returns:
             DirectionSet whit the difference between self and 'otherSet'. 
         """
-        return DirectionSet([str(x) for x in self._elements.difference(otherSet.getElements()).iter_cidrs()])
+        return self._derived(self._fromRanges(_rangesDifference(self._ranges, otherSet.getRanges())))
     
     def remove(self, otherSet: "DirectionSet") -> None:
         """
@@ -498,16 +1173,27 @@ class DirectionSet(ElementSet):
         Args:
             otherSet: The DirectionSet to remove to this.
         """
-        self._elements = self._elements.difference(otherSet.getElements())
+        self._checkMutable()
+        self._ranges = _rangesDifference(self._ranges, otherSet.getRanges())
+
+    def getRanges(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        Gets the sorted and normalized integer ranges of this set.
+
+        Returns:
+            Tuple of (start, end) ranges, both ends included.
+        """
+        return self._ranges
 
     def getElements(self) -> nt.IPSet:
         """
         Gets the set instance contains in this object.
+        The netaddr.IPSet is built on demand from the integer ranges.
 
         Returns:
             netaddr.IPSet: The set of elements contain in this object.
         """
-        return self._elements
+        return nt.IPSet(self.getElementsList())
     
     def getElementsList(self) -> List[str]:
         """
@@ -516,208 +1202,392 @@ class DirectionSet(ElementSet):
         Returns:
             A list with elements contains in this set.
         """
-        return [str(net) for net in self._elements.iter_cidrs()] 
+        return _rangesToCidrs(self._ranges)
     
     def replicate(self) -> "DirectionSet":
         """
         Gets a replica of this object.
+        Since the ranges tuple is immutable, the replica shares it with this object.
 
         Returns:
             DirectionSet: A replica of this object.
         """
-        return DirectionSet(self.getElementsList())
+        return self._fromRanges(self._ranges)
 
 
 
-class ProtocolSet(ElementSet):
+class EnumeratedSet(ElementSet):
     """
-    A subclass of ElementSet used to operate with transport layer protocols.
+    A subclass of ElementSet used to operate with values of a finite and enumerated domain,
+    such as transport layer protocols, connection states or network interfaces.
+
+    The membership is stored as an int bitmask, where the bit i represents the i-th value of
+    the domain, so every set operation is a single integer operation.
+    The domain of each subclass can be replaced from the fields configuration file
+    (see FieldList.loadConfig), and new subclasses can be defined there as well.
+    Values are matched case insensitive, but they are listed as written in the domain.
     """
 
-    _domain_ = {'tcp', 'udp', 'icmp'}
+    _domain_ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Index the bits of the domain values of each new subclass.
+        """
+        super().__init_subclass__(**kwargs)
+        cls._bitIndex_ = {str(value).lower(): 1 << i for i, value in enumerate(cls._domain_)}
 
     def __init__(self, values: List[str]) -> None:
         """
-        ProtocolSet __init__.
+        EnumeratedSet __init__.
 
         Args:
-            values (List[str]): A list of strings containing transport layer protocols.
+            values (List[str]): A list of strings containing values of the domain.
         """
+        mask = 0
+
+        for value in values:
 
-        # Check that values are included in the domain
-        lowCaseValues = [x.lower() for x in values]
+            bit = self._bitIndex_.get(str(value).lower())
 
-        for value in lowCaseValues:
-            if value not in self._domain_:
+            if bit is None:
                 raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}")
-            
-        self._elements = set(values)
 
-    def __eq__(self, other: "ProtocolSet") -> bool:
+            mask |= bit
+
+        self._mask = mask
+
+    @classmethod
+    def _fromMask(cls, mask: int) -> "EnumeratedSet":
+        """
+        Creates a new set from a bitmask, skipping the parsing.
+
+        Args:
+            mask: Bitmask with the values of the set.
+
+        Returns:
+            EnumeratedSet: A new set with the given bitmask.
+        """
+        newSet = cls.__new__(cls)
+        newSet._mask = mask
+        return newSet
+
+    @classmethod
+    def coverPartition(cls, sets: List["EnumeratedSet"]) -> List[Tuple["EnumeratedSet", Tuple[int, ...]]]:
         """
-        ProtocolSet __eq__
+        Splits the union of the given sets into disjoint pieces, grouping the bits of their masks by
+        the sets that have them.
 
         Args:
-            other (ProtocolSet): ProtocolSet to compare
+            sets: List of sets of this class.
+
+        Returns:
+            List of (piece, cover) tuples, where cover is the sorted tuple of the indexes of the sets
+            that include the piece.
+        """
+        return [(cls._fromMask(mask), cover) for mask, cover in _masksCover([x.getMask() for x in sets])]
+
+    @classmethod
+    def setDomain(cls, values: List[str]) -> None:
+        """
+        Replace the domain of this class.
+        The sets created with the previous domain are no longer valid, so the domain 
+        should be set before creating any set.
+
+        Args:
+            values: List with all the values of the new domain.
+        """
+        values = tuple(values)
+
+        if values == cls._domain_:
+            return
+
+        cls._domain_ = values
+        cls._bitIndex_ = {str(value).lower(): 1 << i for i, value in enumerate(values)}
+
+        # Drop the interned, cached and parsed sets, since their bits had other meaning
+        cls._internTable_.clear()
+        ElementSet.clearParseCache()
+        if '_domainSet_' in cls.__dict__:
+            del cls._domainSet_
+
+    @classmethod
+    def defineEnumeration(cls, typeName: str, values: List[str]) -> type:
+        """
+        Set the domain of the EnumeratedSet subclass with the given name.
+        If the class doesn't exist, create and register it.
+
+        Args:
+            typeName: Name of the class.
+            values: List with all the values of the domain.
+
+        Raises:
+            TypeError: If typeName is the name of an ElementSet that isn't an EnumeratedSet.
+            ValueError: If typeName isn't a valid class name, or it's already used in this module.
+
+        Returns:
+            The EnumeratedSet subclass.
+        """
+        enumClass = ElementSetRegistry.getElementSetClass(typeName)
+
+        if enumClass is None:
+            # The name comes from the configuration, it can't replace the names of this module
+            if not isinstance(typeName, str) or not typeName.isidentifier() or keyword.iskeyword(typeName) \
+                    or typeName.startswith('_'):
+                raise ValueError(f"{typeName!r} isn't a valid name for an EnumeratedSet")
+            if typeName in globals():
+                raise ValueError(f"{typeName} is already defined in {__name__}, it can't be an EnumeratedSet")
+
+            enumClass = ElementSetRegistry(typeName, (EnumeratedSet,), {
+                '__module__': __name__,
+                '__doc__': f"EnumeratedSet defined in the fields configuration ({typeName}).",
+                '_domain_': tuple(values)
+            })
+            # Publish the class in this module, so its sets can be pickled
+            globals()[typeName] = enumClass
+
+        elif issubclass(enumClass, EnumeratedSet) and enumClass is not EnumeratedSet:
+            enumClass.setDomain(values)
+
+        else:
+            raise TypeError(f"{typeName} isn't an EnumeratedSet")
+
+        return enumClass
+
+    def __eq__(self, other: "EnumeratedSet") -> bool:
+        """
+        EnumeratedSet __eq__
+
+        Args:
+            other (EnumeratedSet): EnumeratedSet to compare
 
         Returns:
             (bool) True if self and 'other' are equals. False otherwise.
         """
-        return self._elements == other.getElements()
+        if self._frozen and other.isFrozen() and self.__class__ is other.__class__:
+            return self is other
+        return self._mask == other.getMask()
+
+    def __hash__(self) -> int:
+        """
+        EnumeratedSet __hash__
+        """
+        return super().__hash__()
     
     def __repr__(self):
         """
-        ProtocolSet __repr__
+        EnumeratedSet __repr__
         """
-        return 'ProtocolSet' + super().__repr__()
-    
+        return self.__class__.__name__ + super().__repr__()
+
+    def _getKey(self) -> int:
+        """
+        Gets the bitmask, that identifies the contents of this set.
+
+        Returns:
+            int: The bitmask of this set.
+        """
+        return self._mask
+
     @classmethod
-    def getDomainList(cls) -> List[str]:
+    def _fromKey(cls, key: int) -> "EnumeratedSet":
         """
-        Get the ProtocolSet Domain as a list
+        Creates a new set from a bitmask.
+
+        Args:
+            key: Bitmask with the values of the set.
 
         Returns:
-            List of ProtocolSet Domain
+            EnumeratedSet: A new set.
         """
-        return list(cls._domain_)
+        return cls._fromMask(key)
     
     @classmethod
-    def getDomain(cls) -> "ProtocolSet":
+    def getDomainList(cls) -> List[str]:
         """
-        Gets a ProtocolSet object with the Domain of ProtocolSet
+        Get the Domain as a list
 
         Returns:
-            ProtocolSet: Domain of the ProtocolSet
+            List of the Domain values
         """
-        return ProtocolSet(cls.getDomainList())
+        return list(cls._domain_)
 
-    def add(self, otherSet: "ProtocolSet") -> None:
+    def add(self, otherSet: "EnumeratedSet") -> None:
         """
         Add the elements of otherSet to this set.
         Equivalent to say self = self U otherSet.
 
         Args:
-            otherSet: The ProtocolSet to add to this.
+            otherSet: The EnumeratedSet to add to this.
         """
-        self._elements.update(otherSet.getElements())
+        self._checkMutable()
+        self._mask |= otherSet.getMask()
 
-    def isOverlapping(self, otherSet: "ProtocolSet") -> bool:
+    def isOverlapping(self, otherSet: "EnumeratedSet") -> bool:
         """
-        Check if this ProtocolSet and otherSet have common elements.
+        Check if this EnumeratedSet and otherSet have common elements.
 
         Args:
-            otherSet: The ProtocolSet to compare this.
+            otherSet: The EnumeratedSet to compare this.
 
         Returns:
             (bool) True if exist common elements. False otherwise.
         """
-        return not self._elements.isdisjoint(otherSet.getElements())
+        return (self._mask & otherSet.getMask()) != 0
     
-    def isEmpty(self):
+    def isEmpty(self) -> bool:
         """
-        Check if this ProtocolSet is Empty.
+        Check if this EnumeratedSet is Empty.
 
         Returns:
             (bool) True if the set is empty. False otherwise.
         """
-        return len(self._elements) == 0
+        return self._mask == 0
     
-    def isSubset(self, otherSet: "ProtocolSet") -> bool:
+    def isSubset(self, otherSet: "EnumeratedSet") -> bool:
         """
-        Check if this ProtocolSet is a subset of 'otherSet'.
+        Check if this EnumeratedSet is a subset of 'otherSet'.
 
         Args:
-            otherSet: The ProtocolSet to compare this.
+            otherSet: The EnumeratedSet to compare this.
 
         Returns:
-            (bool) True if this ProtocolSet if a subset of otherSet. False otherwise.
+            (bool) True if this EnumeratedSet if a subset of otherSet. False otherwise.
         """
-        return self._elements.issubset(otherSet.getElements())
+        return (self._mask & ~otherSet.getMask()) == 0
     
-    def isDisjoint(self, otherSet: "ProtocolSet") -> bool:
+    def isDisjoint(self, otherSet: "EnumeratedSet") -> bool:
         """
-        Check if this ProtocolSet and otherSet have common elements.
+        Check if this EnumeratedSet and otherSet have common elements.
 
         Args:
-            otherSet: The ProtocolSet to compare this.
+            otherSet: The EnumeratedSet to compare this.
 
         Returns:
             (bool) True if not exist common elements. False otherwise.
         """
-        return self._elements.isdisjoint(otherSet.getElements())
+        return (self._mask & otherSet.getMask()) == 0
     
-    def intersectionSet(self, otherSet: "ProtocolSet") -> "ProtocolSet":
+    def intersectionSet(self, otherSet: "EnumeratedSet") -> "EnumeratedSet":
         """
-        Gets a new ProtocolSet with the intersection between self and 'otherSet'.
+        Gets a new EnumeratedSet with the intersection between self and 'otherSet'.
 
         Args:
-            otherSet: The ProtocolSet to compare this.
+            otherSet: The EnumeratedSet to compare this.
 
         Returns:
-            ProtocolSet whit the intersection between self and 'otherSet'. 
+            EnumeratedSet whit the intersection between self and 'otherSet'. 
         """
-        return ProtocolSet([str(x) for x in self._elements & otherSet.getElements()])
+        return self._derived(self._fromMask(self._mask & otherSet.getMask()))
     
-    def unionSet(self, otherSet: "ProtocolSet") -> "ProtocolSet":
+    def unionSet(self, otherSet: "EnumeratedSet") -> "EnumeratedSet":
         """
-        Gets a new ProtocolSet with the union between self and 'otherSet'.
+        Gets a new EnumeratedSet with the union between self and 'otherSet'.
 
         Args:
-            otherSet: The ProtocolSet to compare this.
+            otherSet: The EnumeratedSet to compare this.
 
         Returns:
-            ProtocolSet whit the union between self and 'otherSet'. 
+            EnumeratedSet whit the union between self and 'otherSet'. 
         """
-        return ProtocolSet([str(x) for x in self._elements | otherSet.getElements()])
+        return self._derived(self._fromMask(self._mask | otherSet.getMask()))
     
-    def differenceSet(self, otherSet: "ProtocolSet") -> "ProtocolSet":
+    def differenceSet(self, otherSet: "EnumeratedSet") -> "EnumeratedSet":
         """
-        Gets a new ProtocolSet with the difference between self and 'otherSet'.
+        Gets a new EnumeratedSet with the difference between self and 'otherSet'.
 
         Args:
-            otherSet: The ProtocolSet to compare this.
+            otherSet: The EnumeratedSet to compare this.
 
         Returns:
-            ProtocolSet whit the difference between self and 'otherSet'. 
+            EnumeratedSet whit the difference between self and 'otherSet'. 
         """
-        return ProtocolSet([str(x) for x in self._elements - otherSet.getElements()])
+        return self._derived(self._fromMask(self._mask & ~otherSet.getMask()))
     
-    def remove(self, otherSet: "ProtocolSet") -> None:
+    def remove(self, otherSet: "EnumeratedSet") -> None:
         """
         Remove the elements of otherSet to this set.
         Equivalent to say self = self - (self ∩ otherSet).
 
         Args:
-            otherSet: The ProtocolSet to remove to this.
+            otherSet: The EnumeratedSet to remove to this.
+        """
+        self._checkMutable()
+        self._mask &= ~otherSet.getMask()
+
+    def getMask(self) -> int:
+        """
+        Gets the bitmask of this set.
+
+        Returns:
+            int: The bitmask of this set.
         """
-        self._elements = self._elements.difference(otherSet.getElements())
+        return self._mask
 
     def getElements(self) -> Set:
         """
         Gets the set instance contains in this object.
+        The set is built on demand from the bitmask.
 
         Returns:
             set: The set of elements contain in this object.
         """
-        return self._elements
+        return set(self.getElementsList())
     
-    def getElementsList(self):
+    def getElementsCount(self) -> int:
         """
-        Gets the elements of this set as a list.
+        Gets the number of values in this set, counting the bits of the bitmask.
+
+        Returns:
+            The length of the list of elements.
+        """
+        return bin(self._mask).count('1')
+
+    def getElementsList(self) -> List[str]:
+        """
+        Gets the elements of this set as a list, in the order of the domain.
 
         Returns:
             A list with elements contains in this set.
         """
-        return list(self._elements)
+        return [value for i, value in enumerate(self._domain_) if self._mask >> i & 1]
     
-    def replicate(self):
+    def replicate(self) -> "EnumeratedSet":
         """
         Gets a replica of this object.
 
         Returns:
-            ProtocolSet: A replica of this object.
+            EnumeratedSet: A replica of this object.
         """
-        return ProtocolSet(self.getElementsList())
+        return self._fromMask(self._mask)
+
+
+
+class ProtocolSet(EnumeratedSet):
+    """
+    A subclass of EnumeratedSet used to operate with transport layer protocols.
+    """
+
+    _domain_ = ('tcp', 'udp', 'icmp')
+
+
+
+class StateSet(EnumeratedSet):
+    """
+    A subclass of EnumeratedSet used to operate with connection tracking states.
+    """
+
+    _domain_ = ('NEW', 'ESTABLISHED', 'RELATED', 'INVALID')
+
+
+
+class InterfaceSet(EnumeratedSet):
+    """
+    A subclass of EnumeratedSet used to operate with network interfaces.
+    Its domain must list every interface of the host, and it's usually set in the fields configuration.
+    """
+
+    _domain_ = ('lo',)
 
 
 
@@ -725,8 +1595,10 @@ class PortSet(ElementSet):
     """
     A subclass of ElementSet used to operate with transport layer ports.
     It has a class variable that allows you to indicate whether ports should be grouped by ranges when they are contiguous.
+    The ports are stored as a sorted tuple of disjoint integer ranges, so the size of the set never
+    depends on the number of ports it contains.
     """
-    _domain_ = p.closedopen(0, 65535+1)
+    _domain_ = ((0, 65535),)
     _groupable_ = True
 
     def __init__(self, values: List[str]) -> None:
@@ -736,41 +1608,79 @@ class PortSet(ElementSet):
         Args:
             values (List[str]): A list of strings containing port ranges or single ports of the transport layer.
         """
-
-        self._elements = p.empty()
+        ranges = []
+        low, high = self._domain_[0]
 
         for value in values:
 
-            # try transform string into integer
+            # Transform the string into a single port or a range, using ':' as a divisor
+            ends = str(value).split(":")
+
             try:
+                if len(ends) == 1:
+                    start = end = int(ends[0])
+                elif len(ends) == 2:
+                    start, end = int(ends[0]), int(ends[1])
+                else:
+                    raise ValueError
+            except ValueError:
+                raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}")
 
-                intValue = int(value)
+            if start > end:
+                continue
 
-                if intValue not in self._domain_:
+            if start < low or end > high:
+                raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}")
 
-                    raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}")
-                
-                else:
+            ranges.append((start, end))
 
-                    self._elements = self._elements | p.closedopen(intValue, intValue+1)
-                
-            # if an error is raised, the value could be a range 
-            except:
+        self._ranges = _normalizeRanges(ranges)
+        self._listCache = None
 
-                # try split the string into two, using ':' as a divisor
-                ends = value.split(":")
-                if len(ends) == 2:
+    @classmethod
+    def _fromRanges(cls, ranges: Tuple[Tuple[int, int], ...]) -> "PortSet":
+        """
+        Creates a PortSet from an already normalized tuple of ranges, skipping the parsing.
 
-                    interval = p.closedopen(int(ends[0]), int(ends[1])+1)
+        Args:
+            ranges: Sorted, disjoint and non adjacent tuple of (start, end) ranges.
 
-                    if not self._domain_.contains(interval) :
-                        raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}")
-                    else: 
-                        self._elements = self._elements | interval
+        Returns:
+            PortSet: A new PortSet with the given ranges.
+        """
+        newSet = cls.__new__(cls)
+        newSet._ranges = ranges
+        newSet._listCache = None
+        return newSet
 
-                else:
+    @classmethod
+    def partition(cls, sets: List["PortSet"]) -> List["PortSet"]:
+        """
+        Splits the domain into the elementary ranges determined by the boundaries of the given sets,
+        so each one of them is a union of atoms.
+
+        Args:
+            sets: List of PortSets.
+
+        Returns:
+            Sorted list with the atoms, each one with a single range, that cover the whole domain.
+        """
+        return [cls._fromRanges((atom,)) for atom in _rangesPartition(cls._domain_, [x.getRanges() for x in sets])]
 
-                    raise ValueError(f"Value {value} isn't include in the domain of {self.__class__.__name__}")
+    @classmethod
+    def coverPartition(cls, sets: List["PortSet"]) -> List[Tuple["PortSet", Tuple[int, ...]]]:
+        """
+        Splits the union of the given sets into disjoint pieces with a sweep over their sorted
+        boundaries, and gets for each piece the indexes of the sets that cover it.
+
+        Args:
+            sets: List of PortSets.
+
+        Returns:
+            List of (piece, cover) tuples, where cover is the sorted tuple of the indexes of the sets
+            that include the piece.
+        """
+        return [(cls._fromRanges(ranges), cover) for ranges, cover in _rangesCover([x.getRanges() for x in sets])]
 
     def __eq__(self, other: "PortSet") -> bool:
         """
@@ -782,49 +1692,56 @@ class PortSet(ElementSet):
         Returns:
             (bool) True if self and 'other' are equals. False otherwise.
         """
-        return self._elements == other.getElements()
+        if self._frozen and other.isFrozen() and self.__class__ is other.__class__:
+            return self is other
+        return self._ranges == other.getRanges()
+
+    def __hash__(self) -> int:
+        """
+        PortSet __hash__
+        """
+        return super().__hash__()
 
     def __repr__(self):
         """
         PortSet __repr__
         """
         return "PortSet" + super().__repr__()
-    
-    @classmethod
-    def _formatedList_(cls, inter: p.Interval) -> List[str]:
-        """
-        Formats a list of the portion library ranges to be suitable for use with firewall rules.
 
-        Args:
-            inter: A portion.Interval object to transform into its List[str] useful representation.
+    def _getKey(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        Gets the ranges of this set, that identify its contents.
 
         Returns:
-            List[str] with a useful representation to this intervals.
+            tuple: The ranges of this set.
         """
+        return self._ranges
 
-        formated = []
+    @classmethod
+    def _fromKey(cls, key: Tuple[Tuple[int, int], ...]) -> "PortSet":
+        """
+        Creates a new PortSet from a tuple of ranges.
 
-        # Because the intervals used by the portion library can be open or closed, we convert to the discrete model.
-        # The .to_data() method returns a list of elements where each element is a 4-tuple representing a range. 
-        # The tuple contains the values ​​of the endpoints and a boolean flag indicating whether the endpoint is open or closed.
-        for element in p.to_data(inter):
-            if element[1] == element[2]-1 and element[0] and not element[3]:
-                formated.append(str(element[1]))
-            else:
+        Args:
+            key: Normalized tuple of ranges.
 
-                if element[0]:
-                    string = str(element[1])
-                else:
-                    string = str(element[1]+1) 
+        Returns:
+            PortSet: A new PortSet.
+        """
+        return cls._fromRanges(key)
+    
+    @classmethod
+    def _formatedList_(cls, ranges: Tuple[Tuple[int, int], ...]) -> List[str]:
+        """
+        Formats a tuple of ranges to be suitable for use with firewall rules.
 
-                if element[3]:
-                    string = string + ":" + str(element[2])
-                else:
-                    string = string + ":" + str(element[2]-1)
+        Args:
+            ranges: Normalized tuple of ranges to transform into its List[str] useful representation.
 
-                formated.append(string)
-  
-        return formated
+        Returns:
+            List[str] with a useful representation to this ranges.
+        """
+        return [str(start) if start == end else f"{start}:{end}" for start, end in ranges]
 
     @classmethod
     def getDomainList(cls) -> List[str]:
@@ -836,16 +1753,6 @@ class PortSet(ElementSet):
         """
         return cls._formatedList_(cls._domain_)
 
-    @classmethod
-    def getDomain(cls) -> "PortSet":
-        """
-        Gets a PortSet object with the Domain of PortSet
-
-        Returns:
-            PortSet: Domain of the PortSet
-        """
-        return PortSet(cls.getDomainList())
-    
     @classmethod
     def setGroupable(self, value: bool) -> None:
         """
@@ -864,7 +1771,9 @@ class PortSet(ElementSet):
         Args:
             otherSet: The PortSet to add to this.
         """
-        self._elements = self._elements | otherSet.getElements()
+        self._checkMutable()
+        self._ranges = _rangesUnion(self._ranges, otherSet.getRanges())
+        self._listCache = None
 
     def isOverlapping(self, otherSet: "PortSet") -> bool:
         """
@@ -876,7 +1785,7 @@ class PortSet(ElementSet):
         Returns:
             (bool) True if exist common elements. False otherwise.
         """
-        return self._elements.overlaps(otherSet.getElements())
+        return _rangesOverlap(self._ranges, otherSet.getRanges())
 
     def isEmpty(self) -> bool:
         """
@@ -885,7 +1794,7 @@ class PortSet(ElementSet):
         Returns:
             (bool) True if the set is empty. False otherwise.
         """
-        return self._elements.empty
+        return not self._ranges
     
     def isSubset(self, otherSet: "PortSet") -> bool:
         """
@@ -897,7 +1806,7 @@ class PortSet(ElementSet):
         Returns:
             (bool) True if this PortSet if a subset of otherSet. False otherwise.
         """
-        return self._elements in otherSet.getElements() 
+        return _rangesSubset(self._ranges, otherSet.getRanges())
         
     def isDisjoint(self, otherSet: "PortSet") -> bool:
         """
@@ -909,7 +1818,7 @@ class PortSet(ElementSet):
         Returns:
             (bool) True if not exist common elements. False otherwise.
         """
-        return self._elements.intersection(otherSet.getElements()).empty
+        return not _rangesOverlap(self._ranges, otherSet.getRanges())
 
     def intersectionSet(self, otherSet: "PortSet") -> "PortSet":
         """
@@ -921,7 +1830,7 @@ class PortSet(ElementSet):
         Returns:
             PortSet whit the intersection between self and 'otherSet'. 
         """
-        return PortSet(self._formatedList_(list(self._elements.intersection(otherSet.getElements()))))
+        return self._derived(self._fromRanges(_rangesIntersection(self._ranges, otherSet.getRanges())))
         
     def unionSet(self, otherSet: "PortSet") -> "PortSet":
         """
@@ -933,7 +1842,7 @@ class PortSet(ElementSet):
         Returns:
             PortSet whit the union between self and 'otherSet'. 
         """
-        return PortSet(self._formatedList_(list(self._elements.union(otherSet.getElements()))))
+        return self._derived(self._fromRanges(_rangesUnion(self._ranges, otherSet.getRanges())))
         
     def differenceSet(self, otherSet: "PortSet") -> "PortSet":
         """
@@ -945,7 +1854,7 @@ class PortSet(ElementSet):
         Returns:
             PortSet whit the difference between self and 'otherSet'. 
         """
-        return PortSet(self._formatedList_(list(self._elements.difference(otherSet.getElements()))))
+        return self._derived(self._fromRanges(_rangesDifference(self._ranges, otherSet.getRanges())))
     
     def remove(self, otherSet: "ElementSet") -> None:
         """
@@ -955,42 +1864,79 @@ class PortSet(ElementSet):
         Args:
             otherSet: The PortSet to remove to this.
         """
-        self._elements = self._elements.difference(otherSet.getElements())
+        self._checkMutable()
+        self._ranges = _rangesDifference(self._ranges, otherSet.getRanges())
+        self._listCache = None
 
-    def getElements(self):
+    def getRanges(self) -> Tuple[Tuple[int, int], ...]:
         """
-        Gets the set instance contains in this object.
+        Gets the sorted and normalized integer ranges of this set.
 
         Returns:
-            set: The set of elements contain in this object.
+            Tuple of (start, end) ranges, both ends included.
+        """
+        return self._ranges
+
+    def cardinality(self) -> int:
         """
-        return self._elements
+        Gets the number of ports in this set, without expanding its ranges.
 
-    def getElementsList(self):
+        Returns:
+            int: The number of ports.
+        """
+        return sum(end - start + 1 for start, end in self._ranges)
+
+    def rangeCount(self) -> int:
+        """
+        Gets the number of disjoint ranges in this set.
+
+        Returns:
+            int: The number of ranges.
+        """
+        return len(self._ranges)
+
+    def getElements(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        Gets the elements contains in this object, as a tuple of (start, end) ranges.
+
+        Returns:
+            tuple: The ranges of ports contain in this object.
+        """
+        return self._ranges
+
+    def getElementsList(self) -> List[str]:
         """
         Gets the elements of this set as a list.
+        The formatted list is cached until the set (or the 'groupable' option) changes.
 
         Returns:
             A list with elements contains in this set.
         """
-        
-        if not self._groupable_:
+        if self._listCache is None or self._listCache[0] != self._groupable_:
+            self._listCache = (self._groupable_, tuple(self.iterElements()))
 
-            noGrouped = []
+        return list(self._listCache[1])
 
-            for element in p.to_data(self._elements):
+    def getElementsCount(self) -> int:
+        """
+        Gets the number of values that getElementsList() returns for this set,
+        without formatting or expanding its ranges.
 
-                if element[1] == element[2]-1 and element[0] and not element[3]:
-                    noGrouped.append(str(element[1]))
-                else:
-                    for i in range(element[1], element[2]):
-                        noGrouped.append(str(i))
-            
-            return noGrouped
-        
-        else:   
+        Returns:
+            The length of the list of elements.
+        """
+        return self.rangeCount() if self._groupable_ else self.cardinality()
 
-            return self._formatedList_(self._elements)
+    def iterElements(self) -> Iterator[str]:
+        """
+        Iterates lazily over the values that getElementsList() returns for this set.
+
+        Returns:
+            An iterator over the list of elements.
+        """
+        if self._groupable_:
+            return iter(self._formatedList_(self._ranges))
+        return (str(port) for start, end in self._ranges for port in range(start, end + 1))
 
     def replicate(self):
         """
@@ -999,4 +1945,4 @@ class PortSet(ElementSet):
         Returns:
             PortSet: A replica of this object.
         """
-        return PortSet(self.getElementsList())
+        return self._fromRanges(self._ranges)
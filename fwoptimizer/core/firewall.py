@@ -2,6 +2,8 @@
 """
 
 from fwoptimizer.core.fdd import FDD, FieldList
+from fwoptimizer.core.fieldOrder import FieldOrderOptimizer
+from fwoptimizer.core.partition import ChainPartitioner
 from fwoptimizer.core.rules import RuleSet, Table
 import logging, os
 
@@ -26,6 +28,7 @@ class Firewall:
         self._optRules: RuleSet = inputRules
         self._workFolder: str = defaultWorkFolder
         self._inputFile : str = None
+        self._partitions: dict[str, dict[str, tuple]] = {}
         self._logger = logger or logging.getLogger('Firewall')
         
         # Ensure work folder exists
@@ -34,6 +37,13 @@ class Firewall:
             self._logger.info(f"Created work folder for Firewall at {self._workFolder}")
             
         self._logger.info("Initialized Firewall")
+
+    def __setstate__(self, state):
+        """
+        Firewall __setstate__. Firewalls saved before the partitioned FDDs have none.
+        """
+        self.__dict__.update(state)
+        self.__dict__.setdefault('_partitions', {})
     
     def getWorkFolder(self):
         """
@@ -124,7 +134,7 @@ class Firewall:
         """
         return self._fieldList
     
-    def genFdd(self, table=None, chain=None):
+    def genFdd(self, table=None, chain=None, optimizeOrder=False, partitionField=None, shards=None, workers=1):
         """
         Generate a FDD from a specific List of Rules in the firewall's policies,
         or generate all FDDs from the firewall's policies.
@@ -132,63 +142,176 @@ class Firewall:
         Args:
             table (Table): Table from the RuleSet
             chain (Chain): Chain in the Table
+            optimizeOrder (bool): Choose the order of the levels of each FDD for its chain,
+                                  instead of using the order of the field list
+            partitionField (str): If given, split each chain by the values of this field (as 'Protocol'),
+                                  and generate a smaller FDD for each partition
+            shards (int): If given, split the domain of the first level of each FDD in this number of shards,
+                          generated and reduced independently, and stitched under the root
+            workers (int): Number of worker processes that generate the shards
         """
         # Generate all
         if table is None and chain is None:
             for tableName , table in self._inputRules.getTables().items():
                 for chainName, _ in table.getChains().items():
-                    fdd = FDD(self._fieldList)
-                    self.addFdd(tableName, fdd)
-                    self._logger.info(f'Generating {tableName} - {chainName} FDD')
-                    fdd.genFDD(self._inputRules[tableName][chainName], self._workFolder + f"report-{tableName}-{chainName}.txt")
-                    self._logger.info(f'{tableName} - {chainName} FDD Done.')
+                    self._genPartitionedFdd(tableName, chainName, optimizeOrder, partitionField, shards, workers)
         else:   # Generate Specific FDD
-            self._logger.info(f'Generating {table} - {chain} FDD')
+            self._genPartitionedFdd(table, chain, optimizeOrder, partitionField, shards, workers)
+
+    def _genPartitionedFdd(self, table, chain, optimizeOrder=False, partitionField=None, shards=None, workers=1):
+        """
+        Generate the FDD of a chain, or the FDDs of its partitions by the value of a field.
+        The FDDs of the partitions are named as their chains, and they are recorded with their
+        pieces of the domain of the field, to merge their rules when exported.
+
+        Args:
+            table (str): Name of the table
+            chain (str): Name of the chain
+            optimizeOrder (bool): Choose the order of the levels for each FDD
+            partitionField (str): Name of the field used to split the chain, or None
+            shards (int): Number of shards of the domain of the first level of each FDD, or None
+            workers (int): Number of worker processes that generate the shards
+        """
+        self._partitions.get(table, {}).pop(chain, None)
+
+        if partitionField is None:
+            self._genChainFdd(table, chain, optimizeOrder, shards=shards, workers=workers)
+            return
+
+        partitioner = ChainPartitioner(self._fieldList, partitionField)
+        parts = partitioner.partition(self._inputRules[table][chain])
+
+        # A single piece gives the same FDD
+        if len(parts) < 2:
+            self._genChainFdd(table, chain, optimizeOrder, shards=shards, workers=workers)
+            return
+
+        self._logger.info(f'{table} - {chain} split by {partitionField} in {len(parts)} partitions')
+
+        fdds = []
+        for piece, part in parts:
+            fdds.append((piece, self._genChainFdd(table, part.getName(), optimizeOrder, part, shards, workers)))
+
+        self._partitions.setdefault(table, {})[chain] = (partitioner, fdds)
+
+    def _genChainFdd(self, table, chain, optimizeOrder=False, rules=None, shards=None, workers=1):
+        """
+        Generate the FDD of a chain, and record the order of its levels in the generation report
+
+        Args:
+            table (str): Name of the table
+            chain (str): Name of the chain
+            optimizeOrder (bool): Choose the order of the levels for the chain
+            rules (Chain): Rules of the chain, if it isn't one of the input chains
+            shards (int): Number of shards of the domain of the first level, or None
+            workers (int): Number of worker processes that generate the shards
+
+        Returns:
+            FDD: The generated FDD
+        """
+        self._logger.info(f'Generating {table} - {chain} FDD')
+        rules = rules if rules is not None else self._inputRules[table][chain]
+        reportPath = self._workFolder + f"report-{table}-{chain}.txt"
+
+        orderReport = None
+        if optimizeOrder:
+            order, orderReport = FieldOrderOptimizer(self._fieldList).chooseOrder(rules)
+            self._logger.info(f'{table} - {chain} field order: {order} ({orderReport["heuristic"]})')
+            fdd = FDD(self._fieldList, order)
+        else:
             fdd = FDD(self._fieldList)
-            self.addFdd(table, fdd)
-            fdd.genFDD(self._inputRules[table][chain], self._workFolder + f"report-{table}-{chain}.txt")
-            self._logger.info(f'{table} - {chain} FDD Done.')
+
+        self.addFdd(table, fdd)
+        fdd.genFDD(rules, reportPath, shards=shards, workers=workers)
+
+        if orderReport is not None:
+            self._writeOrderReport(reportPath, orderReport)
+
+        self._logger.info(f'{table} - {chain} FDD Done.')
+        return fdd
+
+    def _writeOrderReport(self, reportPath, orderReport):
+        """
+        Append the choice of the field order to a generation report
+
+        Args:
+            reportPath (str): Path to the report file
+            orderReport (dict): Report returned by FieldOrderOptimizer.chooseOrder
+        """
+        try:
+            with open(reportPath, 'a') as writer:
+                writer.write(f"\nOrden de los campos: {', '.join(orderReport['order'])} (heuristica {orderReport['heuristic']})\n")
+                if orderReport['savings'] is not None:
+                    writer.write(f"Elementos estimados con las primeras {orderReport['sampledRules']} reglas: {orderReport['sizes']}\n")
+                    writer.write(f"Ahorro estimado respecto del orden de la configuracion: {orderReport['savings']:.1%}\n")
+        except OSError:
+            self._logger.warning(f'Could not write the field order to {reportPath}')
                 
-    def optimizeFdd(self, table=None, chain=None):
+    def optimizeFdd(self, table=None, chain=None, costModel=None):
         """
         Optimize a FDD from a specific List of Rules in the firewall's policies,
         or optimize all FDDs from the firewall's policies.
+        The predicted size of the output of each FDD is logged.
 
         Args:
             table (Table): Table from the RuleSet
             chain (Chain): Chain in the Table
+            costModel (str): Objective of the marking ('rules', 'lines' or 'match'). If None, the one
+                             used for the last optimization of each FDD (by default 'rules').
         """
         # Optimize all
         if table is None and chain is None:
             for tableName ,table in self._inputRules.getTables().items():
                 for chainName, _ in table.getChains().items():
                     
-                    fdd = self.getFDD(tableName, chainName)
-                    if fdd is None:
+                    fdds = self._getChainFdds(tableName, chainName)
+                    if not fdds:
                         self._logger.warning(f'No FDD generated for {tableName} - {chainName} (Skipping.)')
                         continue
                     
                     self._logger.info(f'Optimizing {tableName} - {chainName} FDD')
-                    fdd.reduction()
-                    fdd.marking()
+                    # Only the nodes changed since the last optimization are reduced again
+                    for fdd in fdds:
+                        fdd.reduceIncremental(costModel)
+                    self._logPredictedSize(tableName, chainName, fdds)
                     self._logger.info(f'{tableName} - {chainName} optimization Done.')
                     
         else:   # Optimize Specific FDD
             self._logger.info(f'Optimizing {table} - {chain} FDD')
             
-            fdd = self.getFDD(table, chain)
-            fdd.reduction()
-            fdd.marking()
+            fdds = self._getChainFdds(table, chain)
+            for fdd in fdds:
+                fdd.reduceIncremental(costModel)
+            self._logPredictedSize(table, chain, fdds)
             
             self._logger.info(f'{table} - {chain} optimization Done.')
     
-    def genOutputRules(self, table=None, chain=None):
+    def _logPredictedSize(self, table, chain, fdds):
+        """
+        Log the size of the output of the optimized FDDs of a chain, before it's generated.
+
+        Args:
+            table (str): Table Name
+            chain (str): Chain Name
+            fdds (List[FDD]): Marked FDDs of the chain
+        """
+        sizes = [fdd.getPredictedSize() for fdd in fdds]
+        if sizes:
+            self._logger.info(f'{table} - {chain} predicted output (before compaction): '
+                              f'{sum(size["rules"] for size in sizes)} rules, '
+                              f'{sum(size["lines"] for size in sizes)} iptables lines, '
+                              f'{sum(size["checks"] for size in sizes)} predicate checks')
+
+    def genOutputRules(self, table=None, chain=None, jumpChains=False):
         """
         Generate and export output RuleSet from FDD.
+        The rules of the FDDs of a partitioned chain are merged in a single chain, or
+        exported as a chain that jumps to a chain for each partition.
 
         Args:
             table (str, optional): Table Name. Defaults to None.
             chain (str, optional): Chain Name. Defaults to None.
+            jumpChains (bool, optional): Export the partitioned chains as jump chains. Defaults to False.
 
         Returns:
             RuleSet: Generated RuleSet
@@ -201,13 +324,11 @@ class Firewall:
                 # Add new table
                 exportRuleSet.addTable(Table(tableName))
                 for chainName, _ in table.getChains().items():
-                    fdd = self.getFDD(tableName, chainName)
-                    if fdd:
-                        # Generate new chain
-                        outputChain = fdd.firewallGen()
-                        outputChain.setDefaultDecision(outputChain[-1].getDecision()) # Set Default Chain Decision as Last Rule Decision
-                        # Add new chain
-                        exportRuleSet[tableName].addChain(outputChain)
+                    outputChains = self._genChainOutput(tableName, chainName, jumpChains)
+                    if outputChains:
+                        # Add new chains
+                        for outputChain in outputChains:
+                            exportRuleSet[tableName].addChain(outputChain)
                         self._logger.info(f'Exporting {tableName} - {chainName} Rules')
                     else:
                         self._logger.warning(f'FDD not found for chain: {chain} in table: {table}')
@@ -216,13 +337,11 @@ class Firewall:
             # Add new table
             exportRuleSet.addTable(Table(table))
             # Get specific FDD
-            fdd = self.getFDD(table, chain)
-            if fdd:
-                # Generate new chain
-                outputChain = fdd.firewallGen()
-                outputChain.setDefaultDecision(outputChain[-1].getDecision()) # Set Default Chain Decision as Last Rule Decision
-                # Add new chain
-                exportRuleSet[table].addChain(outputChain)
+            outputChains = self._genChainOutput(table, chain, jumpChains)
+            if outputChains:
+                # Add new chains
+                for outputChain in outputChains:
+                    exportRuleSet[table].addChain(outputChain)
             else:
                 self._logger.warning(f'FDD not found for chain: {chain} in table: {table}')
                         
@@ -230,6 +349,74 @@ class Firewall:
         self.setOptRules(exportRuleSet)
         return exportRuleSet
     
+    def _genChainOutput(self, table, chain, jumpChains=False):
+        """
+        Generate the output chains of a chain from its FDD, or from the FDDs of its partitions
+
+        Args:
+            table (str): Table Name
+            chain (str): Chain Name
+            jumpChains (bool): Export a partitioned chain as jump chains, instead of merging it
+
+        Returns:
+            list[Chain]: The output chains, empty if the chain has no FDD
+        """
+        partitions = self._partitions.get(table, {}).get(chain)
+
+        if partitions is None:
+            fdd = self.getFDD(table, chain)
+            if not fdd:
+                return []
+            # Generate new chain
+            outputChain = fdd.firewallGen()
+            outputChain.setDefaultDecision(outputChain[-1].getDecision()) # Set Default Chain Decision as Last Rule Decision
+            return [outputChain]
+
+        partitioner, fdds = partitions
+        defaultDecision = self._inputRules[table][chain].getDefaultDecision()
+        parts = []
+        for piece, fdd in fdds:
+            outputChain = fdd.firewallGen()
+            outputChain.setDefaultDecision(None)
+            parts.append((piece, outputChain))
+
+        if jumpChains:
+            return partitioner.jumpChains(chain, defaultDecision, parts)
+        return [partitioner.mergeChains(chain, defaultDecision, parts)]
+
+    def _getChainFdds(self, table, chain):
+        """
+        Get the FDD of a chain, or the FDDs of its partitions
+
+        Args:
+            table (str): Table Name
+            chain (str): Chain Name
+
+        Returns:
+            list[FDD]: The FDDs of the chain, empty if it has none
+        """
+        partitions = self._partitions.get(table, {}).get(chain)
+        if partitions is not None:
+            return [fdd for _, fdd in partitions[1]]
+
+        fdd = self.getFDD(table, chain)
+        return [fdd] if fdd else []
+
+    def getPartitions(self, tableName: str, chainName: str):
+        """
+        Get the FDDs of the partitions of a chain
+
+        Args:
+            tableName (str): Name of the table.
+            chainName (str): Name of the chain.
+
+        Returns:
+            list[tuple[ElementSet, FDD]]: The piece of the domain of the discriminator field and
+            the FDD of each partition, or None if the chain wasn't partitioned.
+        """
+        partitions = self._partitions.get(tableName, {}).get(chainName)
+        return partitions[1] if partitions is not None else None
+
     def addFdd(self, tableName: str, fdd: FDD):
         """
         Add FDD to the Firewall under the specified table.
@@ -6,6 +6,7 @@ import re
 from abc import ABC, abstractmethod
 from collections.abc import Iterable
 from collections import defaultdict
+from itertools import product
 
 from fwoptimizer.core import rules
 from fwoptimizer.configs import syntaxes
@@ -192,6 +193,7 @@ class IpTablesParser(ParserStrategy):
         for table in ruleSet.getTables().values():
             iptables_save_lines.append(f"*{table.getName()}")
 
+            # Declare all the chains before the rules, as a rule may jump to a chain that follows it
             for chain in table.getChains().values():
                 # Add chain with default policy if any
                 default_decision = chain.getDefaultDecision()
@@ -200,6 +202,7 @@ class IpTablesParser(ParserStrategy):
                 else:
                     iptables_save_lines.append(f":{chain.getName()} - [0:0]")  
 
+            for chain in table.getChains().values():
                 # Add rules in the chain
                 for rule in chain.getRules():
                     predicates = rule.getPredicates()
@@ -208,32 +211,37 @@ class IpTablesParser(ParserStrategy):
                     for protocol in protocol_list:
                         base_rule_parts = [f"-A {chain.getName()}"]
                         
-                        # Handle source and destination IPs
+                        # Handle interfaces and source and destination IPs
+                        in_ifaces = predicates.get("InInterface", [None])
+                        out_ifaces = predicates.get("OutInterface", [None])
                         src_ips = predicates.get("SrcIP", [None])
                         dst_ips = predicates.get("DstIP", [None])
 
                         # Handle other options
                         other_parts = []
                         for option, value in predicates.items():
-                            if option not in ["SrcIP", "DstIP"]:
+                            if option not in ["SrcIP", "DstIP", "InInterface", "OutInterface"]:
                                 other_parts.extend(self._manageOptions(option, value, protocol))
                         
-                        # Generate a rule for each src-dst IP combination
-                        for src_ip in src_ips:
-                            for dst_ip in dst_ips:
-                                rule_parts = base_rule_parts.copy()
-                                if src_ip:
-                                    rule_parts.extend([f"-s {src_ip}"])
-                                if dst_ip:
-                                    rule_parts.extend([f"-d {dst_ip}"])
-                                # Add other options after IPs
-                                rule_parts.extend(other_parts)
-                                
-                                # Form Rule Decision
-                                decision = rule.getDecision()
-                                if decision:
-                                    rule_parts.append(f"-j {decision}")
-                                iptables_save_lines.append(" ".join(rule_parts))
+                        # Generate a rule for each interfaces and src-dst IP combination
+                        for in_iface, out_iface, src_ip, dst_ip in product(in_ifaces, out_ifaces, src_ips, dst_ips):
+                            rule_parts = base_rule_parts.copy()
+                            if in_iface:
+                                rule_parts.extend([f"-i {in_iface}"])
+                            if out_iface:
+                                rule_parts.extend([f"-o {out_iface}"])
+                            if src_ip:
+                                rule_parts.extend([f"-s {src_ip}"])
+                            if dst_ip:
+                                rule_parts.extend([f"-d {dst_ip}"])
+                            # Add other options after IPs
+                            rule_parts.extend(other_parts)
+                            
+                            # Form Rule Decision
+                            decision = rule.getDecision()
+                            if decision:
+                                rule_parts.append(f"-j {decision}")
+                            iptables_save_lines.append(" ".join(rule_parts))
 
             # Finish iptables-save
             iptables_save_lines.append("COMMIT")
@@ -334,6 +342,9 @@ class IpTablesParser(ParserStrategy):
             #    return [f"{iptables_option[0]} {ip}" for ip in value]
             #else:
             #    return [f"{iptables_option[0]} {value}"]
+        elif option == "State":
+            states = ','.join(value) if isinstance(value, list) else value
+            return ["-m conntrack", f"--ctstate {states}"]
         else:
             return [f"{iptables_option[0]} {value}"]
  
@@ -0,0 +1,199 @@
+"""
+Chain partitioning module
+
+Most chains split by the value of a single field, as the protocol: the TCP rules, the UDP rules,
+the ICMP rules and a few rules for any protocol. In a single FDD the subtrees of the next levels
+are replicated under each edge of that field. ChainPartitioner splits a chain into one smaller
+chain for each piece of the domain of the field, with the rules that match it, so an FDD can be
+generated and reduced for each one. The output chains of the FDDs are merged back in a single
+chain, or exported as a chain that jumps to a chain for each piece.
+"""
+
+import re
+from typing import List, Tuple
+
+from fwoptimizer.core.rules import Chain, Rule
+from fwoptimizer.core.fields import FieldList, ElementSet, ElementSetRegistry
+
+
+
+class ChainPartitioner:
+    """
+    Splits the chains by the value of a discriminator field.
+    """
+
+    # Maximum length of the name of an iptables chain
+    _maxNameLength_ = 28
+
+    def __init__(self, fieldList: FieldList, fieldName: str = 'Protocol') -> None:
+        """
+        ChainPartitioner __init__
+
+        Args:
+            fieldList: FieldList used by the firewall.
+            fieldName: Name of the discriminator field.
+        """
+        field = next((field for field in fieldList.getFields() if field.getName() == fieldName), None)
+        if field is None:
+            raise ValueError(f"Field {fieldName} isn't include in FieldList")
+
+        self._field = field
+
+    def getFieldName(self) -> str:
+        """
+        Get the name of the discriminator field
+
+        Returns:
+            str: Name of the field
+        """
+        return self._field.getName()
+
+    def partition(self, chain: Chain) -> List[Tuple[ElementSet, Chain]]:
+        """
+        Splits a chain in disjoint pieces of the domain of the discriminator field. The pieces are
+        the parts of the domain matched by the same rules, so the rules without a value for the
+        field (wildcards) are in every partition. The rules of each partition keep their ids, and
+        the discriminator is removed from their predicates.
+
+        Args:
+            chain: Chain to split.
+
+        Returns:
+            List of (piece, chain) tuples. The chain of each piece has the default decision of the
+            given chain, and it's named after the piece.
+        """
+        fieldName = self._field.getName()
+        domain = ElementSetRegistry.getElementSetClass(self._field.getType()).getDomain()
+
+        sets = [domain]
+        for rule in chain.getRules():
+            values = rule.getOption(fieldName)
+            sets.append(ElementSet.createElementSet(self._field.getType(), values) if values else domain)
+
+        parts = []
+        for i, (piece, cover) in enumerate(domain.coverPartition(sets)):
+
+            part = Chain(self._pieceName(chain.getName(), piece, i))
+            part.setDefaultDecision(chain.getDefaultDecision())
+
+            # Index 0 is the domain, the rules are shifted by one
+            for index in cover[1:]:
+                rule = chain.getRules()[index - 1]
+                newRule = Rule(rule.getId())
+                for predicate, values in rule.getPredicates().items():
+                    if predicate != fieldName:
+                        newRule.setPredicate(predicate, values)
+                newRule.setDecision(rule.getDecision())
+                part.addRule(newRule)
+
+            parts.append((piece, part))
+
+        return parts
+
+    def mergeChains(self, name: str, defaultDecision: str, parts: List[Tuple[ElementSet, Chain]]) -> Chain:
+        """
+        Merges the output chains of the partitions in a single chain. As the pieces are disjoint,
+        the rules of each partition only need the discriminator to match the piece. The last rule
+        of a partition is removed when it matches the whole piece with the default decision.
+
+        Args:
+            name: Name of the merged chain.
+            defaultDecision: Default decision of the merged chain.
+            parts: List of (piece, chain) tuples, with the output chain of each partition.
+
+        Returns:
+            Chain: The merged chain.
+        """
+        merged = Chain(name)
+        merged.setDefaultDecision(defaultDecision)
+
+        for piece, part in parts:
+
+            rules = part.getRules()
+            if rules and not rules[-1].getPredicates() and rules[-1].getDecision() == defaultDecision:
+                rules = rules[:-1]
+
+            for rule in rules:
+                merged.addRule(self._restrictRule(rule, piece, len(merged.getRules())))
+
+        return merged
+
+    def jumpChains(self, name: str, defaultDecision: str, parts: List[Tuple[ElementSet, Chain]]) -> List[Chain]:
+        """
+        Exports the output chains of the partitions as a main chain that jumps to the chain of
+        each piece. The rules of the partition chains keep the discriminator, as other matches
+        (the ports of TCP or UDP) may depend on it. The jump is skipped when the chain of the
+        piece only has the default decision.
+
+        Args:
+            name: Name of the main chain.
+            defaultDecision: Default decision of the main chain.
+            parts: List of (piece, chain) tuples, with the output chain of each partition.
+
+        Returns:
+            List[Chain]: The main chain, followed by the chains of the pieces that it jumps to.
+        """
+        main = Chain(name)
+        main.setDefaultDecision(defaultDecision)
+        chains = [main]
+
+        for piece, part in parts:
+
+            rules = part.getRules()
+            if all(not rule.getPredicates() for rule in rules) and (not rules or rules[0].getDecision() == defaultDecision):
+                continue
+
+            jumpChain = Chain(part.getName())
+            for rule in rules:
+                jumpChain.addRule(self._restrictRule(rule, piece, len(jumpChain.getRules())) if rule.getPredicates() else rule)
+
+            jump = Rule(len(main.getRules()))
+            if not piece.isDomain():
+                jump.setPredicate(self._field.getName(), piece.getElementsList())
+            jump.setDecision(jumpChain.getName())
+            main.addRule(jump)
+            chains.append(jumpChain)
+
+        return chains
+
+    def _restrictRule(self, rule: Rule, piece: ElementSet, ruleId: int) -> Rule:
+        """
+        Copies a rule, restricting it to a piece of the discriminator field.
+
+        Args:
+            rule: Rule to copy.
+            piece: Piece of the domain of the discriminator.
+            ruleId: Id of the new rule.
+
+        Returns:
+            Rule: The new rule.
+        """
+        newRule = Rule(ruleId)
+        fieldName = self._field.getName()
+
+        for predicate, values in rule.getPredicates().items():
+            newRule.setPredicate(predicate, values)
+        if not piece.isDomain():
+            newRule.setPredicate(fieldName, piece.getElementsList())
+        newRule.setDecision(rule.getDecision())
+
+        return newRule
+
+    def _pieceName(self, name: str, piece: ElementSet, index: int) -> str:
+        """
+        Gets the name of the chain of a piece, from its values. If it's too long for iptables,
+        the index of the piece is used instead.
+
+        Args:
+            name: Name of the partitioned chain.
+            piece: Piece of the domain of the discriminator.
+            index: Index of the piece.
+
+        Returns:
+            str: Name of the chain.
+        """
+        label = re.sub(r'[^A-Za-z0-9_-]', '_', '_'.join(piece.getElementsList()))
+        pieceName = f"{name}_{label}"
+        if len(pieceName) > self._maxNameLength_:
+            pieceName = f"{name}_{index}"
+        return pieceName
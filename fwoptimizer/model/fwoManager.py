@@ -168,20 +168,24 @@ class FWOManager:
         self.logger.info("Field List set.")
         self.logger.info(f"Field List Config:\n{self.currentFirewall.getFieldList().printConfig()}")
 
-    def generateFDD(self, table=None, chain=None):
+    def generateFDD(self, table=None, chain=None, optimizeOrder=False, partitionField=None, shards=None, workers=1):
         """
         Ask user for a FDD to generate from a chain
 
         Args:
             table (str, optional): Table Name. Defaults to None.
             chain (str, optional): Chain Name. Defaults to None.
+            optimizeOrder (bool, optional): Choose the field order of each FDD. Defaults to False.
+            partitionField (str, optional): Field used to split each chain in smaller FDDs. Defaults to None.
+            shards (int, optional): Number of shards of the first level of each FDD. Defaults to None.
+            workers (int, optional): Number of worker processes that generate the shards. Defaults to 1.
         """
         self.logger.info("Generating FDD...")
         if table is None and chain is None:
-            self.currentFirewall.genFdd()
+            self.currentFirewall.genFdd(optimizeOrder=optimizeOrder, partitionField=partitionField, shards=shards, workers=workers)
             return None, None
         else:
-            self.currentFirewall.genFdd(table, chain)
+            self.currentFirewall.genFdd(table, chain, optimizeOrder, partitionField, shards, workers)
             return table, chain
     
     def setGraphicsView(self, graphicsView):
@@ -269,23 +273,24 @@ class FWOManager:
         
         return pathName, imageFrmt, display
         
-    def optimizeFDD(self, table=None, chain=None):
+    def optimizeFDD(self, table=None, chain=None, costModel=None):
         """
         Ask user for a FDD to optimize
 
         Args:
             table (str, optional): Table Name. Defaults to None.
             chain (str, optional): Chain Name. Defaults to None.
+            costModel (str, optional): Objective of the marking ('rules', 'lines' or 'match'). Defaults to None.
         """
         self.logger.info("Optimizing FDD...")
         if table is None and chain is None:
-            self.currentFirewall.optimizeFdd()
+            self.currentFirewall.optimizeFdd(costModel=costModel)
             return None, None
         else:
-            self.currentFirewall.optimizeFdd(table, chain)
+            self.currentFirewall.optimizeFdd(table, chain, costModel)
             return table, chain
     
-    def exportRules(self, filePath, table=None, chain=None):
+    def exportRules(self, filePath, table=None, chain=None, jumpChains=False):
         """
         Export RuleSet generated from an FDD.
 
@@ -293,15 +298,16 @@ class FWOManager:
             filePath (str): Path to store the rules.
             table (str, optional): Table Name. Defaults to None.
             chain (str, optional): Chain Name. Defaults to None.
+            jumpChains (bool, optional): Export the partitioned chains as jump chains. Defaults to False.
 
         Returns:
             RuleSet: Generated RuleSet
         """
         self.logger.info("Exporting Rules...")
         if table is None and chain is None:
-            return self.currentFirewall.genOutputRules(), filePath
+            return self.currentFirewall.genOutputRules(jumpChains=jumpChains), filePath
         else:
-            return self.currentFirewall.genOutputRules(table, chain), filePath
+            return self.currentFirewall.genOutputRules(table, chain, jumpChains), filePath
         
     def addRules(self, table, chain, predicate, decision):
         """
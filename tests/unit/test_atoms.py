@@ -0,0 +1,79 @@
+import pytest
+
+from fwoptimizer.core.atoms import AtomSpace, AtomSet, AtomEncoder
+from fwoptimizer.core.comparator import ChainComparator
+from fwoptimizer.core.fields import FieldList, DirectionSet, ProtocolSet, PortSet
+from fwoptimizer.core.fdd import FDD
+from fwoptimizer.core.rules import Rule, Chain
+
+
+def test_atomSpace():
+    """summary
+    """
+
+    sets = [PortSet(['80:90']), PortSet(['85:100', '200']), PortSet(['22'])]
+    space = AtomSpace(PortSet, sets)
+
+    assert [atom.getElementsList() for atom in space.getAtoms()] == \
+        [['0:21'], ['22'], ['23:79'], ['80:84'], ['85:90'], ['91:100'], ['101:199'], ['200'], ['201:65535']]
+
+    a = space.encode(sets[0])
+    b = space.encode(sets[1])
+
+    assert a.getMask() == 0b000011000
+    assert a.intersectionSet(b).decode() == PortSet(['85:90'])
+    assert a.unionSet(b).getElementsList() == ['80:100', '200']
+    assert a.differenceSet(b).decode() == PortSet(['80:84'])
+    assert a.isOverlapping(b) and not a.isSubset(b)
+    assert a.complement().decode() == sets[0].complement()
+    assert space.getDomain().isDomain()
+
+    # Operations with other sets are done over the decoded set
+    assert a.intersectionSet(PortSet(['81'])) == PortSet(['81'])
+
+    with pytest.raises(ValueError):
+        space.encode(PortSet(['81']))
+
+    protocols = AtomSpace(ProtocolSet, [ProtocolSet(['tcp', 'udp'])])
+
+    assert len(protocols.getAtoms()) == 2
+    assert AtomSet(['tcp', 'udp'], protocols).complement().decode() == ProtocolSet(['icmp'])
+
+
+def test_atomEncoderFromChain():
+    """summary
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("tests/test_fdd_config.toml")
+
+    chain = Chain("INPUT")
+    chain.setDefaultDecision("DROP")
+
+    for i, (src, decision) in enumerate([('10.0.0.0/8', 'ACCEPT'), ('10.1.0.0/16', 'DROP'), ('0.0.0.0/0', 'ACCEPT')]):
+        rule = Rule(i)
+        rule.setPredicate('SrcIP', [src])
+        rule.setPredicate('Protocol', ['tcp'])
+        rule.setDecision(decision)
+        chain.addRule(rule)
+
+    encoder = AtomEncoder.fromChain(chain, fieldList)
+
+    assert encoder.getAtomsNum() == {'SrcIP': 5, 'DstIP': 1, 'Protocol': 2}
+
+    # The FDD generated with and without atoms is the same
+    labels = []
+    for useAtoms in [True, False]:
+        fdd = FDD(fieldList)
+        fdd.genFDD(chain, useAtoms=useAtoms)
+        labels.append(sorted(str(edge.getElementSet()) for level in fdd._levels for node in level.getNodes() for edge in node.getOutgoing()))
+        assert all(not isinstance(edge.getElementSet(), AtomSet) for level in fdd._levels for node in level.getNodes() for edge in node.getOutgoing())
+
+    assert labels[0] == labels[1]
+
+    # A chain is equivalent to itself
+    comparator = ChainComparator(fieldList)
+    comparator.setChain1FromChain(chain)
+    comparator.setChain2FromChain(chain)
+
+    assert comparator.areEquivalents()
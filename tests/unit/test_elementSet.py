@@ -1,8 +1,10 @@
 """_summary_
 """
 
+import pickle
 import pytest
-from fwoptimizer.core.fields import ElementSetRegistry, ElementSet, DirectionSet, ProtocolSet, PortSet
+from fwoptimizer.core import fields
+from fwoptimizer.core.fields import ElementSetRegistry, ElementSet, EnumeratedSet, DirectionSet, ProtocolSet, StateSet, PortSet
 from fwoptimizer.core.rules import Chain, Rule
 from fwoptimizer.core.firewall import FieldList
 from fwoptimizer.core.fdd import FDD
@@ -129,4 +131,230 @@ def test_PortSet():
 
     new4 = ports.replicate()
 
-    assert new4.getElementsList() == ['88', '99']
\ No newline at end of file
+    assert new4.getElementsList() == ['88', '99']
+
+def test_DirectionSet():
+    """summary
+    """
+
+    dirs = DirectionSet(['10.0.0.0/25', '10.0.0.128/25', '10.0.2.1'])
+    assert dirs.getElementsList() == ['10.0.0.0/24', '10.0.2.1/32']
+    assert dirs.getRanges() == ((167772160, 167772415), (167772673, 167772673))
+
+    other = DirectionSet(['10.0.0.64/26', '10.0.3.0/24'])
+
+    assert dirs.isOverlapping(other)
+    assert not dirs.isSubset(other)
+    assert DirectionSet(['10.0.0.64/27']).isSubset(dirs)
+
+    assert dirs.intersectionSet(other).getElementsList() == ['10.0.0.64/26']
+    assert dirs.unionSet(other).getElementsList() == ['10.0.0.0/24', '10.0.2.1/32', '10.0.3.0/24']
+    assert dirs.differenceSet(other).getElementsList() == ['10.0.0.0/26', '10.0.0.128/25', '10.0.2.1/32']
+
+    dirs.remove(DirectionSet(['10.0.0.0/24']))
+    assert dirs.getElementsList() == ['10.0.2.1/32']
+
+    dirs.add(DirectionSet(['10.0.2.0/32', '10.0.2.2/31']))
+    assert dirs.getElementsList() == ['10.0.2.0/30']
+
+    assert DirectionSet.getDomain().getElementsList() == ['0.0.0.0/0']
+    assert DirectionSet([]).isEmpty()
+
+    with pytest.raises(ValueError):
+        DirectionSet(['10.0.0.300/24'])
+
+
+def test_internedElementSets():
+    """summary
+    """
+
+    for cls, values, other in [(DirectionSet, ['10.0.0.0/24'], ['10.0.0.0/25']),
+                               (ProtocolSet, ['tcp'], ['tcp', 'udp']),
+                               (PortSet, ['80', '443'], ['80'])]:
+
+        a = cls(values).intern()
+        b = cls(values).intern()
+        c = cls(other).intern()
+
+        assert a is b
+        assert a.isFrozen()
+        assert a == cls(values)
+        assert hash(a) == hash(cls(values))
+        assert {a: 1}[b] == 1
+        assert a != c
+
+        # Operations over interned sets give interned sets
+        assert a.intersectionSet(c) is c.intersectionSet(a)
+        assert a.unionSet(c).isFrozen()
+
+        with pytest.raises(TypeError):
+            a.remove(c)
+
+        # Replicas are mutable
+        replica = a.replicate()
+        replica.remove(c)
+        assert a == cls(values)
+
+        assert pickle.loads(pickle.dumps(a)) is a
+
+
+def test_domainAndComplement():
+    """summary
+    """
+
+    for cls, values in [(DirectionSet, ['128.0.0.0/1']), (ProtocolSet, ['tcp']), (PortSet, ['1024:65535'])]:
+
+        domain = cls.getDomain()
+
+        assert domain is cls.getDomain()
+        assert domain is ElementSet.createElementSet(cls.__name__, [])
+        assert domain.isFrozen()
+        assert domain.isDomain()
+        assert cls(cls.getDomainList()).isDomain()
+
+        subset = cls(values)
+
+        assert not subset.isDomain()
+        assert subset.complement().isDisjoint(subset)
+        assert subset.complement().unionSet(subset).isDomain()
+        assert domain.complement().isEmpty()
+
+    assert DirectionSet(['128.0.0.0/1']).complement().getElementsList() == ['0.0.0.0/1']
+    assert PortSet(['1024:65535']).complement().getElementsList() == ['0:1023']
+
+
+def test_enumeratedSets():
+    """summary
+    """
+
+    states = StateSet(['new', 'ESTABLISHED'])
+
+    assert states.getElementsList() == ['NEW', 'ESTABLISHED']
+    assert states.getMask() == 0b11
+    assert states.isSubset(StateSet.getDomain())
+    assert states.complement() == StateSet(['RELATED', 'INVALID'])
+    assert states.intersectionSet(StateSet(['NEW', 'INVALID'])) == StateSet(['NEW'])
+    assert ProtocolSet(['TCP']).getElements() == {'tcp'}
+
+    with pytest.raises(ValueError):
+        StateSet(['UNTRACKED'])
+
+    # Enumerations defined from the configuration
+    zoneSet = EnumeratedSet.defineEnumeration('ZoneSet', ['lan', 'wan', 'dmz'])
+
+    assert ElementSetRegistry.getElementSetClass('ZoneSet') is zoneSet
+    assert EnumeratedSet.defineEnumeration('ZoneSet', ['lan', 'wan', 'dmz']) is zoneSet
+
+    zones = ElementSet.createElementSet('ZoneSet', ['wan']).intern()
+
+    assert pickle.loads(pickle.dumps(zones)) is zones
+    assert zones.complement().getElementsList() == ['lan', 'dmz']
+
+    zoneSet.setDomain(['lan', 'wan'])
+
+    assert zoneSet.getDomain().getElementsList() == ['lan', 'wan']
+
+    with pytest.raises(TypeError):
+        EnumeratedSet.defineEnumeration('PortSet', ['1'])
+
+    # The names of the module can't be replaced by the configuration
+    moduleNames = dict(vars(fields))
+    for typeName in ('Field', 'nt', 'toml', 'Zone Set', '__builtins__', 'class'):
+        with pytest.raises(ValueError):
+            EnumeratedSet.defineEnumeration(typeName, ['lan'])
+        assert ElementSetRegistry.getElementSetClass(typeName) is None
+
+    assert all(vars(fields)[name] is value for name, value in moduleNames.items())
+
+
+def test_portSetRanges():
+    """summary
+    """
+
+    ports = PortSet(['1000:1999', '22', '23', '80', '81:90'])
+
+    assert ports.getRanges() == ((22, 23), (80, 90), (1000, 1999))
+    assert ports.cardinality() == 1013
+    assert ports.rangeCount() == 3
+    assert PortSet.getDomain().cardinality() == 65536
+
+    PortSet.setGroupable(True)
+    assert ports.getElementsCount() == 3
+    assert ports.getElementsList() == ['22:23', '80:90', '1000:1999']
+
+    # The cached list isn't affected by the callers, and is rebuilt after a mutation
+    ports.getElementsList().append('0')
+    assert ports.getElementsList() == ['22:23', '80:90', '1000:1999']
+    ports.remove(PortSet(['1000:65535']))
+    assert ports.getElementsList() == ['22:23', '80:90']
+
+    PortSet.setGroupable(False)
+    assert ports.getElementsCount() == 13
+    assert ports.getElementsList()[:3] == ['22', '23', '80']
+    PortSet.setGroupable(True)
+
+    with pytest.raises(ValueError):
+        PortSet(['65536'])
+
+    with pytest.raises(ValueError):
+        PortSet(['1:2:3'])
+
+
+def test_parseCache():
+    """summary
+    """
+
+    ElementSet.clearParseCache()
+
+    a = ElementSet.createElementSet('DirectionSet', ['10.0.0.0/24'])
+    b = ElementSet.createElementSet('DirectionSet', ['10.0.0.0/24'])
+    c = ElementSet.createElementSet('PortSet', ['80', '443'])
+
+    assert a is b
+    assert a.isFrozen() and c.isFrozen()
+    assert ElementSet.getParseCacheStats()['hits'] == 1
+    assert ElementSet.getParseCacheStats()['misses'] == 2
+    assert ElementSet.getParseCacheStats()['size'] == 2
+
+    # The least recently used set is dropped first
+    ElementSet.setParseCacheSize(2)
+    ElementSet.createElementSet('DirectionSet', ['10.0.0.0/24'])
+    ElementSet.createElementSet('ProtocolSet', ['tcp'])
+    ElementSet.createElementSet('DirectionSet', ['10.0.0.0/24'])
+
+    assert ElementSet.getParseCacheStats()['hits'] == 3
+    assert ElementSet.getParseCacheStats()['size'] == 2
+
+    ElementSet.createElementSet('PortSet', ['80', '443'])
+
+    assert ElementSet.getParseCacheStats()['misses'] == 4
+
+    # Invalid values are never cached
+    with pytest.raises(ValueError):
+        ElementSet.createElementSet('PortSet', ['http'])
+
+    ElementSet.setParseCacheSize(4096)
+    ElementSet.clearParseCache()
+
+    assert ElementSet.getParseCacheStats() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 4096}
+
+
+def test_coverPartition():
+    """
+    coverPartition splits the union of the sets into disjoint pieces, with the indexes of the sets that cover each one.
+    """
+
+    sets = [PortSet(['1:100']), PortSet(['50:200', '300']), PortSet(['60:70'])]
+    pieces = PortSet.coverPartition(sets)
+
+    assert [(piece.getRanges(), cover) for piece, cover in pieces] == [
+        (((1, 49),), (0,)), (((50, 59), (71, 100)), (0, 1)), (((60, 70),), (0, 1, 2)), (((101, 200), (300, 300)), (1,))]
+
+    # The generic refinement gives the same pieces
+    assert ElementSet.coverPartition.__func__(PortSet, sets) == pieces
+
+    sets = [DirectionSet(['10.0.0.0/8']), DirectionSet(['10.1.0.0/16'])]
+    assert DirectionSet.coverPartition(sets) == [(DirectionSet(['10.0.0.0/8']).differenceSet(sets[1]), (0,)), (sets[1], (0, 1))]
+
+    sets = [ProtocolSet(['tcp', 'udp']), ProtocolSet(['udp', 'icmp'])]
+    assert ProtocolSet.coverPartition(sets) == [(ProtocolSet(['tcp']), (0,)), (ProtocolSet(['udp']), (0, 1)), (ProtocolSet(['icmp']), (1,))]
@@ -2,9 +2,15 @@
 Tests for the Edge, Node, Level and FDD classes
 """
 
+import pickle
+
+import pytest
+
 import fwoptimizer.core.fdd as fdd
 from fwoptimizer.core.fdd import Field
-from fwoptimizer.core.fields import DirectionSet
+from fwoptimizer.core.fields import DirectionSet, ElementSet, FieldList
+from fwoptimizer.core.parser import IpTablesParser
+from fwoptimizer.core.rules import Chain, Rule, RuleSet, Table
 
 
 def test_edge():
@@ -89,3 +95,816 @@ def test_node():
     assert n1 not in lvl1.getNodes()
     assert n2 not in lvl2.getNodes()
 
+
+
+def test_identityAdjacency():
+    """
+    Nodes and Levels index their edges and nodes by identity, keeping the insertion order.
+    """
+
+    f1 = Field("IPSrc", "DirSet")
+
+    lvl1 = fdd.Level(f1)
+    n1 = fdd.Node(lvl1)
+    n2 = fdd.Node(fdd.Level(f1))
+    n1.autoConnect()
+
+    edges = [fdd.Edge([1], n1, n2, DirectionSet(['10.0.0.0/8'])) for _ in range(3)]
+    for edge in edges:
+        edge.autoConnect()
+        edge.autoConnect()
+
+    # Equal edges are different members, and connecting twice does nothing
+    assert n1.getOutgoing() == edges and len(n2.getIncoming()) == 3
+
+    edges[1].autoDisconnect()
+    assert n1.getOutgoing()[0] is edges[0] and n1.getOutgoing()[1] is edges[2]
+
+    # The returned list doesn't change while its edges are disconnected
+    for edge in n1.getOutgoing():
+        edge.autoDisconnect()
+    assert n1.getOutgoing() == [] and n2.getIncoming() == []
+
+    assert lvl1.hasNode(n1)
+    n1.autoDisconnect()
+    n1.autoDisconnect()
+    assert not lvl1.hasNode(n1) and lvl1.getNodes() == []
+
+
+def test_overlappingIndex():
+    """
+    The index of the outgoing labels gives the same edges as comparing each one, and follows their changes.
+    """
+
+    f1 = Field("IPSrc", "DirSet")
+
+    n1 = fdd.Node(fdd.Level(f1))
+    n2 = fdd.Node(fdd.Level(f1))
+
+    edges = [fdd.Edge([i], n1, n2, DirectionSet([f'10.0.{i}.0/24'])) for i in range(20)]
+    for edge in edges:
+        edge.autoConnect()
+
+    query = DirectionSet(['10.0.4.128/25', '10.0.7.0/24', '10.0.10.0/23'])
+    scan = [edge for edge in n1.getOutgoing() if edge.getElementSet().isOverlapping(query)]
+
+    assert n1.getOverlapping(query) == scan == [edges[4], edges[7], edges[10], edges[11]]
+    assert n1._index is not None
+
+    edges[7].setElementSet(DirectionSet(['10.0.200.0/24']))
+    edges[10].autoDisconnect()
+    newEdge = fdd.Edge([30], n1, n2, DirectionSet(['10.0.5.0/24', '10.0.7.0/25']))
+    edges[5].autoDisconnect()
+    newEdge.autoConnect()
+
+    assert n1.getOverlapping(query) == [edges[4], newEdge, edges[11]]
+    assert n1.getOverlapping(DirectionSet(['10.0.200.1'])) == [edges[7]]
+
+    # Overlapping labels disable the index until the next query after they are disjoint again
+    edges[7].setElementSet(DirectionSet(['10.0.4.0/24']))
+    assert not n1._index.isUsable()
+    edges[7].setElementSet(DirectionSet(['10.0.200.0/24']))
+    assert n1.getOverlapping(query) == [edges[4], newEdge, edges[11]]
+    assert n1._index.isUsable()
+
+
+def test_overlappingIndexAddRule(tmp_path):
+    """
+    Adding a rule keeps the labels of the nodes disjoint in their index.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i in range(20):
+        rule = Rule(i)
+        rule.setPredicate('SrcIP', [f'10.0.{i}.0/24'])
+        rule.setDecision('ACCEPT' if i % 2 else 'DROP')
+        chain.addRule(rule)
+
+    f = fdd.FDD(fieldList)
+    f.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'))
+    root = f.getLevels()[0].getNodes()[0]
+    assert len(root.getOutgoing()) >= fdd.Node._indexMinEdges_
+
+    query = DirectionSet(['10.0.3.0/24'])
+    assert len(root.getOverlapping(query)) == 1
+    assert root._index.isUsable()
+
+    rule = Rule(30)
+    rule.setPredicate('SrcIP', ['10.0.3.0/25'])
+    rule.setDecision('ACCEPT')
+    f.addRuleToFDD(rule)
+
+    assert root._index.isUsable()
+    assert len(root.getOverlapping(query)) == 2
+
+
+def test_edgeReplicateCopyOnWrite():
+    """
+    Replicated edges share its label, ids and attributes until one of them is modified.
+    """
+
+    f1 = Field("IPSrc", "DirSet")
+
+    n1 = fdd.Node(fdd.Level(f1))
+    n2 = fdd.Node(fdd.Level(f1))
+
+    e1 = fdd.Edge([2, 1], n1, n2, DirectionSet(['10.0.0.0/8']), color='black')
+    e2 = e1.replicate()
+
+    assert e2.getElementSet() is e1.getElementSet()
+    assert e2.getId() == e1.getId()
+    assert e2.getAttributes() is e1.getAttributes()
+
+    e2.setAttributes(color='blue')
+    e2.extendId([0])
+
+    assert e1.getAttributes('color') == 'black'
+    assert e1.getId() == [1, 2]
+    assert e2.getAttributes('color') == 'blue'
+    assert e2.getId() == [0, 1, 2]
+
+    e1.setAttributes(color='red')
+
+    assert e1.getAttributes('color') == 'red'
+    assert e2.getAttributes('color') == 'blue'
+
+
+def test_compactObjects():
+    """
+    Nodes and Edges use __slots__, and allocate their attributes only when they are set.
+    """
+
+    f1 = Field("IPSrc", "DirSet")
+
+    n1 = fdd.Node(fdd.Level(f1))
+    n2 = fdd.Node(fdd.Level(f1))
+    e1 = fdd.Edge([3, 1], n1, n2, DirectionSet(['10.0.0.0/8']))
+
+    assert not hasattr(e1, '__dict__') and not hasattr(n1, '__dict__')
+    assert e1.getAttributes() == {} and e1.getAttributes('color') is None
+    assert n1.getAttributes('filterVisibility') is None
+
+    e1.setAttributes(color='blue')
+    n1.setAttributes(filterVisibility='True')
+
+    assert e1.getAttributes('color') == 'blue'
+    assert n1.getAttributes() == {'filterVisibility': 'True'}
+
+    e1.autoConnect()
+    n1Copy = pickle.loads(pickle.dumps(n1))
+
+    assert n1Copy.getOutgoing()[0].getId() == [1, 3]
+    assert n1Copy.getOutgoing()[0].getAttributes('color') == 'blue'
+    assert n1Copy.getAttributes('filterVisibility') == 'True'
+
+
+def test_fddArrays():
+    """
+    An FDD can be stored in arrays, marked there, and rebuilt (or pickled) from them.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i, (src, proto, decision) in enumerate([('10.0.0.0/8', 'tcp', 'ACCEPT'),
+                                                ('10.1.0.0/16', None, 'DROP'),
+                                                ('192.168.0.0/16', 'udp', 'ACCEPT')]):
+        rule = Rule(i)
+        rule.setPredicate('SrcIP', [src])
+        if proto:
+            rule.setPredicate('Protocol', [proto])
+        rule.setDecision(decision)
+        chain.addRule(rule)
+
+    fdd1 = fdd.FDD(fieldList)
+    fdd1.genFDD(chain)
+    fdd1.reduction()
+    fdd1.marking()
+
+    arrays = fdd1.toArrays()
+
+    assert arrays.getElementsNum() == fdd1.getElementsNum()
+    assert len(arrays.labels) <= arrays.getEdgesNum()
+
+    loads, marks = arrays.marking()
+    assert list(loads) == [node.getLoad() for level in fdd1.getLevels() for node in level.getNodes()]
+    assert list(marks) == [int(edge.getMarking()) for level in fdd1.getLevels()
+                           for node in level.getNodes() for edge in node.getOutgoing()]
+
+    for fdd2 in (fdd.FDD.fromArrays(arrays, fieldList), pickle.loads(pickle.dumps(fdd1))):
+        assert fdd2.getElementsNum() == fdd1.getElementsNum()
+        assert set(fdd2.getDecisions()) == set(fdd1.getDecisions())
+        assert [r.getDecision() for r in fdd2.firewallGen().getRules()] == \
+               [r.getDecision() for r in fdd1.firewallGen().getRules()]
+
+    # Arrays that went through pickle have copies of the fields: they aren't pruned, nor duplicated
+    fdd3 = fdd.FDD.fromArrays(pickle.loads(pickle.dumps(arrays)), fieldList)
+    assert fdd3.getPrunedFields() == fdd1.getPrunedFields()
+    assert all(level.getField() in fieldList.getFields() for level in fdd3.getLevels()[:-1])
+
+    rule = Rule(3)
+    rule.setPredicate('SrcIP', ['172.16.0.0/12'])
+    rule.setDecision('ACCEPT')
+    fdd3.addRuleToFDD(rule)
+    fieldNames = [level.getField().getName() for level in fdd3.getLevels()]
+    assert len(fieldNames) == len(set(fieldNames))
+    assert fieldNames == [level.getField().getName() for level in fdd1.getLevels()]
+
+
+def _sampleChain():
+    """
+    Chain with overlapping rules, with redundancies and inconsistencies among them.
+    """
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i, (src, dst, port, decision) in enumerate([('10.0.0.0/8', None, '22', 'ACCEPT'),
+                                                    ('10.1.0.0/16', '192.168.0.0/16', '1:1024', 'DROP'),
+                                                    ('10.1.2.0/24', '192.168.1.0/24', None, 'ACCEPT'),
+                                                    (None, '192.168.0.0/16', '80', 'ACCEPT')]):
+        rule = Rule(i)
+        for field, values in (('SrcIP', src), ('DstIP', dst), ('DstPort', port)):
+            if values:
+                rule.setPredicate(field, [values])
+        rule.setDecision(decision)
+        chain.addRule(rule)
+    return chain
+
+
+def test_sweepSanity(tmp_path):
+    """
+    The sweep and the pairwise sanitization generate the same FDD. The pairwise one is the default.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    fdds = []
+    for sweep in (False, True):
+        fdds.append(fdd.FDD(fieldList))
+        fdds[-1].genFDD(chain, str(tmp_path / f'sweep{sweep}.txt'), sweep=sweep)
+
+    fdd.FDD(fieldList).genFDD(chain, str(tmp_path / 'default.txt'))
+    assert (tmp_path / 'default.txt').read_text() == (tmp_path / 'sweepFalse.txt').read_text()
+
+    assert fdds[0].getElementsNum() == fdds[1].getElementsNum()
+
+    for f in fdds:
+        f.reduction()
+        f.marking()
+
+    assert [str(r) for r in fdds[0].firewallGen().getRules()] == [str(r) for r in fdds[1].firewallGen().getRules()]
+
+
+def test_streamGeneration(tmp_path):
+    """
+    Inserting the rules one by one gives a smaller FDD, that is the same one once reduced.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    fdd1 = fdd.FDD(fieldList)
+    fdd1.genFDD(chain)
+    fdd2 = fdd.FDD(fieldList)
+    fdd2.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'), stream=True)
+
+    assert fdd2.getElementsNum() <= fdd1.getElementsNum()
+
+    # Rule 2 is redundant with rule 0 (port 22) and inconsistent with rule 1
+    report = (tmp_path / 'report.txt').read_text()
+    assert 'Por tener mayor prioridad la regla ID:1' in report
+    assert report.count('Redundancia resuelta') == 1
+
+    fdd1.reduction()
+    fdd2.reduction()
+
+    assert fdd2.getElementsNum() == fdd1.getElementsNum()
+
+
+def test_streamUniqueTable():
+    """
+    The streaming construction shares the isomorphic nodes while the rules are inserted.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i in range(20):
+        rule = Rule(i)
+        rule.setPredicate('SrcIP', [f'10.0.{i}.0/24'])
+        rule.setPredicate('DstPort', ['22'])
+        rule.setDecision('ACCEPT')
+        chain.addRule(rule)
+
+    fdd1 = fdd.FDD(fieldList)
+    fdd1._genStream(chain, reportsPath=None)
+
+    # The 20 rules share the same subgraph after the first level
+    assert all(len(level.getNodes()) == 1 for level in fdd1.getLevels()[1:-1])
+    assert not fdd1._removeIsomorphicNodes()
+
+
+def test_pruneFields(tmp_path):
+    """
+    The levels of the fields that no rule constrains aren't generated, and the exported rules don't change.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    fdd1 = fdd.FDD(fieldList)
+    fdd1.genFDD(chain, reportsPath=str(tmp_path / 'report1.txt'), pruneFields=False)
+    fdd2 = fdd.FDD(fieldList)
+    fdd2.genFDD(chain, reportsPath=str(tmp_path / 'report2.txt'))
+
+    assert fdd1.getPrunedFields() == []
+    assert fdd2.getPrunedFields() == ['Protocol', 'SrcPort']
+    assert [level.getField().getName() for level in fdd2.getLevels()[:-1]] == ['SrcIP', 'DstIP', 'DstPort']
+    assert 'Protocol, SrcPort' in (tmp_path / 'report2.txt').read_text()
+
+    rules = []
+    for f in (fdd1, fdd2):
+        f.reduction()
+        f.marking()
+        rules.append([(r.getPredicates(), r.getDecision()) for r in f.firewallGen().getRules()])
+
+    assert rules[0] == rules[1]
+
+
+def test_addRuleToPrunedFdd(tmp_path):
+    """
+    A new rule that constrains a pruned field inserts its level again, and an empty one doesn't.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    rule = Rule(0)
+    rule.setPredicate('DstPort', ['22'])
+    rule.setDecision('ACCEPT')
+    chain.addRule(rule)
+
+    packets = [{'SrcIP': src, 'DstIP': '192.168.0.1', 'Protocol': protocol, 'SrcPort': '1024', 'DstPort': port}
+               for src in ('10.0.0.1', '11.0.0.1') for protocol in ('tcp', 'udp') for port in ('22', '80')]
+
+    for reduce in (False, True):
+        f = fdd.FDD(fieldList)
+        f.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'))
+        assert f.getFieldOrder() == ['DstPort']
+        if reduce:
+            f.reduction()
+            f.marking()
+
+        # Empty values, as the ones of the wizard, don't constrain the field
+        empty = Rule(1)
+        empty.setPredicate('SrcIP', None)
+        empty.setPredicate('DstPort', ['80'])
+        empty.setDecision('ACCEPT')
+        f.addRuleToFDD(empty)
+        assert f.getFieldOrder() == ['DstPort']
+
+        # The level of SrcIP goes before the root, and the one of Protocol between the others
+        for ruleId, predicates in ((2, {'SrcIP': ['10.0.0.0/8'], 'DstPort': ['22']}), (3, {'Protocol': ['udp']})):
+            new = Rule(ruleId)
+            for field, values in predicates.items():
+                new.setPredicate(field, values)
+            new.setDecision('DROP')
+            f.addRuleToFDD(new)
+        if reduce:
+            f.reduceIncremental()
+
+        assert f.getFieldOrder() == ['SrcIP', 'Protocol', 'DstPort']
+        assert f.getPrunedFields() == ['DstIP', 'SrcPort']
+        assert f.filterFDD('SrcPort', '80')
+
+        # The last rule added has the highest priority
+        expected = ['DROP' if packet['Protocol'] == 'udp' or (packet['SrcIP'] == '10.0.0.1' and packet['DstPort'] == '22')
+                    else 'ACCEPT' for packet in packets]
+        assert [_decide(f, packet) for packet in packets] == expected
+
+
+def test_blockGeneration(tmp_path):
+    """
+    Merging the FDDs of blocks of rules gives the same FDD as inserting all of them one by one.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    fdd1 = fdd.FDD(fieldList)
+    fdd1.genFDD(chain, reportsPath=str(tmp_path / 'report1.txt'), stream=True)
+
+    for workers in (1, 2):
+        fdd2 = fdd.FDD(fieldList)
+        fdd2.genFDD(chain, reportsPath=str(tmp_path / 'report2.txt'), blockSize=1, workers=workers)
+
+        assert fdd2.getElementsNum() == fdd1.getElementsNum()
+        assert 'Por tener mayor prioridad la regla ID:1' in (tmp_path / 'report2.txt').read_text()
+
+    # Two partial FDDs, the first one with higher priority
+    first, second = Chain('INPUT'), Chain('INPUT')
+    first.setRules(chain.getRules()[:2])
+    second.setRules(chain.getRules()[2:])
+
+    fdd3 = fdd.FDD(fieldList)
+    fdd3.genFDD(first, reportsPath=str(tmp_path / 'report3.txt'), pruneFields=False, complete=False)
+    fdd4 = fdd.FDD(fieldList)
+    fdd4.genFDD(second, reportsPath=str(tmp_path / 'report4.txt'), pruneFields=False, complete=False)
+
+    fdd3.merge(fdd4, reportsPath=str(tmp_path / 'report5.txt'))
+    fdd3._achieveCompleteness(chain.getDefaultDecision())
+
+    fdd5 = fdd.FDD(fieldList)
+    fdd5.genFDD(chain, reportsPath=str(tmp_path / 'report6.txt'), pruneFields=False)
+
+    for f in (fdd3, fdd5):
+        f.reduction()
+        f.marking()
+    assert fdd3.getElementsNum() == fdd5.getElementsNum()
+    assert [(r.getPredicates(), r.getDecision()) for r in fdd3.firewallGen().getRules()] == \
+           [(r.getPredicates(), r.getDecision()) for r in fdd5.firewallGen().getRules()]
+
+    # The complete FDDs can't be merged
+    with pytest.raises(ValueError):
+        fdd5.merge(fdd4, reportsPath=str(tmp_path / 'report7.txt'))
+
+
+def test_shardGeneration(tmp_path):
+    """
+    Stitching the FDDs of the shards of the first level gives the same reduced FDD.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    fdd1 = fdd.FDD(fieldList)
+    fdd1.genFDD(chain, reportsPath=str(tmp_path / 'report1.txt'))
+    fdd1.reduction()
+
+    packets = [{'SrcIP': src, 'DstIP': dst, 'Protocol': 'tcp', 'SrcPort': '1024', 'DstPort': port}
+               for src in ('10.0.0.1', '10.1.2.1', '10.1.3.1', '11.0.0.1')
+               for dst in ('192.168.1.1', '192.168.2.1', '172.16.0.1')
+               for port in ('22', '80', '443', '2000')]
+
+    for shards, workers in ((3, 1), (2, 2)):
+        fdd2 = fdd.FDD(fieldList)
+        fdd2.genFDD(chain, reportsPath=str(tmp_path / 'report2.txt'), shards=shards, workers=workers)
+
+        # The root has the edges of every shard
+        assert len(fdd2.getLevels()[0].getNodes()) == 1
+        assert 'Por tener mayor prioridad la regla ID:1' in (tmp_path / 'report2.txt').read_text()
+
+        fdd2.reduction()
+        assert fdd2.getElementsNum() == fdd1.getElementsNum()
+        assert [_decide(fdd2, packet) for packet in packets] == [_decide(fdd1, packet) for packet in packets]
+
+
+def _decide(f, packet):
+    """
+    Decision of an FDD for a packet.
+    """
+    node = f.getLevels()[0].getNodes()[0]
+    while node.getOutgoing():
+        field = node.getLevel().getField()
+        value = ElementSet.createElementSet(field.getType(), [packet[field.getName()]])
+        node = next(edge.getDestination() for edge in node.getOutgoing() if edge.getElementSet().isOverlapping(value))
+    return node.getName()
+
+
+def test_isomorphismHashing(tmp_path):
+    """
+    Hashing the nodes finds the same isomorphic nodes as comparing every pair of them.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    fdds = []
+    for pairwise in (False, True):
+        f = fdd.FDD(fieldList)
+        f.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'), pruneFields=False)
+        f.reduction(pairwise=pairwise)
+        fdds.append(f)
+
+    assert [len(level.getNodes()) for level in fdds[0].getLevels()] == [len(level.getNodes()) for level in fdds[1].getLevels()]
+    assert fdds[0].getElementsNum() == fdds[1].getElementsNum()
+    assert not fdds[1]._removeIsomorphicNodes()
+
+
+def test_bottomUpReduction(tmp_path):
+    """
+    The single bottom-up pass gives the same reduced FDD as the fixpoint loop, and counts what it removes.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    shapes = []
+    for bottomUp in (False, True):
+        f = fdd.FDD(fieldList)
+        f.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'), pruneFields=False)
+        before = f.getElementsNum()
+        removed = f.reduction(bottomUp=bottomUp)
+
+        assert sum(nodes + edges for nodes, edges in removed.values()) == before - f.getElementsNum()
+        shapes.append([len(level.getNodes()) for level in f.getLevels()])
+
+        # Nothing is left to reduce
+        assert not f._removeSimpleNodes() and not f._removeIsomorphicNodes() and not f._mergeEdges()
+
+    assert shapes[0] == shapes[1]
+
+
+def test_incrementalReduction(tmp_path):
+    """
+    Reducing only the nodes changed by addRuleToFDD gives the same FDD and loads as a full reduction.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sampleChain()
+
+    newRule = Rule(10)
+    newRule.setPredicate('SrcIP', ['10.1.2.0/24'])
+    newRule.setPredicate('DstPort', ['443'])
+    newRule.setDecision('ACCEPT')
+
+    packets = [{'SrcIP': src, 'DstIP': dst, 'Protocol': 'tcp', 'SrcPort': '1024', 'DstPort': port}
+               for src in ('10.0.0.1', '10.1.2.1', '10.1.3.1', '11.0.0.1')
+               for dst in ('192.168.1.1', '192.168.2.1', '172.16.0.1')
+               for port in ('22', '80', '443', '2000')]
+
+    fdds = []
+    for incremental in (False, True):
+        f = fdd.FDD(fieldList)
+        f.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'), pruneFields=False)
+        f.reduction()
+        f.marking()
+
+        f.addRuleToFDD(newRule)
+        if incremental:
+            f.reduceIncremental()
+        else:
+            f.reduction()
+            f.marking()
+        fdds.append(f)
+
+    assert fdds[1].getElementsNum() == fdds[0].getElementsNum()
+    assert fdds[1].getLevels()[0].getNodes()[0].getLoad() == fdds[0].getLevels()[0].getNodes()[0].getLoad()
+    assert [_decide(fdds[1], packet) for packet in packets] == [_decide(fdds[0], packet) for packet in packets]
+    assert _decide(fdds[1], {'SrcIP': '10.1.2.1', 'DstIP': '172.16.0.1', 'Protocol': 'tcp', 'SrcPort': '1024', 'DstPort': '443'}) == 'ACCEPT'
+
+
+def test_partialMarking(tmp_path):
+    """
+    Marking again only the changed nodes gives the same loads as marking the whole FDD.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    f = fdd.FDD(fieldList)
+    f.genFDD(_sampleChain(), reportsPath=str(tmp_path / 'report.txt'), pruneFields=False)
+    f.reduction()
+    f.marking()
+
+    # Split the first edge of the last non-terminal level that has more than one element
+    edge = next(edge for level in reversed(f.getLevels()[:-1]) for node in level.getNodes()
+                for edge in node.getOutgoing() if edge.getElementsCount() > 1)
+    count = edge.getElementsCount()
+    field = edge.getOrigin().getLevel().getField()
+    value = ElementSet.createElementSet(field.getType(), [edge.getElementSet().getElementsList()[0]])
+    edge.setElementSet(edge.getElementSet().differenceSet(value))
+    assert edge.getElementsCount() == count - 1
+
+    newEdge = fdd.Edge([-1], edge.getOrigin(), edge.getDestination(), value)
+    newEdge.autoConnect()
+
+    f.marking([edge.getOrigin()])
+    partial = [(node.getLoad(), [e.getMarking() for e in node.getOutgoing()]) for level in f.getLevels() for node in level.getNodes()]
+    f.marking()
+    full = [(node.getLoad(), [e.getMarking() for e in node.getOutgoing()]) for level in f.getLevels() for node in level.getNodes()]
+
+    assert partial == full
+
+
+def test_costModels(tmp_path):
+    """
+    Each cost model marks the FDD without changing its semantics, and the predicted size bounds the output.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    f = fdd.FDD(fieldList)
+    f.genFDD(_sampleChain(), reportsPath=str(tmp_path / 'report.txt'), pruneFields=False)
+    f.reduction()
+
+    with pytest.raises(ValueError):
+        f.getPredictedSize()
+    with pytest.raises(ValueError):
+        f.marking(costModel='bytes')
+
+    packets = [{'SrcIP': src, 'DstIP': dst, 'Protocol': 'tcp', 'SrcPort': '1024', 'DstPort': port}
+               for src in ('10.0.0.1', '10.1.2.1', '10.1.3.1', '11.0.0.1')
+               for dst in ('192.168.1.1', '192.168.2.1', '172.16.0.1')
+               for port in ('22', '80', '443', '2000')]
+    decisions = [_decide(f, packet) for packet in packets]
+
+    sizes = {}
+    for costModel in ('rules', 'lines', 'match'):
+        f.marking(costModel=costModel)
+        sizes[costModel] = f.getPredictedSize()
+
+        # Exactly one marked edge for each non-terminal node
+        assert all(sum(edge.getMarking() for edge in node.getOutgoing()) == 1
+                   for level in f.getLevels()[:-1] for node in level.getNodes())
+        assert [_decide(f, packet) for packet in packets] == decisions
+
+        chain = f.firewallGen()
+        table = Table('filter')
+        table.addChain(chain)
+        ruleSet = RuleSet()
+        ruleSet.addTable(table)
+        lines = [line for line in IpTablesParser().compose(ruleSet).splitlines() if line.startswith('-A')]
+
+        # The compaction can only remove rules
+        assert len(chain.getRules()) <= sizes[costModel]['rules']
+        assert len(lines) <= sizes[costModel]['lines']
+
+    assert sizes['rules']['load'] <= sizes['lines']['load']
+    assert sizes['lines']['lines'] <= sizes['rules']['lines']
+    assert sizes['rules']['rules'] == sizes['lines']['rules'] == sizes['match']['rules']
+
+
+def test_streamFindings(tmp_path):
+    """
+    The findings of the streaming construction name the rule that claimed the packets, even
+    when the node of the path is shared with the subgraph of another rule.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i, (src, decision) in enumerate([('10.0.0.0/8', 'ACCEPT'), ('11.0.0.0/8', 'ACCEPT'), ('11.0.0.0/8', 'DROP')]):
+        rule = Rule(i)
+        rule.setPredicate('SrcIP', [src])
+        rule.setPredicate('DstPort', ['22'])
+        rule.setDecision(decision)
+        chain.addRule(rule)
+
+    f = fdd.FDD(fieldList)
+    f.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'), stream=True)
+
+    report = (tmp_path / 'report.txt').read_text()
+    assert 'Por tener mayor prioridad la regla ID:1' in report
+    assert 'Por tener mayor prioridad la regla ID:0' not in report
+
+
+def _reportPairs(report):
+    """
+    Pairs of rule ids of the redundancies and of the inconsistencies of a report.
+    """
+    ids, redundancies, inconsistencies = [], set(), set()
+    for line in report.splitlines():
+        if line.startswith('Rule '):
+            ids.append(int(line.split()[1].rstrip(':')))
+        elif line.startswith('Redundancia resuelta'):
+            redundancies.add(tuple(ids[-2:]))
+        elif line.startswith('Por tener mayor prioridad'):
+            inconsistencies.add(tuple(ids[-2:]))
+    return redundancies, inconsistencies
+
+
+def _sharedClaimsChain():
+    """
+    Chain where rule 2 overlaps packets claimed by rules 0 and 1, that share the edge of their decision.
+    """
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i, (predicates, decision) in enumerate([({'Protocol': 'tcp', 'DstPort': '443'}, 'DROP'),
+                                                ({'SrcIP': '10.1.0.0/16', 'SrcPort': '53'}, 'DROP'),
+                                                ({'Protocol': 'tcp'}, 'DROP'),
+                                                ({'SrcPort': '1024:65535', 'DstPort': '22'}, 'ACCEPT'),
+                                                ({'SrcIP': '10.1.0.0/16'}, 'DROP')]):
+        rule = Rule(i)
+        for field, values in predicates.items():
+            rule.setPredicate(field, [values])
+        rule.setDecision(decision)
+        chain.addRule(rule)
+    return chain
+
+
+def test_streamReport(tmp_path):
+    """
+    The streaming construction reports every rule that claimed packets of another one, as the default
+    construction does, also when several of them share the edge of their decision.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _sharedClaimsChain()
+
+    reports = {}
+    for mode, options in (('default', {}), ('stream', {'stream': True}), ('shards', {'shards': 2})):
+        fdd.FDD(fieldList).genFDD(chain, reportsPath=str(tmp_path / f'{mode}.txt'), **options)
+        reports[mode] = _reportPairs((tmp_path / f'{mode}.txt').read_text())
+
+    assert (1, 2) in reports['default'][0] and (2, 4) in reports['default'][0]
+    assert reports['stream'] == reports['default']
+    assert reports['shards'] == reports['default']
+
+
+def test_blockReport(tmp_path):
+    """
+    The FDDs generated by blocks report the same findings as the default construction, although the
+    packets of the rules of a block may be claimed by the rules of a previous one.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    # Rule 1 claims the intersection of rules 3 and 5, so they aren't inconsistent
+    shadowed = Chain('INPUT')
+    shadowed.setDefaultDecision('DROP')
+    for i, (predicates, decision) in enumerate([({'SrcIP': '0.0.0.0/1', 'Protocol': 'udp', 'SrcPort': '1024:65535'}, 'DROP'),
+                                                ({'DstPort': '1000'}, 'DROP'),
+                                                ({'DstPort': '443'}, 'DROP'),
+                                                ({'SrcIP': '10.0.0.0/8', 'DstIP': '192.168.1.0/24', 'Protocol': 'udp', 'SrcPort': '53'}, 'DROP'),
+                                                ({'DstIP': '192.168.0.0/16', 'SrcPort': '53', 'DstPort': '22'}, 'DROP'),
+                                                ({'DstIP': '192.168.1.0/24', 'DstPort': '1000'}, 'ACCEPT'),
+                                                ({'SrcIP': '10.0.0.0/8', 'DstIP': '10.0.0.0/8', 'Protocol': 'udp', 'SrcPort': '1024:65535'}, 'ACCEPT')]):
+        rule = Rule(i)
+        for field, values in predicates.items():
+            rule.setPredicate(field, [values])
+        rule.setDecision(decision)
+        shadowed.addRule(rule)
+
+    for name, chain in (('shared', _sharedClaimsChain()), ('shadowed', shadowed)):
+
+        fdd.FDD(fieldList).genFDD(chain, reportsPath=str(tmp_path / f'{name}.txt'))
+        expected = _reportPairs((tmp_path / f'{name}.txt').read_text())
+
+        for blockSize in (1, 2, 3):
+            f = fdd.FDD(fieldList)
+            f.genFDD(chain, reportsPath=str(tmp_path / f'{name}{blockSize}.txt'), blockSize=blockSize)
+            assert _reportPairs((tmp_path / f'{name}{blockSize}.txt').read_text()) == expected
+
+        if name == 'shared':
+            assert (2, 3) in expected[1]
+        else:
+            assert (3, 5) not in expected[1]
+
+
+def test_predictedSizeRanges(tmp_path):
+    """
+    The predicted size is the one of the rules generated before the compaction, with networks in the labels.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    # The halves of the domain are single networks, so one of them is marked and its label is kept
+    for i, (src, decision) in enumerate([('0.0.0.0/1', 'ACCEPT'), ('128.0.0.0/1', 'REJECT')]):
+        rule = Rule(i)
+        rule.setPredicate('SrcIP', [src])
+        rule.setPredicate('DstPort', ['22'])
+        rule.setDecision(decision)
+        chain.addRule(rule)
+
+    f = fdd.FDD(fieldList)
+    f.genFDD(chain, reportsPath=str(tmp_path / 'report.txt'), pruneFields=False)
+    f.reduction()
+
+    for costModel in ('rules', 'lines', 'match'):
+        f.marking(costModel=costModel)
+        size = f.getPredictedSize()
+
+        rules = f.firewallGen(compact=False).getRules()
+        lines = [len(rule.getOption('SrcIP') or [None]) for rule in rules]
+
+        assert size['rules'] == len(rules)
+        assert size['lines'] == sum(lines)
+        assert size['checks'] == sum(count * len(rule.getPredicates()) for count, rule in zip(lines, rules))
+        assert ['0.0.0.0/1'] in [rule.getOption('SrcIP') for rule in rules]
@@ -0,0 +1,71 @@
+"""
+Tests for the FieldOrderOptimizer class and the field order of the FDD
+"""
+
+import pytest
+from fwoptimizer.core.fdd import FDD
+from fwoptimizer.core.fieldOrder import FieldOrderOptimizer
+from fwoptimizer.core.fields import FieldList
+from fwoptimizer.core.rules import Chain, Rule
+
+
+def _chain():
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i in range(12):
+        rule = Rule(i)
+        rule.setPredicate('SrcIP', [f'10.0.{i}.0/24'])
+        if i % 3 == 0:
+            rule.setPredicate('Protocol', ['tcp'])
+        rule.setPredicate('DstPort', ['22' if i % 2 else '80'])
+        rule.setDecision('ACCEPT' if i % 4 else 'DROP')
+        chain.addRule(rule)
+    return chain
+
+
+def test_fddFieldOrder():
+    """
+    The levels follow the given order, and the generated rules keep the order of the FieldList.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    order = ['DstPort', 'Protocol', 'SrcIP', 'SrcPort', 'DstIP']
+
+    with pytest.raises(ValueError):
+        FDD(fieldList, ['SrcIP', 'DstIP'])
+
+    fdd = FDD(fieldList, order)
+    assert fdd.getFieldOrder() == order
+
+    fdd.genFDD(_chain())
+    fdd.reduction()
+    fdd.marking()
+
+    names = [field.getName() for field in fieldList.getFields()]
+    for rule in fdd.firewallGen().getRules():
+        predicates = list(rule.getPredicates())
+        assert predicates == sorted(predicates, key=names.index)
+
+
+def test_chooseOrder():
+    """
+    The chosen order is one of the candidates, and never bigger than the config order in the sample.
+    """
+
+    fieldList = FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+    chain = _chain()
+    optimizer = FieldOrderOptimizer(fieldList, sampleRules=8)
+
+    stats = optimizer.fieldStats(chain)
+    assert stats['SrcIP'] == (12, 0.0, 0.0)
+    assert stats['DstPort'][:2] == (2, 0.0)
+    assert stats['DstIP'][1] == 1.0
+
+    order, report = optimizer.chooseOrder(chain)
+
+    assert order in optimizer.candidateOrders(chain).values()
+    assert report['sampledRules'] == 8
+    assert report['sizes'][report['heuristic']] <= report['sizes']['config']
+    assert report['savings'] >= 0
@@ -2,7 +2,12 @@
 Tests for the Field, FieldList and Firewall classes
 """
 
+from itertools import product
+
 import fwoptimizer.core.firewall as f
+from fwoptimizer.core.parser import IpTablesParser
+from fwoptimizer.core.fields import ElementSet
+from fwoptimizer.core.rules import Chain, Rule, RuleSet, Table
 
 sampleInput = 'tests/test_fdd_config.toml'
 
@@ -24,3 +29,74 @@ def test_fieldList():
 
         assert field.getName() == expectedOutput[i]['name']
         assert field.getType() == expectedOutput[i]['type']
+
+
+def _decide(chains, name, packet, fieldList):
+    """
+    Decision of a chain of the output for a packet, following the jumps to other chains.
+    """
+    types = {field.getName(): field.getType() for field in fieldList.getFields()}
+    for rule in chains[name].getRules():
+        if all(ElementSet.createElementSet(types[field], values).isOverlapping(
+               ElementSet.createElementSet(types[field], [packet[field]]))
+               for field, values in rule.getPredicates().items()):
+            if rule.getDecision() in chains:
+                decision = _decide(chains, rule.getDecision(), packet, fieldList)
+                if decision is not None:
+                    return decision
+                continue
+            return rule.getDecision()
+    return chains[name].getDefaultDecision()
+
+
+def test_partitionedFdd(tmp_path):
+    """
+    The FDDs of the partitions by protocol give the same decisions as the input chain.
+    """
+
+    fieldList = f.FieldList()
+    fieldList.loadConfig("fwoptimizer/configs/fdd_config.toml")
+
+    chain = Chain('INPUT')
+    chain.setDefaultDecision('DROP')
+    for i, (src, protocol, port, decision) in enumerate([('10.0.0.0/8', 'tcp', '22', 'ACCEPT'),
+                                                         ('10.1.0.0/16', None, None, 'DROP'),
+                                                         (None, 'udp', '53', 'ACCEPT'),
+                                                         (None, 'tcp', '80', 'ACCEPT')]):
+        rule = Rule(i)
+        for field, values in (('SrcIP', src), ('Protocol', protocol), ('DstPort', port)):
+            if values:
+                rule.setPredicate(field, [values])
+        rule.setDecision(decision)
+        chain.addRule(rule)
+
+    table = Table('filter')
+    table.addChain(chain)
+    ruleSet = RuleSet()
+    ruleSet.addTable(table)
+
+    firewall = f.Firewall(fieldList, inputRules=ruleSet, defaultWorkFolder=f'{tmp_path}/')
+    firewall.genFdd(partitionField='Protocol')
+    firewall.optimizeFdd()
+
+    partitions = firewall.getPartitions('filter', 'INPUT')
+    assert [piece.getElementsList() for piece, _ in partitions] == [['tcp'], ['udp'], ['icmp']]
+    assert all('Protocol' in fdd.getPrunedFields() for _, fdd in partitions)
+
+    merged = {c.getName(): c for c in firewall.genOutputRules()['filter'].getChains().values()}
+    jumps = {c.getName(): c for c in firewall.genOutputRules(jumpChains=True)['filter'].getChains().values()}
+    assert list(merged) == ['INPUT']
+    assert 'INPUT_tcp' in jumps and 'INPUT_icmp' not in jumps
+
+    for src, protocol, port in product(['10.0.0.1', '10.1.0.1', '11.0.0.1'], ['tcp', 'udp', 'icmp'], ['22', '53', '80', '443']):
+        packet = {'SrcIP': src, 'DstIP': '192.168.0.1', 'Protocol': protocol, 'SrcPort': '1024', 'DstPort': port}
+        expected = _decide({'INPUT': chain}, 'INPUT', packet, fieldList)
+        assert _decide(merged, 'INPUT', packet, fieldList) == expected
+        assert _decide(jumps, 'INPUT', packet, fieldList) == expected
+
+    # The composed file declares the chains before the jumps to them
+    lines = IpTablesParser().compose(firewall.genOutputRules(jumpChains=True)).splitlines()
+    assert lines[:4] == ['*filter', ':INPUT DROP [0:0]', ':INPUT_tcp - [0:0]', ':INPUT_udp - [0:0]']
+    assert lines[-1] == 'COMMIT'
+    assert all(line.startswith('-A ') for line in lines[4:-1])
+    assert any(line.startswith('-A INPUT -p tcp') and line.endswith('-j INPUT_tcp') for line in lines)